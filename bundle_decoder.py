@@ -0,0 +1,120 @@
+import io
+import os
+import openpyxl
+import pandas as pd
+from pdf_volumes import render_volumes
+
+# --- CONFIGURATION ---
+# Layout written by exam_day_docs.create_locked_bundle
+MARKS_SHEET = 'Marks Entry'
+HEADER_ROW = 8            # 1-based; 'Coding No.' in column B, totals headers merged over rows 8-9
+FIRST_DATA_ROW = 10
+CODE_COL = 2
+QUESTION_COUNTS = (10, 8)  # regular / MBA papers
+HEADER_SCAN_ROWS = 15      # fallback for workbooks that do not match the layout
+PARALLEL_MIN_FILES = 4
+DEFAULT_DECODE_WORKERS = max(1, min(8, os.cpu_count() or 1))
+STATUS_WORDS = {'AB': 'ABSENT', 'ABSENT': 'ABSENT', 'MP': 'MALPRACTICE', 'MAL': 'MALPRACTICE', 'MALPRACTICE': 'MALPRACTICE',
+                'WH': 'WITHHELD', 'WITHHELD': 'WITHHELD'}
+
+def _final_see_col(num_q):
+    """1-based column of 'Final SEE Marks (100)' (one after Total SEE, Moderation and Difference)"""
+    return 2 + num_q * 4 + 3 + 1
+
+# ==========================================
+# 1. SINGLE WORKBOOK
+# ==========================================
+def _locate_columns(ws):
+    """(first data row, code column, marks column), all 1-based, or None when no header is found"""
+    header = next(ws.iter_rows(min_row=HEADER_ROW, max_row=HEADER_ROW, values_only=True), ())
+    if len(header) >= CODE_COL and str(header[CODE_COL - 1] or "").upper().startswith("CODING"):
+        for num_q in QUESTION_COUNTS:
+            col = _final_see_col(num_q)
+            if len(header) >= col and "FINAL SEE" in str(header[col - 1] or "").upper():
+                return FIRST_DATA_ROW, CODE_COL, col
+
+    # Not our layout: find the header row by its labels, as the old decoder did
+    for r_idx, row in enumerate(ws.iter_rows(max_row=HEADER_SCAN_ROWS, values_only=True), start=1):
+        labels = [str(v or "").upper() for v in row]
+        code_col = next((i for i, v in enumerate(labels, 1) if "CODING" in v or "DUMMY" in v), None)
+        if code_col is None: continue
+        marks_col = next((i for i, v in enumerate(labels, 1) if "FINAL SEE" in v), None) or next((i for i, v in enumerate(labels, 1) if "TOTAL SEE" in v), None)
+        return (r_idx + 1, code_col, marks_col) if marks_col else None
+    return None
+
+def read_bundle(name, data):
+    """
+    Worker: one evaluator workbook (bytes) -> (name, [(dummy_id, raw_final_marks)], issue).
+    Read-only streaming of cached cell values; only the code and marks columns are read, and
+    reading stops at the first blank code after the marks block.
+    """
+    try:
+        wb = openpyxl.load_workbook(io.BytesIO(data), read_only=True, data_only=True)
+    except Exception as e:
+        return name, [], f"Unreadable workbook: {e}"
+    try:
+        if MARKS_SHEET not in wb.sheetnames:
+            return name, [], f"No '{MARKS_SHEET}' sheet"
+        ws = wb[MARKS_SHEET]
+        located = _locate_columns(ws)
+        if not located:
+            return name, [], "Coding / SEE marks columns not found"
+        first_row, code_col, marks_col = located
+        lo, hi = min(code_col, marks_col), max(code_col, marks_col)
+
+        rows, started = [], False
+        for row in ws.iter_rows(min_row=first_row, min_col=lo, max_col=hi, values_only=True):
+            code = row[code_col - lo] if len(row) > code_col - lo else None
+            code = str(code).strip().upper() if code is not None else ""
+            if len(code) <= 2 or code == "NAN":
+                if started: break
+                continue
+            started = True
+            rows.append((code, row[marks_col - lo] if len(row) > marks_col - lo else None))
+        return name, rows, None
+    finally:
+        wb.close()
+
+def _read_bundle_job(name, data, out_dir):
+    """render_volumes worker: the rows travel back with the result, so nothing is written to out_dir"""
+    return read_bundle(name, data)
+
+# ==========================================
+# 2. MANY WORKBOOKS (parallel)
+# ==========================================
+def read_bundles(files, max_workers=DEFAULT_DECODE_WORKERS):
+    """
+    [(file_name, bytes)] -> (DataFrame [Dummy_ID, SEE_Raw_Val, Bundle_File], [{file, issue}]).
+    Workbooks are parsed side by side on the render_volumes pool (inline for a handful of files or a single core).
+    """
+    workers = max(1, min(max_workers, len(files), os.cpu_count() or 1))
+    if workers == 1 or len(files) < PARALLEL_MIN_FILES:
+        results = [read_bundle(name, data) for name, data in files]
+    else:
+        results = list(render_volumes(iter(files), _read_bundle_job, None, (), max_workers=workers, ordered=True))
+
+    codes, values, sources, issues = [], [], [], []
+    for name, rows, issue in results:
+        if issue: issues.append({"file": name, "issue": issue})
+        for code, value in rows:
+            codes.append(code); values.append(value); sources.append(name)
+    return pd.DataFrame({"Dummy_ID": codes, "SEE_Raw_Val": values, "Bundle_File": sources}), issues
+
+# ==========================================
+# 3. KEY JOIN
+# ==========================================
+def decode_marks(marks_df, key_df):
+    """
+    Vectorized join of extracted marks with the coding key (Dummy_ID, USN, Subject)
+    -> DataFrame [usn, course_code, see_marks, status]. AB / MP / WH words become statuses; blanks count as PRESENT with 0.
+    """
+    df = marks_df.merge(key_df[['Dummy_ID', 'USN', 'Subject']].drop_duplicates('Dummy_ID'), on='Dummy_ID', how='inner')
+    text = df['SEE_Raw_Val'].astype("string").fillna("").str.strip().str.upper()
+    status = text.map(STATUS_WORDS).fillna('PRESENT')
+    see = pd.to_numeric(text.where(status == 'PRESENT').astype(object), errors='coerce').fillna(0.0).astype(float)
+    return pd.DataFrame({
+        "usn": df['USN'].astype("string").fillna("").str.strip().str.upper(),
+        "course_code": df['Subject'].astype("string").fillna("").str.strip().str.upper(),
+        "see_marks": see.where(status == 'PRESENT', 0.0),
+        "status": status,
+    })
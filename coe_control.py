@@ -1,26 +1,22 @@
 import streamlit as st
 import pandas as pd
 import io
-import datetime
-import hashlib
-import os
 import re
+import time
+import zipfile
+import datetime
 import concurrent.futures
-from PIL import Image as PILImage  
 from utils import init_db
+from photo_pipeline import fetch_complete_bucket_map, fetch_bucket_index, clean_usn_key, download_photo, stream_photos, DEFAULT_PHOTO_WORKERS, DEFAULT_PHOTO_PREFETCH
+from pdf_assets import fetch_system_asset_bytes, prepare_system_assets, load_system_assets, photo_reader, print_size_px, PHOTO_PRINT_SIZE
+from pdf_volumes import VOLUME_MODES, DEFAULT_VOLUME_WORKERS, plan_volumes, render_volumes, attach_photos, VolumeZip
+from hall_ticket_pdf import subject_from_registration, build_student_entry, draw_student_documents, render_student_pdf, init_volume_worker, render_volume, student_fingerprint, splice_volume, join_student_pdfs
 from reportlab.pdfgen import canvas
 from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle, Paragraph, Image as RLImage
-from reportlab.lib.styles import getSampleStyleSheet
-from reportlab.lib.utils import ImageReader
 
 # ==========================================
 # 1. SETUP
 # ==========================================
-LOGO_FILENAME = "College_logo.png"       
-NAAC_FILENAME = "NAAC_A_Logo.jpg"        
-WATERMARK_FILENAME = "AMC_watermark.png" 
 supabase = init_db()
 
 st.title("🖨️ Pre-Exam Operations & Hall Tickets")
@@ -33,25 +29,6 @@ if not selected_cycle_id:
     st.warning("⚠️ Please select an Active Exam Cycle in the Sidebar to proceed.")
     st.stop()
 
-def get_branch_code(usn):
-    try:
-        if len(usn) > 5:
-            match = re.search(r'[A-Za-z]+', usn[5:])
-            if match:
-                return match.group(0).upper()
-    except: pass
-    return "GEN"
-
-def generate_app_id(usn, cycle_id):
-    h = hashlib.md5(f"{usn}{cycle_id}{datetime.date.today()}".encode()).hexdigest()[:6].upper()
-    return f"AMC-26-{h}"
-
-def get_sem_num(sem_val):
-    try:
-        return int(re.search(r'\d+', str(sem_val)).group())
-    except:
-        return 99
-
 def fetch_all_records(table, columns="*", filter_col=None, filter_val=None):
     rows = []
     start = 0; step = 1000
@@ -68,62 +45,7 @@ def fetch_all_records(table, columns="*", filter_col=None, filter_val=None):
     return rows
 
 # ==========================================
-# 2. BULLETPROOF PHOTO LOGIC
-# ==========================================
-def fetch_complete_bucket_map(bucket_name):
-    file_map = {}
-    limit = 1000; offset = 0
-    while True:
-        try:
-            files = supabase.storage.from_(bucket_name).list("", options={"limit": limit, "offset": offset})
-            if not files: break
-            
-            for f in files:
-                fname = f.get('name', '')
-                if not fname or fname == '.emptyFolderPlaceholder': 
-                    continue
-                
-                basename = os.path.basename(fname)
-                key = re.sub(r'[^A-Z0-9]', '', os.path.splitext(basename)[0].upper())
-                file_map[key] = fname
-                
-            if len(files) < limit: break
-            offset += limit
-        except: break
-    return file_map
-
-def download_photo_worker(args):
-    usn, file_map = args
-    clean_usn = re.sub(r'[^A-Z0-9]', '', usn.upper())
-    
-    if clean_usn in file_map:
-        try:
-            res = supabase.storage.from_("StakeHolders_Photos").download(file_map[clean_usn])
-            if res:
-                img = PILImage.open(io.BytesIO(res))
-                if img.mode != 'RGB': img = img.convert('RGB')
-                clean_io = io.BytesIO()
-                img.save(clean_io, format='JPEG', quality=95)
-                clean_io.seek(0)
-                return usn, clean_io
-        except: pass
-
-    for ext in ['.webp', '.jpg', '.jpeg', '.png', '.WEBP', '.JPG', '.PNG']:
-        try:
-            res = supabase.storage.from_("StakeHolders_Photos").download(f"{clean_usn}{ext}")
-            if res:
-                img = PILImage.open(io.BytesIO(res))
-                if img.mode != 'RGB': img = img.convert('RGB')
-                clean_io = io.BytesIO()
-                img.save(clean_io, format='JPEG', quality=95)
-                clean_io.seek(0)
-                return usn, clean_io
-        except: pass
-            
-    return usn, None
-
-# ==========================================
-# 3. DATA FETCHING UTILS
+# 2. DATA FETCHING UTILS
 # ==========================================
 def fetch_branches_map():
     branch_map = {}
@@ -170,390 +92,110 @@ def fetch_course_eligibility_map():
     except: pass
     return eligibility_map
 
-def sort_subjects_by_timetable(subs, timetable_map):
-    def get_date(sub):
-        date_str = timetable_map.get(sub['code'], {}).get('date', 'TBD')
-        if date_str == 'TBD' or not date_str:
-            return datetime.datetime(2099, 1, 1)
-        try:
-            return datetime.datetime.strptime(date_str, "%d-%m-%Y")
-        except:
-            return datetime.datetime(2099, 1, 1)
-    return sorted(subs, key=get_date)
-
-def draw_header(c, w, y_start, assets, is_hall_ticket=False):
-    if assets.get("logo"):
-        c.drawImage(ImageReader(assets["logo"]), 35, y_start - 35, width=60, height=60, mask='auto', preserveAspectRatio=True)
-    if assets.get("naac"):
-        if is_hall_ticket:
-            c.drawImage(ImageReader(assets["naac"]), w - 85, y_start - 30, width=50, height=50, mask='auto', preserveAspectRatio=True)
-        else:
-            c.drawImage(ImageReader(assets["naac"]), w - 95, y_start - 35, width=60, height=60, mask='auto', preserveAspectRatio=True)
+def collect_cycle_inputs(cycle_id):
+    """Fresh (uncached) snapshot of everything the bulk and reprint runs draw from, plus one entry per printable student"""
+    photo_file_map, photo_versions = fetch_bucket_index(supabase)
+    timetable_map = fetch_timetable_map(cycle_id)
+    branch_map = fetch_branches_map()
+    fee_res = supabase.table("master_fees").select("*").execute()
 
-    c.setFont("Helvetica-Bold", 15)
-    c.drawCentredString(w/2, y_start, "AMC ENGINEERING COLLEGE")
-    c.setFont("Helvetica", 9)
-    c.drawCentredString(w/2, y_start - 15, "AMC Campus, Bannerghatta Road, Bengaluru, Karnataka - 560083")
-    c.drawCentredString(w/2, y_start - 27, "Autonomous Institution Affiliated to VTU, Belagavi")
-    c.drawCentredString(w/2, y_start - 39, "Approved by AICTE, New Delhi | NAAC A+ Accredited")
-    c.setLineWidth(1)
-    c.line(30, y_start - 50, w - 30, y_start - 50)
-    return y_start - 70
-
-# ==========================================
-# 4. PDF ENGINE (DYNAMIC LAYOUT)
-# ==========================================
-def draw_application_page(c, w, h, student, subjects, fees, assets, app_id, cycle_name, photo_bytes_io, prog_type, db_branch_code, branch_name_str):
-    if assets.get("watermark"):
-        c.saveState(); c.setFillAlpha(0.08)
-        c.drawImage(ImageReader(assets["watermark"]), w/2 - 175, h/2 - 175, width=350, height=350, mask='auto', preserveAspectRatio=True)
-        c.restoreState()
-
-    y = draw_header(c, w, h - 30, assets, is_hall_ticket=False)
-    c.setFont("Helvetica-Bold", 11)
+    # 🟢 PYTHON GUARDRAIL APPLIED
+    raw_students = fetch_all_records("master_students", columns="*")
+    all_students = [s for s in raw_students if str(s.get('status', 'ACTIVE')).strip().upper() == 'ACTIVE']
     
-    c.drawCentredString(w/2, y, f"Examination Application Form - {cycle_name}")
-    y -= 20
-
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(30, y, "Student Details")
-    y -= 5
+    all_regs = fetch_all_records("course_registrations", "usn, course_code, semester, master_courses(title, semester_id)", "cycle_id", cycle_id)
     
-    from reportlab.lib.styles import ParagraphStyle
-    from reportlab.lib.enums import TA_LEFT
-    bold_9pt_style = ParagraphStyle('Bold9', fontName='Helvetica-Bold', fontSize=9, alignment=TA_LEFT)
-
-    if photo_bytes_io:
-        photo_bytes_io.seek(0)
-        p_img = RLImage(photo_bytes_io, width=65, height=75)
-        p_img.hAlign = 'CENTER'
-        p_img.vAlign = 'MIDDLE'
-    else:
-        p_img = Paragraph("<para align=center>PHOTO</para>", getSampleStyleSheet()['Normal'])
-    
-    stu_sem_str = str(student.get('current_sem', '1'))
-    stu_sem_num = get_sem_num(stu_sem_str)
-
-    s_data = [
-        ["USN", student['usn'], "Student Name", Paragraph(student['full_name'], bold_9pt_style), p_img],
-        ["Semester", stu_sem_str, "Student Type", prog_type, ""],
-        ["Branch Code", db_branch_code, "Programme", Paragraph(branch_name_str, bold_9pt_style), ""]
-    ]
-    
-    t1 = Table(s_data, colWidths=[85, 85, 80, 205, 80], rowHeights=25)
-    t1.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-        ('FONTSIZE', (0,0), (-1,-1), 9),
-        ('FONTNAME', (0,0), (0,-1), 'Helvetica-Bold'), 
-        ('FONTNAME', (2,0), (2,-1), 'Helvetica-Bold'), 
-        ('BACKGROUND', (0,0), (0,-1), colors.lightgrey), 
-        ('BACKGROUND', (2,0), (2,-1), colors.lightgrey), 
-        ('SPAN', (4,0), (4,2)), 
-        ('VALIGN', (4,0), (4,2), 'MIDDLE'),
-        ('ALIGN', (4,0), (4,2), 'CENTER'),
-        ('ALIGN', (1,0), (1,2), 'LEFT'),
-        ('ALIGN', (3,0), (3,2), 'LEFT'), 
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'), 
-    ]))
-    t1.wrapOn(c, w, h)
-    _, th1 = t1.wrap(w, h)
-    t1.drawOn(c, 30, y - th1)
-    y -= (th1 + 15)
-    
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(30, y, f"Application ID: {app_id}")
-    c.drawRightString(w - 30, y, f"Application Date: {datetime.date.today().strftime('%d-%m-%Y')}")
-    y -= 15
-
-    regular_subs = []
-    arrear_subs = []
-    
-    for s in subjects:
-        sub_sem_str = str(s.get('sem', '-'))
-        sub_sem_num = get_sem_num(sub_sem_str)
-        if sub_sem_num < stu_sem_num:
-            arrear_subs.append(s)
-        else:
-            regular_subs.append(s)
-            
-    arrear_count = len(arrear_subs)
-    regular_count = len(regular_subs)
-    
-    row_h = 16 if len(subjects) > 10 else None
-    fontsize = 8 if len(subjects) > 10 else 9
-
-    if regular_count > 0:
-        c.setFont("Helvetica-Bold", 10); c.drawString(30, y, "Regular Courses"); y -= 5
-        reg_rows = [["Sem", "Course Code", "Course Title", "Type"]]
-        for s in regular_subs:
-            reg_rows.append([str(s.get('sem', '-')), s['code'], Paragraph(s['title'], getSampleStyleSheet()['Normal']), "Regular"])
-            
-        t_reg = Table(reg_rows, colWidths=[40, 80, 335, 80], rowHeights=row_h)
-        t_reg.setStyle(TableStyle([
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('ALIGN', (0,0), (0,-1), 'CENTER'),
-            ('ALIGN', (3,0), (3,-1), 'CENTER'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('FONTSIZE', (0,0), (-1,-1), fontsize), 
-        ]))
-        t_reg.wrapOn(c, w, h)
-        _, th_reg = t_reg.wrap(w, h)
-        t_reg.drawOn(c, 30, y - th_reg)
-        y -= (th_reg + 10)
-
-    if arrear_count > 0:
-        c.setFont("Helvetica-Bold", 10); c.drawString(30, y, "Arrear Courses"); y -= 5
-        arr_rows = [["Sem", "Course Code", "Course Title", "Type"]]
-        for s in arrear_subs:
-            arr_rows.append([str(s.get('sem', '-')), s['code'], Paragraph(s['title'], getSampleStyleSheet()['Normal']), "Arrear"])
-            
-        t_arr = Table(arr_rows, colWidths=[40, 80, 335, 80], rowHeights=row_h)
-        t_arr.setStyle(TableStyle([
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('ALIGN', (0,0), (0,-1), 'CENTER'),
-            ('ALIGN', (3,0), (3,-1), 'CENTER'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('FONTSIZE', (0,0), (-1,-1), fontsize), 
-        ]))
-        t_arr.wrapOn(c, w, h)
-        _, th_arr = t_arr.wrap(w, h)
-        t_arr.drawOn(c, 30, y - th_arr)
-        y -= (th_arr + 10)
-
-    c.setFont("Helvetica-Bold", 10); c.drawString(30, y, "Fee Details"); y -= 5
-    
-    base_exam_fee = float(fees.get('Exam', 2000))
-    fee_exam = base_exam_fee if regular_count > 0 else 0.0  
-    
-    fee_arrear_per_sub = float(fees.get('Arrear', 0))
-    fee_arrear_total = fee_arrear_per_sub * arrear_count
-    
-    fee_penalty = float(fees.get('Penalty', 0))
-    fee_misc = float(fees.get('Misc', 400))
-    
-    total = fee_exam + fee_arrear_total + fee_penalty + fee_misc
-    
-    f_rows = [
-        ["Description", "Amount (Rs)"],
-        ["Regular Examination Fees", f"{fee_exam:.2f}"],
-        [f"Arrear Examination Fees ({arrear_count} x {fee_arrear_per_sub:.2f})", f"{fee_arrear_total:.2f}"],
-        ["Penalty Fees", f"{fee_penalty:.2f}"],
-        ["Application & Marks Card Fees", f"{fee_misc:.2f}"],
-        ["TOTAL AMOUNT", f"{total:.2f}"]
-    ]
-    
-    t3 = Table(f_rows, colWidths=[435, 100], rowHeights=16 if len(subjects) > 10 else None)
-    t3.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-        ('FONTNAME', (-1,-1), (-1,-1), 'Helvetica-Bold'),
-        ('ALIGN', (1,0), (1,-1), 'RIGHT'),
-        ('FONTSIZE', (0,0), (-1,-1), 8 if len(subjects) > 10 else 9)
-    ]))
-    t3.wrapOn(c, w, h)
-    _, th3 = t3.wrap(w, h)
-    t3.drawOn(c, 30, y - th3)
-    y -= (th3 + 15) 
-
-    c.rect(30, y - 25, w - 60, 25)
-    c.setFont("Helvetica", 9)
-    c.drawString(40, y - 17, "Receipt No: ______________________")
-    c.drawString(350, y - 17, "Date: ______________________")
-    y -= 40
-
-    c.setFont("Helvetica-Bold", 10); c.drawString(30, y, "Declaration:"); y -= 12
-    decl = "The subjects listed in this application are the only subjects I wish to apply for this Examination. I understand this application overrides any previous submission."
-    p = Paragraph(decl, getSampleStyleSheet()['Normal']); p.wrapOn(c, w - 60, 50); p.drawOn(c, 30, y - 20)
-    
-    y -= 45
-    c.setFont("Helvetica-Bold", 9); c.drawRightString(w - 30, y, "Signature of the Candidate")
-    
-    c.setFont("Helvetica", 8)
-    c.drawRightString(w - 30, y - 12, "Contact No: ___________________________")
-    c.drawRightString(w - 30, y - 24, "Email ID:   ___________________________")
-
-
-def draw_hall_ticket_half(c, w, base_y, student, subjects, section, app_id, assets, cycle_name, photo_bytes_io, timetable_map, eligibility_map, header_branch, branch_name_str):
-    HALF_HEIGHT = 420.94 
-    
-    if assets.get("watermark"):
-        c.saveState(); c.setFillAlpha(0.08)
-        c.drawImage(ImageReader(assets["watermark"]), w/2 - 140, base_y + (HALF_HEIGHT/2) - 140, width=280, height=280, mask='auto', preserveAspectRatio=True)
-        c.restoreState()
-
-    y = draw_header(c, w, base_y + HALF_HEIGHT - 20, assets, is_hall_ticket=True)
-    c.setFont("Helvetica-Bold", 11)
-    c.drawCentredString(w/2, y + 5, f"Admission Ticket - {cycle_name}")
-    c.setFont("Helvetica-Bold", 9)
-    c.drawRightString(w - 40, y - 5, f"[{section}]")
-    y -= 15 
-
-    compact_style = getSampleStyleSheet()['Normal'].clone('Compact')
-    compact_style.fontName = 'Helvetica-Bold'
-    compact_style.fontSize = 7.5
-    compact_style.leading = 8.5
-    compact_style.alignment = 0 
-
-    h_data = [
-        ["USN:", student['usn'], "Name:", Paragraph(f"{student['full_name']}", compact_style)],
-        ["App ID:", app_id, "Date:", datetime.date.today().strftime('%d-%m-%Y')],
-        ["Semester:", str(student.get('current_sem', '1')), "Programme:", Paragraph(f"{branch_name_str}", compact_style)],
-        ["Center:", "AMC ENGINEERING COLLEGE", "", ""]
-    ]
-    
-    t_text = Table(h_data, colWidths=[50, 90, 55, 280], rowHeights=14)
-    t_text.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-        ('FONTSIZE', (0,0), (-1,-1), 8),
-        ('FONTNAME', (0,0), (0,-1), 'Helvetica-Bold'),
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('SPAN', (1,3), (3,3)), 
-        ('ALIGN', (1,0), (1,-1), 'LEFT'),
-        ('ALIGN', (3,0), (3,-1), 'LEFT'),
-        ('TOPPADDING', (0,0), (-1,-1), 1),    
-        ('BOTTOMPADDING', (0,0), (-1,-1), 1), 
-    ]))
-    
-    if photo_bytes_io:
-        photo_bytes_io.seek(0)
-        p_img2 = RLImage(photo_bytes_io, width=48, height=54)
-        p_img2.hAlign = 'CENTER'
-        p_img2.vAlign = 'MIDDLE'
-    else:
-        p_img2 = Paragraph("<para align=center>PHOTO</para>", compact_style)
-
-    master_data = [[t_text, p_img2]]
-    t_master = Table(master_data, colWidths=[475, 60])
-    t_master.setStyle(TableStyle([
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-        ('ALIGN', (1,0), (1,0), 'CENTER'),
-        ('GRID', (1,0), (1,0), 0.5, colors.black),
-        ('LEFTPADDING', (0,0), (-1,-1), 0),
-        ('RIGHTPADDING', (0,0), (-1,-1), 0),
-        ('TOPPADDING', (0,0), (-1,-1), 0),
-        ('BOTTOMPADDING', (0,0), (-1,-1), 0),
-    ]))
-    
-    t_master.wrapOn(c, w, 500)
-    _, h_mast = t_master.wrap(w, 500)
-    t_master.drawOn(c, 30, y - h_mast)
-    
-    y -= (h_mast + 15) 
-    c.setFont("Helvetica-Bold", 9)
-    c.drawString(30, y, "Exam Schedule:")
-    y -= 8 
-    
-    valid_subs = [s for s in subjects if eligibility_map.get(s['code'], False)]
-    
-    if len(valid_subs) >= 10:
-        mid = (len(valid_subs) + 1) // 2
-        left_subs = valid_subs[:mid]
-        right_subs = valid_subs[mid:]
-        
-        left_data = [["Date", "Session", "Sem", "Course Code", "Sign"]]
-        for s in left_subs:
-            sch = timetable_map.get(s['code'], {"date": "", "session": ""})
-            left_data.append([sch['date'], sch['session'], str(s.get('sem', '-')), s['code'], ""])
-            
-        right_data = [["Date", "Session", "Sem", "Course Code", "Sign"]]
-        for s in right_subs:
-            sch = timetable_map.get(s['code'], {"date": "", "session": ""})
-            right_data.append([sch['date'], sch['session'], str(s.get('sem', '-')), s['code'], ""])
-            
-        while len(right_data) < len(left_data):
-            right_data.append(["", "", "", "", ""])
-            
-        split_style = TableStyle([
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('FONTSIZE', (0,0), (-1,-1), 7),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('TOPPADDING', (0,0), (-1,-1), 1),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 1),
-        ])
-        
-        t_left = Table(left_data, colWidths=[50, 80, 25, 55, 45], rowHeights=13)
-        t_left.setStyle(split_style)
+    course_map = {}
+    for r in all_regs:
+        course_map.setdefault(r['usn'], []).append(subject_from_registration(r))
         
-        t_right = Table(right_data, colWidths=[50, 80, 25, 55, 45], rowHeights=13)
-        t_right.setStyle(split_style)
-        
-        tg = Table([[t_left, t_right]], colWidths=[260, 260])
-        tg.setStyle(TableStyle([
-            ('VALIGN', (0,0), (-1,-1), 'TOP'),
-            ('LEFTPADDING', (0,0), (-1,-1), 0),
-            ('RIGHTPADDING', (0,0), (-1,-1), 0),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 0),
-            ('TOPPADDING', (0,0), (-1,-1), 0),
-        ]))
-        
-        tg.wrapOn(c, w, 500)
-        _, gh = tg.wrap(w, 500)
-        tg.drawOn(c, 30, y - gh)
-
-    else:
-        grid_data = [["Date", "Session", "Sem", "Course Code", "Invigilator Sign"]]
-        
-        for s in valid_subs:
-            sch = timetable_map.get(s['code'], {"date": "", "session": ""})
-            grid_data.append([sch['date'], sch['session'], str(s.get('sem', '-')), s['code'], ""])
-
-        MIN_ROWS = 8
-        if (len(grid_data) - 1) < MIN_ROWS:
-            for _ in range(MIN_ROWS - (len(grid_data) - 1)):
-                grid_data.append(["", "", "", "", ""])
+    student_index = {s['usn']: s for s in all_students}
+    return {
+        "raw_assets": fetch_system_asset_bytes(supabase),
+        "photo_file_map": photo_file_map,
+        "photo_versions": photo_versions,
+        "timetable_map": timetable_map,
+        "eligibility_map": fetch_course_eligibility_map(),
+        "fees": {f['fee_type']: f['amount'] for f in fee_res.data},
+        # Only students that will actually get a page
+        "entries": [build_student_entry(student_index[u], subs, timetable_map, branch_map, cycle_id) for u, subs in course_map.items() if u in student_index],
+    }
 
-        total_rows = len(grid_data)
-        if total_rows <= 8:
-            row_h = 18   
-        else:
-            row_h = 15   
+# ==========================================
+# 3. PRINT FINGERPRINTS (sql/hall_ticket_prints.sql)
+# ==========================================
+def cycle_fingerprints(inputs):
+    return {e['usn']: student_fingerprint(e, inputs['fees'], inputs['timetable_map'], inputs['eligibility_map'], inputs['photo_versions'].get(clean_usn_key(e['usn'])))
+            for e in inputs['entries']}
+
+def fetch_print_fingerprints(cycle_id):
+    return {r['usn']: r['fingerprint'] for r in fetch_all_records("hall_ticket_prints", "usn, fingerprint", "cycle_id", cycle_id)}
+
+def save_print_fingerprints(cycle_id, fp_map, drop_usns=(), replace_all=False):
+    """Records what was just printed. `replace_all` resets the cycle's baseline after a full bulk run."""
+    if replace_all:
+        supabase.table("hall_ticket_prints").delete().eq("cycle_id", cycle_id).execute()
+    printed_at = datetime.datetime.now().isoformat()
+    rows = [{"cycle_id": cycle_id, "usn": u, "fingerprint": fp, "printed_at": printed_at} for u, fp in fp_map.items()]
+    for i in range(0, len(rows), 500):
+        supabase.table("hall_ticket_prints").upsert(rows[i:i+500]).execute()
+    drop_usns = list(drop_usns)
+    for i in range(0, len(drop_usns), 200):
+        supabase.table("hall_ticket_prints").delete().eq("cycle_id", cycle_id).in_("usn", drop_usns[i:i+200]).execute()
+
+def record_bulk_baseline(inputs):
+    try:
+        save_print_fingerprints(selected_cycle_id, cycle_fingerprints(inputs), replace_all=True)
+    except Exception as e:
+        st.warning(f"Print fingerprints not saved, so 'Reprint Changes' cannot track this run: {e}")
 
-        tg = Table(grid_data, colWidths=[75, 120, 35, 85, 220], rowHeights=row_h)
-        tg.setStyle(TableStyle([
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('FONTSIZE', (0,0), (-1,-1), 8),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('TOPPADDING', (0,0), (-1,-1), 2),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 2),
-        ]))
-        tg.wrapOn(c, w, 500)
-        _, gh = tg.wrap(w, 500)
-        tg.drawOn(c, 30, y - gh)
-    
-    footer_y = base_y + 20 
-    
-    c.setFont("Helvetica", 7)
-    c.drawString(30, footer_y + 45, "Candidate must read the instructions provided in the answer booklet, before the commencement of examination.")
-    
-    c.setLineWidth(0.5)
-    c.setFont("Helvetica-Bold", 9)
-    sig_w = 80
-    
-    c.line(40, footer_y + 25, 40 + sig_w, footer_y + 25)
-    c.drawCentredString(40 + sig_w/2, footer_y + 15, "Candidate")
-    
-    c.line(w/2 - sig_w/2, footer_y + 25, w/2 + sig_w/2, footer_y + 25)
-    c.drawCentredString(w/2, footer_y + 15, "CoE")
-    
-    c.line(w - 40 - sig_w, footer_y + 25, w - 40, footer_y + 25)
-    c.drawCentredString(w - 40 - sig_w/2, footer_y + 15, "Principal")
-    
-    c.setFont("Helvetica-Oblique", 7)
-    c.drawCentredString(w/2, footer_y, "Note: Please verify the eligibility of candidate before issuing the admission ticket.")
-    
-    return y - 10
+# ==========================================
+# 4. HELP-DESK CONTEXT (cached per cycle)
+# ==========================================
+HELPDESK_MAX_USNS = 50
+
+@st.cache_resource(ttl=1800, show_spinner=False)
+def load_cycle_context(cycle_id):
+    """Everything a single hall ticket needs except the student's own rows, built once per cycle and shared across sessions"""
+    fee_res = supabase.table("master_fees").select("*").execute()
+    return {
+        "assets": load_system_assets(supabase),
+        "photo_file_map": fetch_complete_bucket_map(supabase),
+        "timetable_map": fetch_timetable_map(cycle_id),
+        "eligibility_map": fetch_course_eligibility_map(),
+        "branch_map": fetch_branches_map(),
+        "fees": {f['fee_type']: f['amount'] for f in fee_res.data},
+        "loaded_at": datetime.datetime.now().strftime("%d-%m-%Y %H:%M:%S"),
+    }
+
+def fetch_helpdesk_entries(usns, cycle_id, ctx):
+    """Student rows, registrations and photos for a few USNs, fetched side by side. Returns ([(entry, photo_img)], missing, unregistered)"""
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(8, len(usns) + 2)) as ex:
+        f_stu = ex.submit(lambda: supabase.table("master_students").select("*").in_("usn", usns).execute().data)
+        f_regs = ex.submit(lambda: supabase.table("course_registrations")
+                           .select("usn, course_code, semester, master_courses(title, semester_id)")
+                           .in_("usn", usns).eq("cycle_id", cycle_id).execute().data)
+        f_photos = {u: ex.submit(download_photo, supabase, u, ctx["photo_file_map"], max_size_px=print_size_px(*PHOTO_PRINT_SIZE)) for u in usns}
+
+        students = {s['usn']: s for s in f_stu.result()}
+        course_map = {}
+        for r in f_regs.result():
+            course_map.setdefault(r['usn'], []).append(subject_from_registration(r))
+
+        ready, missing, unregistered = [], [], []
+        for u in usns:
+            if u not in students: missing.append(u); continue
+            entry = build_student_entry(students[u], course_map.get(u, []), ctx["timetable_map"], ctx["branch_map"], cycle_id)
+            if not entry['subs']: unregistered.append(u); continue
+            try: photo_io = f_photos[u].result()
+            except: photo_io = None
+            ready.append((entry, photo_reader(photo_io)))
+    return ready, missing, unregistered
 
 # ==========================================
 # 5. APP MAIN LOGIC
 # ==========================================
-tabs = st.tabs(["💰 Fees", "🚀 Bulk Generator", "📄 Individual"])
+tabs = st.tabs(["💰 Fees", "🚀 Bulk Generator", "📄 Individual", "♻️ Reprint Changes"])
 
 with tabs[0]:
     st.info(f"Setting fees for cycle: **{active_cycle_name}**")
@@ -566,190 +208,187 @@ with tabs[0]:
         
         if st.form_submit_button("Save Fees"):
             supabase.table("master_fees").upsert([{"fee_type":k, "amount":v} for k,v in [("Exam",e),("Arrear",a),("Penalty",p),("Misc",m)]]).execute()
+            load_cycle_context.clear()
             st.success("Fees Saved.")
 
 with tabs[1]:
     st.subheader(f"Bulk Generator: {active_cycle_name}")
-    if st.button("🚀 Generate All Documents (Single PDF)"):
-        with st.spinner("Step 1: Indexing Data..."):
-            system_assets = {"logo": None, "naac": None, "watermark": None}
-            sys_map = {"logo": LOGO_FILENAME, "naac": NAAC_FILENAME, "watermark": WATERMARK_FILENAME}
-            for k, f in sys_map.items():
-                try:
-                    res = supabase.storage.from_("College_Logos").download(f)
-                    if res: system_assets[k] = io.BytesIO(res) 
-                except: pass
-            
-            photo_file_map = fetch_complete_bucket_map("StakeHolders_Photos")
-            timetable_map = fetch_timetable_map(selected_cycle_id)
-            eligibility_map = fetch_course_eligibility_map()
-            branch_map = fetch_branches_map()
-            
-            fee_res = supabase.table("master_fees").select("*").execute()
-            fees = {f['fee_type']: f['amount'] for f in fee_res.data}
+    with st.expander("⚙️ Photo Download Settings"):
+        pc1, pc2 = st.columns(2)
+        photo_workers = pc1.number_input("Parallel photo downloads", min_value=1, max_value=32, value=DEFAULT_PHOTO_WORKERS)
+        photo_prefetch = pc2.number_input("Photos buffered ahead of rendering", min_value=1, max_value=256, value=DEFAULT_PHOTO_PREFETCH)
+
+    output_mode = st.radio("Output", ["Single PDF"] + VOLUME_MODES, horizontal=True)
+    per_volume = None; volume_workers = DEFAULT_VOLUME_WORKERS
+    if output_mode != "Single PDF":
+        vc1, vc2 = st.columns(2)
+        if output_mode == "Every N Students":
+            per_volume = vc1.number_input("Students per volume", min_value=10, max_value=5000, value=250, step=50)
+        else:
+            per_volume = vc1.number_input("Max students per branch volume (0 = whole branch)", min_value=0, max_value=5000, value=0, step=50) or None
+        volume_workers = vc2.number_input("Parallel volume renderers", min_value=1, max_value=16, value=DEFAULT_VOLUME_WORKERS)
+        st.caption("Volumes are rendered side by side and bundled into one ZIP with an INDEX.csv (USN → volume, page). Every PDF is bookmarked by USN.")
 
-            # 🟢 PYTHON GUARDRAIL APPLIED
-            raw_students = fetch_all_records("master_students", columns="*")
-            all_students = [s for s in raw_students if str(s.get('status', 'ACTIVE')).strip().upper() == 'ACTIVE']
-            
-            all_regs = fetch_all_records("course_registrations", "usn, course_code, semester, master_courses(title, semester_id)", "cycle_id", selected_cycle_id)
-            
-            course_map = {}
-            for r in all_regs:
-                usn = r['usn']
-                if usn not in course_map: course_map[usn] = []
-                
-                mc = r.get('master_courses') or {}
-                title = mc.get('title', "Unknown Title")
-                
-                sem = r.get('semester')
-                if not sem:
-                    sem = mc.get('semester_id', '-')
-                    
-                course_map[usn].append({"code": r['course_code'], "title": title, "sem": sem})
-                
-            usns = list(course_map.keys())
+    if st.button("🚀 Generate All Documents"):
+        with st.spinner("Step 1: Indexing Data..."):
+            inputs = collect_cycle_inputs(selected_cycle_id)
+            raw_assets, photo_file_map, entries = inputs['raw_assets'], inputs['photo_file_map'], inputs['entries']
+            timetable_map, eligibility_map, fees = inputs['timetable_map'], inputs['eligibility_map'], inputs['fees']
 
-        if not usns:
+        if not entries:
             st.warning("No student registrations found for this cycle.")
-        else:
+        elif output_mode == "Single PDF":
             progress_bar = st.progress(0); status = st.empty()
+            system_assets = prepare_system_assets(raw_assets)
             final_pdf_buffer = io.BytesIO(); c = canvas.Canvas(final_pdf_buffer, pagesize=A4)
-            total = len(usns)
+            render_usns = [e['usn'] for e in entries]
             
-            BATCH_SIZE = 50 
-            for i in range(0, total, BATCH_SIZE):
-                batch_usns = usns[i : i + BATCH_SIZE]
-                status.text(f"Processing Batch {i//BATCH_SIZE + 1} ({min(i+BATCH_SIZE, total)}/{total} students)...")
-                
-                batch_photos = {}
-                with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-                    futures = {executor.submit(download_photo_worker, (u, photo_file_map)): u for u in batch_usns}
-                    for future in concurrent.futures.as_completed(futures):
-                        u, p_stream = future.result()
-                        if p_stream: batch_photos[u] = p_stream
-
-                for u in batch_usns:
-                    stu = next((s for s in all_students if s['usn'] == u), None)
-                    if not stu: continue
-                    raw_subs = course_map.get(u, [])
-                    photo_stream = batch_photos.get(u)
-                    
-                    unique_subs = []
-                    seen_codes = set()
-                    for sub in raw_subs:
-                        if sub['code'] not in seen_codes:
-                            unique_subs.append(sub)
-                            seen_codes.add(sub['code'])
-                    
-                    subs = sort_subjects_by_timetable(unique_subs, timetable_map)
-                    
-                    db_branch_code = stu.get('branch_code', get_branch_code(u))
-                    
-                    b_info = branch_map.get(db_branch_code, {"program_type": "UG", "branch_name": db_branch_code})
-                    prog_type = b_info.get("program_type", "UG")
-                    b_name_str = b_info.get("branch_name", db_branch_code)
-                    
-                    app_id = generate_app_id(u, selected_cycle_id)
-                    draw_application_page(c, A4[0], A4[1], stu, subs, fees, system_assets, app_id, active_cycle_name, photo_stream, prog_type, db_branch_code, b_name_str)
-                    c.showPage()
-                    
-                    HALF_A4 = 841.89 / 2
-                    draw_hall_ticket_half(c, A4[0], HALF_A4, stu, subs, "STUDENT COPY", app_id, system_assets, active_cycle_name, photo_stream, timetable_map, eligibility_map, db_branch_code, b_name_str)
-                    
-                    c.setDash(4, 4)
-                    c.line(20, HALF_A4, A4[0]-20, HALF_A4)
-                    c.setDash([])
-                    
-                    draw_hall_ticket_half(c, A4[0], 0, stu, subs, "COLLEGE COPY", app_id, system_assets, active_cycle_name, photo_stream, timetable_map, eligibility_map, db_branch_code, b_name_str)
-                    c.showPage()
+            for i, (u, photo_io) in enumerate(stream_photos(supabase, render_usns, photo_file_map, max_workers=photo_workers, prefetch=photo_prefetch, max_size_px=print_size_px(*PHOTO_PRINT_SIZE))):
+                entry = entries[i]
+                # One downscaled image shared by the application page and both ticket halves
+                photo_img = photo_reader(photo_io)
+                c.bookmarkPage(u)
+                c.addOutlineEntry(f"{u} - {entry['student'].get('full_name', '')}", u, level=0)
+                draw_student_documents(c, entry, fees, system_assets, active_cycle_name, photo_img, timetable_map, eligibility_map)
                 
-                progress_bar.progress(min((i + BATCH_SIZE) / total, 1.0))
-                for stream in batch_photos.values(): stream.close()
-                batch_photos.clear() 
+                if (i + 1) % 25 == 0 or (i + 1) == len(render_usns):
+                    status.text(f"Rendered {i + 1}/{len(render_usns)} students...")
+                    progress_bar.progress((i + 1) / len(render_usns))
 
-            c.save(); status.text("Bulk Generation Complete.")
+            c.showOutline(); c.save(); status.text("Bulk Generation Complete.")
+            record_bulk_baseline(inputs)
             st.download_button("📥 Download PDF Bundle", final_pdf_buffer.getvalue(), f"Bulk_Docs_{active_cycle_name}.pdf", "application/pdf")
+        else:
+            volumes = plan_volumes(entries, output_mode, per_volume)
+            progress_bar = st.progress(0); status = st.empty()
+            status.text(f"Rendering {len(entries)} students into {len(volumes)} volumes...")
+
+            # Photos keep streaming in volume order while earlier volumes render in other processes
+            photo_feed = stream_photos(supabase, [e['usn'] for _, v in volumes for e in v], photo_file_map, max_workers=photo_workers, prefetch=photo_prefetch, max_size_px=print_size_px(*PHOTO_PRINT_SIZE))
+            bundle = VolumeZip(pages_per_student=2)
+            done_students = 0
+            try:
+                for v_idx, (v_name, pdf_path, v_usns) in enumerate(render_volumes(attach_photos(volumes, photo_feed), render_volume, init_volume_worker, (raw_assets, fees, timetable_map, eligibility_map, active_cycle_name), max_workers=volume_workers), start=1):
+                    bundle.add(v_name, pdf_path, v_usns)
+                    done_students += len(v_usns)
+                    status.text(f"Volume {v_idx}/{len(volumes)} ready ({v_name}) - {done_students}/{len(entries)} students")
+                    progress_bar.progress(v_idx / len(volumes))
+            finally:
+                photo_feed.close()
+
+            zip_file = bundle.finish()
+            status.text(f"Bulk Generation Complete: {len(volumes)} volumes.")
+            record_bulk_baseline(inputs)
+            st.download_button("📥 Download Volumes (ZIP)", zip_file, f"Bulk_Docs_{active_cycle_name}.zip", "application/zip")
 
 with tabs[2]:
     st.write("### Single Student Generator")
     
+    st.caption("Timetable, fees, branches, logos and the photo index are cached per cycle for 30 minutes. Refresh after editing any of them.")
     col1, col2 = st.columns([3, 1])
-    target_usn = col1.text_input("Enter USN to Generate:").strip().upper()
+    target_text = col1.text_area("Enter USN(s) to Generate (one per line or comma separated):", height=80)
+    if col2.button("🔄 Refresh Cached Data", help="Reload timetable, fees, branches, logos and the photo index for this cycle"):
+        load_cycle_context.clear()
     
-    if target_usn and st.button("Generate Document"):
-        with st.spinner("Fetching Data..."):
-            try:
-                system_assets = {"logo": None, "naac": None, "watermark": None}
-                sys_map = {"logo": LOGO_FILENAME, "naac": NAAC_FILENAME, "watermark": WATERMARK_FILENAME}
-                for k, f in sys_map.items():
-                    try:
-                        res = supabase.storage.from_("College_Logos").download(f)
-                        if res: system_assets[k] = io.BytesIO(res)
-                    except: pass
+    target_usns = list(dict.fromkeys(u for u in re.split(r'[\s,;]+', target_text.strip().upper()) if u))
+    
+    if target_usns and st.button("Generate Document"):
+        if len(target_usns) > HELPDESK_MAX_USNS:
+            st.error(f"Help-desk mode handles up to {HELPDESK_MAX_USNS} USNs at once. Use the Bulk Generator for larger batches.")
+        else:
+            with st.spinner("Fetching Data..."):
+                try:
+                    t0 = time.perf_counter()
+                    ctx = load_cycle_context(selected_cycle_id)
+                    ready, missing, unregistered = fetch_helpdesk_entries(target_usns, selected_cycle_id, ctx)
+                    
+                    for u in missing: st.error(f"❌ Student {u} not found.")
+                    for u in unregistered: st.error(f"No registrations found for {u} in {active_cycle_name}.")
+                    
+                    if ready:
+                        pdf_bytes = render_student_pdf(ready, ctx["fees"], ctx["assets"], active_cycle_name, ctx["timetable_map"], ctx["eligibility_map"])
+                        fname = f"{ready[0][0]['usn']}_ExamDocs.pdf" if len(ready) == 1 else f"HelpDesk_{len(ready)}_Students_ExamDocs.pdf"
+                        # Kept in session so the download survives the rerun triggered by other widgets
+                        st.session_state['helpdesk_doc'] = (selected_cycle_id, fname, pdf_bytes, [e['usn'] for e, _ in ready], time.perf_counter() - t0)
+                except Exception as e:
+                    st.error(f"Error: {e}")
+    
+    last_doc = st.session_state.get('helpdesk_doc')
+    if last_doc and last_doc[0] == selected_cycle_id:
+        _, fname, pdf_bytes, served, elapsed = last_doc
+        st.caption(f"Rendered {len(served)} student(s) in {elapsed:.2f}s")
+        st.download_button(f"📥 Download Docs for {', '.join(served[:5])}{' ...' if len(served) > 5 else ''}", pdf_bytes, fname, "application/pdf")
+
+with tabs[3]:
+    st.subheader(f"Reprint Changes: {active_cycle_name}")
+    st.info("Compares every student's registrations, exam slots, profile, photo and eligibility against the last print. Only changed or newly added students are re-rendered. Upload the previous output to get it back with those pages swapped in place.")
+    prev_file = st.file_uploader("Previous Bulk Output (Volumes ZIP or single PDF, optional)", type=["zip", "pdf"], key="reprint_prev")
+    
+    if st.button("♻️ Regenerate Changed Students"):
+        with st.spinner("Step 1: Comparing against the last print..."):
+            inputs = collect_cycle_inputs(selected_cycle_id)
+            fps = cycle_fingerprints(inputs)
+            stored = fetch_print_fingerprints(selected_cycle_id)
+        
+        if not stored:
+            st.warning("No previous print recorded for this cycle. Run the Bulk Generator once to set the baseline.")
+        else:
+            changed = [u for u in fps if u in stored and stored[u] != fps[u]]
+            added = [u for u in fps if u not in stored]
+            removed = [u for u in stored if u not in fps]
+            
+            m1, m2, m3, m4 = st.columns(4)
+            m1.metric("Unchanged", len(fps) - len(changed) - len(added))
+            m2.metric("Changed", len(changed))
+            m3.metric("New", len(added))
+            m4.metric("Removed", len(removed))
+            
+            if not (changed or added or removed):
+                st.success("✅ Nothing changed since the last print.")
+            else:
+                progress_bar = st.progress(0); status = st.empty()
+                entry_by_usn = {e['usn']: e for e in inputs['entries']}
+                system_assets = prepare_system_assets(inputs['raw_assets'])
+                render_usns = changed + added
                 
-                _, photo_stream = download_photo_worker((target_usn, fetch_complete_bucket_map("StakeHolders_Photos")))
-                timetable_map = fetch_timetable_map(selected_cycle_id)
-                eligibility_map = fetch_course_eligibility_map()
-                branch_map = fetch_branches_map()
-
-                stu_res = supabase.table("master_students").select("*").eq("usn", target_usn).execute()
-                if not stu_res.data:
-                    st.error(f"❌ Student {target_usn} not found.")
-                    st.stop()
-                stu = stu_res.data[0]
-
-                sub_res = supabase.table("course_registrations")\
-                    .select("course_code, semester, master_courses(title, semester_id)")\
-                    .eq("usn", target_usn).eq("cycle_id", selected_cycle_id).execute()
+                fresh = {}
+                for i, (u, photo_io) in enumerate(stream_photos(supabase, render_usns, inputs['photo_file_map'], max_size_px=print_size_px(*PHOTO_PRINT_SIZE))):
+                    fresh[u] = render_student_pdf([(entry_by_usn[u], photo_reader(photo_io))], inputs['fees'], system_assets, active_cycle_name, inputs['timetable_map'], inputs['eligibility_map'])
+                    status.text(f"Rendered {i + 1}/{len(render_usns)} students...")
+                    progress_bar.progress((i + 1) / max(1, len(render_usns)))
                 
-                raw_subs = []
-                for r in sub_res.data:
-                    mc = r.get('master_courses') or {}
-                    title = mc.get('title', "Unknown Title")
-                    sem = r.get('semester')
-                    if not sem:
-                        sem = mc.get('semester_id', '-')
-                    raw_subs.append({"code": r['course_code'], "title": title, "sem": sem})
-                    
-                unique_subs = []
-                seen_codes = set()
-                for sub in raw_subs:
-                    if sub['code'] not in seen_codes:
-                        unique_subs.append(sub)
-                        seen_codes.add(sub['code'])
-                        
-                subs = sort_subjects_by_timetable(unique_subs, timetable_map)
+                bundle = VolumeZip()
+                spliced = set()
+                if prev_file is not None:
+                    status.text("Splicing updated pages into the previous output...")
+                    replacements = {u: fresh[u] for u in changed}
+                    if prev_file.name.lower().endswith(".zip"):
+                        with zipfile.ZipFile(prev_file) as prev_zip:
+                            for member in sorted(n for n in prev_zip.namelist() if n.lower().endswith(".pdf") and not n.startswith("Changed_Since_Last_Print")):
+                                new_pdf, page_index, touched = splice_volume(prev_zip.read(member), replacements, removed)
+                                bundle.add_bytes(member[:-4], new_pdf, page_index)
+                                spliced.update(touched)
+                    else:
+                        new_pdf, page_index, touched = splice_volume(prev_file.getvalue(), replacements, removed)
+                        bundle.add_bytes(prev_file.name[:-4], new_pdf, page_index)
+                        spliced.update(touched)
+                    if added:
+                        late_pdf, late_index = join_student_pdfs([(u, fresh[u]) for u in sorted(added)])
+                        bundle.add_bytes("Late_Additions", late_pdf, late_index)
                 
-                db_branch_code = stu.get('branch_code', get_branch_code(target_usn))
+                if render_usns:
+                    supplement, _ = join_student_pdfs([(u, fresh[u]) for u in sorted(render_usns)])
+                    bundle.add_file("Changed_Since_Last_Print.pdf", supplement)
+                report = ["USN,Change,Spliced"] + [f"{u},{kind},{'YES' if u in spliced else 'NO'}" for kind, group in (("CHANGED", changed), ("NEW", added), ("REMOVED", removed)) for u in sorted(group)]
+                bundle.add_file("CHANGES.csv", "\n".join(report) + "\n")
                 
-                b_info = branch_map.get(db_branch_code, {"program_type": "UG", "branch_name": db_branch_code})
-                prog_type = b_info.get("program_type", "UG")
-                b_name_str = b_info.get("branch_name", db_branch_code)
-                    
-                fee_res = supabase.table("master_fees").select("*").execute()
-                fees = {f['fee_type']: f['amount'] for f in fee_res.data}
+                try:
+                    save_print_fingerprints(selected_cycle_id, {u: fps[u] for u in render_usns}, drop_usns=removed)
+                except Exception as e:
+                    st.warning(f"Print fingerprints not updated: {e}")
                 
-                if not subs:
-                    st.error(f"No registrations found for {target_usn} in {active_cycle_name}.")
-                else:
-                    buf = io.BytesIO(); c = canvas.Canvas(buf, pagesize=A4)
-                    app_id = generate_app_id(target_usn, selected_cycle_id)
-                    
-                    draw_application_page(c, A4[0], A4[1], stu, subs, fees, system_assets, app_id, active_cycle_name, photo_stream, prog_type, db_branch_code, b_name_str)
-                    c.showPage()
-                    
-                    HALF_A4 = 841.89 / 2
-                    
-                    draw_hall_ticket_half(c, A4[0], HALF_A4, stu, subs, "STUDENT COPY", app_id, system_assets, active_cycle_name, photo_stream, timetable_map, eligibility_map, db_branch_code, b_name_str)
-                    
-                    c.setDash(4, 4)
-                    c.line(20, HALF_A4, A4[0]-20, HALF_A4)
-                    c.setDash([])
-                    
-                    draw_hall_ticket_half(c, A4[0], 0, stu, subs, "COLLEGE COPY", app_id, system_assets, active_cycle_name, photo_stream, timetable_map, eligibility_map, db_branch_code, b_name_str)
-                    c.showPage(); c.save()
-                    
-                    st.download_button(f"📥 Download Docs for {target_usn}", buf.getvalue(), f"{target_usn}_ExamDocs.pdf")
-            except Exception as e:
-                st.error(f"Error: {e}")
+                missed = [u for u in changed + removed if u not in spliced]
+                if prev_file is not None and missed:
+                    st.warning(f"{len(missed)} changed/removed students were not found in the uploaded output (see CHANGES.csv).")
+                status.text("Reprint Complete.")
+                st.download_button("📥 Download Reprint Bundle (ZIP)", bundle.finish(), f"Reprint_{active_cycle_name}.zip", "application/zip")
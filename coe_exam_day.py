@@ -1,32 +1,28 @@
 import streamlit as st
 import pandas as pd
-import io
-import datetime
-import math
+import os
+import concurrent.futures
 import zipfile
-import string
-import random
-from itertools import zip_longest
+import tempfile
 from utils import init_db
-from PIL import Image as PILImage
-
-# --- PDF LIBRARIES ---
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.units import inch
-from reportlab.lib.enums import TA_CENTER, TA_LEFT, TA_RIGHT
-from reportlab.lib.utils import ImageReader
-
-# --- EXCEL UTILS ---
-from xlsxwriter.utility import xl_rowcol_to_cell, xl_col_to_name
+from seating_engine import allocate_seats
+from seating_solver import solve_seating
+from pdf_volumes import render_volumes, DEFAULT_VOLUME_WORKERS
+from dummy_codes import register_dummy_codes
+from seat_allotments import save_session_allotments, update_allotment_status, load_session_allotments, load_student_allotments
+from exam_day_docs import (SESSION_DOCS, gen_marks_bundles, allocation_fingerprint, render_session_documents, build_session_pack,
+                           init_session_worker, render_session_pack, session_pack_name)
 
 # ==========================================
 # 1. SETUP & CONFIGURATION
 # ==========================================
 LOGO_FILENAME = "College_logo.png"
 NAAC_FILENAME = "NAAC_A_Logo.jpg"
+IN_CHUNK = 200                # values per in_() call, well under PostgREST's URL limit
+FETCH_WORKERS = 6
+CACHE_TTL = 1800
+ALLOCATION_ENGINES = {"Classic (A/B alternation)": "classic", "Constraint Solver (subject/branch spacing, benches, fill)": "solver"}
+DOC_BUTTONS = [("posters", "📌 Room Posters"), ("form_b", "📝 Form B"), ("form_a", "📦 Form A"), ("qpds", "📋 QPDS"), ("appearing", "📊 Appearing List")]
 supabase = init_db()
 
 # --- GLOBAL CONTEXT ---
@@ -44,34 +40,6 @@ def load_pdf_assets():
         except: pass
     return assets
 
-def resize_image_for_excel(img_bytes, target_height=50):
-    try:
-        with PILImage.open(io.BytesIO(img_bytes)) as img:
-            w_percent = (target_height / float(img.size[1]))
-            target_width = int(float(img.size[0]) * float(w_percent))
-            
-            resized_img = img.resize((target_width, target_height), PILImage.LANCZOS)
-            if resized_img.mode != 'RGBA':
-                resized_img = resized_img.convert('RGBA')
-                
-            out_io = io.BytesIO()
-            resized_img.save(out_io, format='PNG')
-            out_io.seek(0)
-            return out_io
-    except Exception as e:
-        return io.BytesIO(img_bytes)
-
-USED_PREFIXES = set()
-
-def generate_dummy_ids(count):
-    global USED_PREFIXES
-    while True:
-        prefix = "".join(random.choices(string.ascii_uppercase, k=2))
-        if prefix not in USED_PREFIXES:
-            USED_PREFIXES.add(prefix)
-            break
-    return [f"{prefix}{i+1}" for i in range(count)]
-
 def clean_str(val):
     return str(val).strip().upper() if pd.notna(val) else ""
 
@@ -79,6 +47,40 @@ def clean_str(val):
 # 2. DATA FETCHING
 # ==========================================
 
+def fetch_in_chunks(table_name, select_query, column, values, filters=None):
+    """
+    Rows whose `column` is in `values`: the list is split into IN_CHUNK-sized in_() calls (each paged),
+    fetched side by side on a few threads.
+    """
+    values = list(dict.fromkeys(values))
+    def fetch(part):
+        rows, start, step = [], 0, 1000
+        while True:
+            query = supabase.table(table_name).select(select_query).in_(column, part)
+            for col, val in (filters or {}).items(): query = query.eq(col, val)
+            res = query.range(start, start + step - 1).execute()
+            rows.extend(res.data or [])
+            if not res.data or len(res.data) < step: return rows
+            start += step
+    parts = [values[i:i + IN_CHUNK] for i in range(0, len(values), IN_CHUNK)]
+    if len(parts) <= 1: return fetch(parts[0]) if parts else []
+    with concurrent.futures.ThreadPoolExecutor(max_workers=min(FETCH_WORKERS, len(parts))) as ex:
+        return [r for rows in ex.map(fetch, parts) for r in rows]
+
+def active_students(usns):
+    """Active students among `usns` with a Branch column (blank status counts as ACTIVE)"""
+    df_stus = pd.DataFrame(fetch_in_chunks("master_students", "usn, full_name, branch_code, status", "usn", usns))
+    if df_stus.empty: return df_stus
+    # 🟢 PANDAS GUARDRAIL: Filter Active students locally! This prevents the "No registered active students" bug.
+    df_stus['status'] = df_stus['status'].fillna('ACTIVE').astype(str).str.strip().str.upper()
+    df_stus = df_stus[df_stus['status'] == 'ACTIVE'].copy()
+    df_stus['Branch'] = df_stus['branch_code']
+    return df_stus
+
+def course_titles(codes):
+    return {r['course_code']: r['title'] for r in fetch_in_chunks("master_courses", "course_code, title", "course_code", codes)}
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
 def fetch_exam_sessions(cycle_id):
     if not cycle_id: return []
     res = supabase.table("exam_timetable").select("exam_date, session").eq("cycle_id", cycle_id).execute()
@@ -87,624 +89,124 @@ def fetch_exam_sessions(cycle_id):
     df['label'] = df['exam_date'] + " | " + df['session']
     return df.sort_values('exam_date')['label'].unique().tolist()
 
+@st.cache_data(ttl=CACHE_TTL, show_spinner="Loading session roster...")
 def fetch_exam_data(cycle_id, date_str, session_str):
+    """Session roster, cached per (cycle, date, session) until refresh_exam_day_cache() or the TTL"""
     tt_res = supabase.table("exam_timetable").select("course_code").eq("cycle_id", cycle_id).eq("exam_date", date_str).eq("session", session_str).execute()
     course_codes = [r['course_code'] for r in tt_res.data]
     if not course_codes: return pd.DataFrame()
     
-    start = 0; limit = 1000; all_regs = []
-    while True:
-        res = supabase.table("course_registrations").select("usn, course_code").eq("cycle_id", cycle_id).in_("course_code", course_codes).range(start, start + limit - 1).execute()
-        if not res.data: break
-        all_regs.extend(res.data)
-        if len(res.data) < limit: break
-        start += limit
-        
+    all_regs = fetch_in_chunks("course_registrations", "usn, course_code", "course_code", course_codes, {"cycle_id": cycle_id})
     if not all_regs: return pd.DataFrame()
     df_regs = pd.DataFrame(all_regs)
     
-    usns = df_regs['usn'].unique().tolist()
-    start = 0; all_stus = []
-    while True:
-        # 🟢 PANDAS GUARDRAIL: Fetch matching USNs without the Supabase filter to bypass API quirks
-        res = supabase.table("master_students").select("usn, full_name, branch_code, status").in_("usn", usns).range(start, start + limit - 1).execute()
-        if not res.data: break
-        all_stus.extend(res.data)
-        if len(res.data) < limit: break
-        start += limit
-        
-    df_stus = pd.DataFrame(all_stus)
+    df_stus = active_students(df_regs['usn'].unique().tolist())
     if df_stus.empty: return pd.DataFrame()
     
-    # 🟢 PANDAS GUARDRAIL: Filter Active students locally! This prevents the "No registered active students" bug.
-    df_stus['status'] = df_stus['status'].fillna('ACTIVE').astype(str).str.strip().str.upper()
-    df_stus = df_stus[df_stus['status'] == 'ACTIVE'].copy()
-    
-    if df_stus.empty: return pd.DataFrame()
-    
-    df_stus['Branch'] = df_stus['branch_code']
-    
     df_merged = pd.merge(df_regs, df_stus, on='usn', how='inner')
     df_merged.rename(columns={'usn': 'USN', 'full_name': 'Student Name', 'course_code': 'Subject Code'}, inplace=True)
     
-    courses_res = supabase.table("master_courses").select("course_code, title").in_("course_code", course_codes).execute()
-    course_dict = {r['course_code']: r['title'] for r in courses_res.data}
-    df_merged['Subject Name'] = df_merged['Subject Code'].map(lambda x: course_dict.get(x, x))
+    course_dict = course_titles(course_codes)
+    df_merged['Subject Name'] = df_merged['Subject Code'].map(course_dict).fillna(df_merged['Subject Code'])
     
     return df_merged
 
+def fetch_all_records(table_name, select_query="*", filters=None):
+    all_data = []
+    start, step = 0, 1000
+    while True:
+        query = supabase.table(table_name).select(select_query)
+        if filters:
+            for col, val in filters.items(): query = query.eq(col, val)
+        res = query.range(start, start + step - 1).execute()
+        if not res.data: break
+        all_data.extend(res.data)
+        if len(res.data) < step: break
+        start += step
+    return all_data
+
+def fetch_cycle_rosters(cycle_id):
+    """
+    Every session's roster for the cycle in one pass (timetable, registrations, students and titles fetched once)
+    -> {(exam_date, session): DataFrame shaped like fetch_exam_data}
+    """
+    df_tt = pd.DataFrame(fetch_all_records("exam_timetable", "course_code, exam_date, session", {"cycle_id": cycle_id}))
+    if df_tt.empty: return {}
+    df_regs = pd.DataFrame(fetch_all_records("course_registrations", "usn, course_code", {"cycle_id": cycle_id}))
+    if df_regs.empty: return {}
+    df_regs = df_regs[df_regs['course_code'].isin(df_tt['course_code'])]
+
+    df_stus = active_students(df_regs['usn'].unique().tolist())
+    if df_stus.empty: return {}
+    course_dict = course_titles(df_tt['course_code'].unique().tolist())
+
+    df = pd.merge(df_regs, df_stus, on='usn', how='inner').merge(df_tt.drop_duplicates(), on='course_code', how='inner')
+    df.rename(columns={'usn': 'USN', 'full_name': 'Student Name', 'course_code': 'Subject Code'}, inplace=True)
+    df['Subject Name'] = df['Subject Code'].map(course_dict).fillna(df['Subject Code'])
+    return {key: g.drop(columns=['exam_date', 'session']).reset_index(drop=True) for key, g in df.groupby(['exam_date', 'session'], sort=True)}
+
+@st.cache_data(ttl=CACHE_TTL, show_spinner=False)
 def fetch_rooms():
     res = supabase.table("master_rooms").select("*").order("priority_order").execute()
     return pd.DataFrame(res.data) if res.data else pd.DataFrame()
 
-# ==========================================
-# 3. ALLOCATION ENGINE
-# ==========================================
-
-def run_allocation(df_students, df_rooms):
-    subj_map = {
-        '1BKSK109': '1BKSK209', '1BKBK109': '1BKBK209',
-        '1BENG106': '1BENG206'
-    }
-    df_students['AllocCode'] = df_students['Subject Code'].replace(subj_map)
+def refresh_exam_day_cache():
+    """Drops cached sessions, rosters and rooms (after timetable, registration or room edits)"""
+    fetch_exam_sessions.clear()
+    fetch_exam_data.clear()
+    fetch_rooms.clear()
 
-    branch_counts = df_students.groupby(['AllocCode', 'Branch']).size().to_dict()
-    df_students['BranchSize'] = df_students.apply(lambda x: branch_counts[(x['AllocCode'], x['Branch'])], axis=1)
-    
-    df_students = df_students.sort_values(['AllocCode', 'BranchSize', 'Branch', 'USN'], ascending=[True, False, True, True])
+def clear_allocation():
+    if "alloc_df" in st.session_state: del st.session_state["alloc_df"]
+    if "alloc_report" in st.session_state: del st.session_state["alloc_report"]
+
+def cached_document(kind, key, build=None):
+    """
+    Session-state document cache, one entry per kind. Returns the bytes stored under `key`; on a miss
+    builds them when `build` is given, otherwise returns None.
+    """
+    cache = st.session_state.setdefault("doc_cache", {})
+    if kind in cache and cache[kind][0] == key: return cache[kind][1]
+    if build is None: return None
+    data = build()
+    cache[kind] = (key, data)
+    return data
 
-    OMR_SUBJECTS = ['1BKSK209', '1BKBK209', '1BENG206']
-    allotment_rows = []
-    
-    df_rooms = df_rooms.sort_values('room_no')
-    rooms_list = df_rooms.to_dict('records')
-    room_idx = 0
-
-    def get_next_room():
-        nonlocal room_idx
-        if room_idx < len(rooms_list):
-            r = rooms_list[room_idx]
-            room_idx += 1
-            return r['room_no'], int(r['capacity'])
-        return None, 0
-
-    current_room_no, current_capacity = get_next_room()
-
-    df_omr = df_students[df_students['AllocCode'].isin(OMR_SUBJECTS)]
-    if not df_omr.empty:
-        for code in sorted(df_omr['AllocCode'].unique()):
-            code_df = df_omr[df_omr['AllocCode'] == code]
-            current_seat = 1
-            
-            if (allotment_rows and allotment_rows[-1]['RoomNo'] == current_room_no) or current_seat > 1:
-                current_room_no, current_capacity = get_next_room()
-                current_seat = 1
-
-            students = code_df.to_dict('records')
-            while students:
-                if not current_room_no: break
-                if current_seat > current_capacity:
-                    current_room_no, current_capacity = get_next_room()
-                    current_seat = 1
-                    if not current_room_no: break
-
-                s = students.pop(0)
-                allotment_rows.append({
-                    'RoomNo': current_room_no, 'SeatNo': current_seat,
-                    'USN': s['USN'], 'Student Name': s['Student Name'],
-                    'Branch': s['Branch'], 'Subject Code': s['Subject Code'],
-                    'Subject Name': s['Subject Name']
-                })
-                current_seat += 1
-
-        if current_seat > 1:
-            current_room_no, current_capacity = get_next_room()
-
-    df_reg = df_students[~df_students['AllocCode'].isin(OMR_SUBJECTS)]
-    if not df_reg.empty:
-        subj_queues = {}
-        for code in df_reg['AllocCode'].unique():
-            subj_queues[code] = df_reg[df_reg['AllocCode'] == code].to_dict('records')
-
-        active_subjs = sorted(subj_queues.keys(), key=lambda k: len(subj_queues[k]), reverse=True)
-
-        while active_subjs and current_room_no:
-            subj_A = active_subjs[0]
-            subj_B = active_subjs[1] if len(active_subjs) > 1 else None
-
-            for seat in range(1, current_capacity + 1):
-                target_subj = subj_A if seat % 2 != 0 else (subj_B or subj_A)
-
-                if target_subj and not subj_queues[target_subj]:
-                    target_subj = subj_B if target_subj == subj_A else subj_A
-
-                if target_subj is None or not subj_queues[target_subj]:
-                    active_subjs = [s for s in active_subjs if subj_queues[s]]
-                    if not active_subjs: break
-                    subj_A = active_subjs[0]
-                    subj_B = active_subjs[1] if len(active_subjs) > 1 else None
-                    target_subj = subj_A 
-
-                student = subj_queues[target_subj].pop(0)
-                allotment_rows.append({
-                    'RoomNo': current_room_no, 'SeatNo': seat,
-                    'USN': student['USN'], 'Student Name': student['Student Name'],
-                    'Branch': student['Branch'], 'Subject Code': student['Subject Code'],
-                    'Subject Name': student['Subject Name']
-                })
-
-                if not subj_queues[target_subj]:
-                    active_subjs = [s for s in active_subjs if subj_queues[s]]
-                    if active_subjs:
-                        subj_A = active_subjs[0]
-                        subj_B = active_subjs[1] if len(active_subjs) > 1 else None
-
-            current_room_no, current_capacity = get_next_room()
-
-    return pd.DataFrame(allotment_rows)
-    
 # ==========================================
-# 4. DOCUMENT GENERATORS
+# 3. ALLOCATION ENGINE
 # ==========================================
 
-def get_header_drawer(assets):
-    def draw_header(c, doc):
-        c.saveState()
-        y_start = A4[1] - 35
-        
-        if "logo" in assets:
-            c.drawImage(ImageReader(io.BytesIO(assets["logo"])), 35, y_start - 35, width=50, height=50, mask='auto', preserveAspectRatio=True)
-            
-        if "naac" in assets:
-            c.drawImage(ImageReader(io.BytesIO(assets["naac"])), A4[0] - 85, y_start - 35, width=50, height=50, mask='auto', preserveAspectRatio=True)
-
-        c.setFont("Helvetica-Bold", 14)
-        c.drawCentredString(A4[0]/2, y_start, "AMC ENGINEERING COLLEGE")
-        c.setFont("Helvetica", 9)
-        c.drawCentredString(A4[0]/2, y_start - 15, "AMC Campus, Bannerghatta Road, Bengaluru - 560083")
-        c.drawCentredString(A4[0]/2, y_start - 27, "Autonomous Institution Affiliated to VTU, Belagavi")
-        c.drawCentredString(A4[0]/2, y_start - 39, "Approved by AICTE, New Delhi | NAAC A+ Accredited")
-        
-        c.setLineWidth(1)
-        c.line(30, y_start - 48, A4[0] - 30, y_start - 48)
-        c.restoreState()
-    return draw_header
-
-def gen_posters(df, date, session, assets):
-    buf = io.BytesIO(); doc = SimpleDocTemplate(buf, pagesize=A4, topMargin=95, bottomMargin=15)
-    elements = []; styles = getSampleStyleSheet()
-    s_seat = ParagraphStyle('S', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, textColor=colors.gray)
-    s_usn = ParagraphStyle('U', parent=styles['Normal'], fontSize=11, fontName='Helvetica-Bold', alignment=TA_CENTER)
-    s_sub = ParagraphStyle('Sub', parent=styles['Normal'], fontSize=7, alignment=TA_CENTER)
-    
-    for room_no, data in df.groupby('RoomNo'):
-        elements.append(Paragraph(f"ROOM: {room_no} | Date: {date} | Session: {session}", styles['Heading2']))
-        elements.append(Spacer(1, 5))
-        
-        students = data.sort_values('SeatNo').to_dict('records')
-        grid = []; row_buf = []
-        for s in students:
-            row_buf.append([Paragraph(f"Seat: {s['SeatNo']}", s_seat), Spacer(1,1), Paragraph(s['USN'], s_usn), Spacer(1,1), Paragraph(s['Subject Code'], s_sub)])
-            if len(row_buf) == 4: grid.append(row_buf); row_buf = []
-        if row_buf:
-            while len(row_buf) < 4: row_buf.append("")
-            grid.append(row_buf)
-            
-        t = Table(grid, colWidths=[1.8*inch]*4)
-        t.setStyle(TableStyle([('GRID', (0,0), (-1,-1), 0.5, colors.black), ('VALIGN', (0,0), (-1,-1), 'MIDDLE'), ('ALIGN', (0,0), (-1,-1), 'CENTER')]))
-        elements.append(t); elements.append(PageBreak())
-        
-    doc.build(elements, onFirstPage=get_header_drawer(assets), onLaterPages=get_header_drawer(assets))
-    return buf.getvalue()
-
-def gen_form_b(df, date, session, assets):
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=A4, topMargin=90, leftMargin=35, rightMargin=35, bottomMargin=15)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    sub_title_style = ParagraphStyle('SubTitle', parent=styles['Normal'], alignment=TA_CENTER, fontName='Helvetica-Bold', fontSize=10)
-    meta_style = ParagraphStyle('Meta', parent=styles['Normal'], fontSize=9, leading=12)
-    th_style = ParagraphStyle('th', parent=styles['Normal'], alignment=TA_CENTER, fontName='Helvetica-Bold', fontSize=8)
-    td_style_c = ParagraphStyle('td_c', parent=styles['Normal'], alignment=TA_CENTER, fontSize=9)
-    td_style_l = ParagraphStyle('td_l', parent=styles['Normal'], alignment=TA_LEFT, fontSize=8)
-    
-    for (room, code), group in df.groupby(['RoomNo', 'Subject Code']):
-        course_name = group['Subject Name'].iloc[0] if 'Subject Name' in group.columns else code
-        branch_val = group['Branch'].iloc[0] if 'Branch' in group.columns else "N/A"
-        
-        elements.append(Spacer(1, 5))
-        elements.append(Paragraph("ATTENDANCE & ROOM SUPERINTENDENT’S/EXAMINERS REPORT (In Triplicate)", sub_title_style))
-        elements.append(Spacer(1, 8))
-        
-        m_data = [
-            [Paragraph(f"<b>B.E./B.Arch./MCA/MBA/M.Tech:</b> {branch_val}", meta_style), Paragraph(f"<b>Semester Examination:</b> {date}", meta_style), Paragraph(f"<b>Block No:</b> {room}", meta_style)],
-            [Paragraph(f"<b>Branch / Title of the course:</b> {branch_val}", meta_style), Paragraph(f"<b>Subject Code:</b> {code}", meta_style), ""],
-            [Paragraph(f"<b>Subject:</b> {course_name}", meta_style), "", ""],
-            [Paragraph(f"<b>Centre:</b> AMC ENGINEERING COLLEGE", meta_style), Paragraph(f"<b>Seat No's from:</b> {group['USN'].min()} <b>TO</b> {group['USN'].max()}", meta_style), ""],
-            [Paragraph(f"<b>Date:</b> {date}", meta_style), "", Paragraph(f"<b>Time:</b> {session}", meta_style)]
-        ]
-        
-        m_table = Table(m_data, colWidths=[2.7*inch, 2.7*inch, 2.0*inch])
-        m_table.setStyle(TableStyle([
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('SPAN', (0,2), (2,2)), 
-            ('BOTTOMPADDING', (0,0), (-1,-1), 4)
-        ]))
-        elements.append(m_table)
-        elements.append(Spacer(1, 5))
-        
-        t_data = [[
-            Paragraph("<b>ROLL NO</b>", th_style),
-            Paragraph("<b>Seat Number of the Candidate</b>", th_style),
-            Paragraph("<b>Answer Book/Main Drawing Sheet Number</b>", th_style),
-            Paragraph("<b>Signature of the Candidate</b>", th_style),
-            Paragraph("<b>Additional/Drawing/ Graph Sheet Numbers</b>", th_style),
-            Paragraph("<b>Total</b>", th_style)
-        ]]
-        
-        for _, r in group.sort_values('SeatNo').iterrows():
-            t_data.append([Paragraph(r['USN'], td_style_c), Paragraph(str(r['Student Name']), td_style_l), "", "", "", ""])
-            
-        t = Table(t_data, colWidths=[1.1*inch, 2.1*inch, 1.3*inch, 1.3*inch, 1.1*inch, 0.5*inch])
-        t.setStyle(TableStyle([
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 2), 
-            ('TOPPADDING', (0,0), (-1,-1), 2),
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-        ]))
-        elements.append(t)
-        elements.append(Spacer(1, 10))
-        
-        f_data = [
-            [Paragraph("<b>Seat Number of the candidates absent:</b> ____________________________________________________________________", meta_style), "", ""],
-            [Paragraph("<b>Seat Number of the candidates booked under Malpractice:</b> ________________________________________________________", meta_style), "", ""],
-            [Paragraph(f"<b>Total Number of students:</b> {len(group)}", meta_style), Paragraph("<b>Total Present:</b> ________", meta_style), Paragraph("<b>Total Absent:</b> ________", meta_style)],
-            ["\n\nSignature of Room Superintendent", "", "\n\nSignature of Chief Superintendent"]
-        ]
-        f_table = Table(f_data, colWidths=[3.6*inch, 1.9*inch, 1.9*inch])
-        f_table.setStyle(TableStyle([
-            ('SPAN', (0,0), (2,0)), 
-            ('SPAN', (0,1), (2,1)), 
-            ('ALIGN', (0,3), (2,3), 'CENTER'), 
-            ('VALIGN', (0,0), (-1,-1), 'BOTTOM'),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 5)
-        ]))
-        elements.append(f_table)
-        elements.append(PageBreak())
-        
-    doc.build(elements, onFirstPage=get_header_drawer(assets), onLaterPages=get_header_drawer(assets))
-    return buf.getvalue()
-
-def gen_form_a(df, date, session, assets, cycle_name):
-    buf = io.BytesIO()
-    doc = SimpleDocTemplate(buf, pagesize=A4, topMargin=90, leftMargin=35, rightMargin=35, bottomMargin=30)
-    elements = []
-    styles = getSampleStyleSheet()
-    
-    title_style = ParagraphStyle('Title', parent=styles['Heading3'], alignment=TA_CENTER, fontName='Helvetica-Bold', fontSize=12)
-    sub_title_style = ParagraphStyle('SubTitle', parent=styles['Normal'], alignment=TA_CENTER, fontName='Helvetica-Bold', fontSize=10)
-    meta_style = ParagraphStyle('Meta', parent=styles['Normal'], fontSize=10, leading=14)
-    th_style = ParagraphStyle('th', parent=styles['Normal'], fontName='Helvetica-Bold', fontSize=10)
-    td_style_l = ParagraphStyle('td_l', parent=styles['Normal'], fontSize=9, leading=14, alignment=TA_LEFT)
-    td_style_c = ParagraphStyle('td_c', parent=styles['Normal'], fontSize=10, alignment=TA_CENTER, fontName='Helvetica-Bold')
-    
-    for (branch, code), group in df.groupby(['Branch', 'Subject Code']):
-        course_name = group['Subject Name'].iloc[0] if 'Subject Name' in group.columns else code
-        
-        elements.append(Spacer(1, 5))
-        elements.append(Paragraph("FORM - A", title_style))
-        elements.append(Paragraph("CONSOLIDATED ATTENDANCE REPORT FOR PACKING OF ANSWER SCRIPTS  (In Duplicate)", sub_title_style))
-        elements.append(Spacer(1, 15))
-        
-        elements.append(Paragraph(f"<b>Semester End Examination - {cycle_name}</b>", sub_title_style))
-        elements.append(Spacer(1, 10))
-        
-        m_data = [
-            [Paragraph(f"<b>Branch / Program:</b>", meta_style), Paragraph(f"{branch}", meta_style), "", ""],
-            [Paragraph(f"<b>Course Title:</b>", meta_style), Paragraph(f"{course_name}", meta_style), Paragraph(f"<b>Course Code:</b>", meta_style), Paragraph(f"{code}", meta_style)],
-            [Paragraph(f"<b>Date:</b>", meta_style), Paragraph(f"{date}", meta_style), Paragraph(f"<b>Time:</b>", meta_style), Paragraph(f"{session}", meta_style)]
-        ]
-        
-        m_table = Table(m_data, colWidths=[1.3*inch, 3.2*inch, 1.2*inch, 1.3*inch])
-        m_table.setStyle(TableStyle([
-            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 6)
-        ]))
-        elements.append(m_table)
-        elements.append(Spacer(1, 15))
-        
-        present_usns = group[group['Status'] == 'PRESENT']['USN'].sort_values().tolist()
-        absent_usns = group[group['Status'] == 'ABSENT']['USN'].sort_values().tolist()
-        malpractice_usns = group[group['Status'] == 'MALPRACTICE']['USN'].sort_values().tolist()
-        
-        t_data = []
-        t_styles = [
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('TOPPADDING', (0,0), (-1,-1), 6),
-            ('BOTTOMPADDING', (0,0), (-1,-1), 6),
-        ]
-        
-        current_row = 0
-        
-        def add_section(title, usn_list, total_count):
-            nonlocal current_row
-            t_data.append([Paragraph(f"<b>{title}</b>", th_style), Paragraph("<b>COUNT</b>", th_style)])
-            t_styles.append(('BACKGROUND', (0, current_row), (-1, current_row), colors.lightgrey))
-            current_row += 1
-            
-            if not usn_list:
-                t_data.append([Paragraph("Nil", td_style_l), Paragraph("0", td_style_c)])
-                current_row += 1
-            else:
-                chunk_size = 60 
-                for i in range(0, len(usn_list), chunk_size):
-                    chunk = usn_list[i:i+chunk_size]
-                    count_text = str(total_count) if i == 0 else "" 
-                    t_data.append([Paragraph(", ".join(chunk), td_style_l), Paragraph(count_text, td_style_c)])
-                    current_row += 1
-
-        add_section("SEAT NUMBERS OF CANDIDATES PRESENT", present_usns, len(present_usns))
-        add_section("SEAT NUMBERS OF CANDIDATES ABSENT", absent_usns, len(absent_usns))
-        add_section("SEAT NUMBERS OF CANDIDATES BOOKED UNDER MALPRACTICE", malpractice_usns, len(malpractice_usns))
-        
-        t = Table(t_data, colWidths=[6.2*inch, 1.0*inch])
-        t.setStyle(TableStyle(t_styles))
-        elements.append(t)
-        elements.append(Spacer(1, 30))
-        
-        elements.append(Paragraph("<b>Signatures with date:</b>", meta_style))
-        elements.append(Spacer(1, 30))
-        
-        sig_data = [
-            ["Deputy Chief Superintendent", "Chief Superintendent"]
-        ]
-        sig_table = Table(sig_data, colWidths=[3.5*inch, 3.5*inch])
-        sig_table.setStyle(TableStyle([
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('FONTNAME', (0,0), (-1,-1), 'Helvetica-Bold')
-        ]))
-        elements.append(sig_table)
-        elements.append(PageBreak())
-        
-    doc.build(elements, onFirstPage=get_header_drawer(assets), onLaterPages=get_header_drawer(assets))
-    return buf.getvalue()
-
-def gen_qpds(df, date, session, assets):
-    buf = io.BytesIO(); doc = SimpleDocTemplate(buf, pagesize=A4, topMargin=95)
-    elements = []; styles = getSampleStyleSheet()
-    elements.append(Paragraph("<b>QP INDENT (ROOM WISE)</b>", styles['Heading2']))
-    elements.append(Paragraph(f"Date: {date} | Session: {session}", styles['Normal']))
-    elements.append(Spacer(1, 15))
-    
-    for room, data in df.groupby('RoomNo'):
-        elements.append(Paragraph(f"<b>ROOM: {room}</b>", styles['Heading3']))
-        counts = data.groupby('Subject Code').size().reset_index(name='Qty')
-        t_data = [['Course Code', 'Quantity']]
-        for _, r in counts.iterrows(): t_data.append([r['Subject Code'], str(r['Qty'])])
-        t_data.append(['TOTAL', str(counts['Qty'].sum())])
-        
-        t = Table(t_data, colWidths=[2*inch, 1*inch])
-        t.setStyle(TableStyle([('GRID', (0,0), (-1,-1), 0.5, colors.black)]))
-        elements.append(t); elements.append(Spacer(1, 10))
-        
-    doc.build(elements, onFirstPage=get_header_drawer(assets), onLaterPages=get_header_drawer(assets))
-    return buf.getvalue()
-
-def gen_smart_excel(df, date, session):
-    buf = io.BytesIO()
-    with pd.ExcelWriter(buf, engine='xlsxwriter') as writer:
-        df_sorted = df.sort_values(['Branch', 'USN'])
-        df_sorted.to_excel(writer, sheet_name='Appearing_List', index=False, columns=['RoomNo', 'SeatNo', 'USN', 'Student Name', 'Branch', 'Subject Code'])
-        summary = df.groupby(['RoomNo', 'Subject Code']).size().reset_index(name='Count')
-        summary.to_excel(writer, sheet_name='Room_Summary', index=False)
-    return buf.getvalue()
-
-def create_locked_bundle(df, course_code, course_name, b_group, bundle_seq, total_bundles, cycle_name, assets):
-    out = io.BytesIO()
-    is_mba = 'MBA' in course_code.upper()
-    num_q = 8 if is_mba else 10
-    
-    with pd.ExcelWriter(out, engine='xlsxwriter') as writer:
-        wb = writer.book
-        ws_marks = wb.add_worksheet('Marks Entry')
-        ws_print = wb.add_worksheet('Print')
-        
-        fmt_title = wb.add_format({'bold': True, 'align': 'center', 'valign': 'vcenter', 'font_size': 14})
-        fmt_sub = wb.add_format({'bold': True, 'align': 'center', 'valign': 'vcenter', 'font_size': 11})
-        fmt_head = wb.add_format({'bold': True, 'align': 'center', 'valign': 'vcenter', 'border': 1, 'bg_color': '#f0f0f0', 'text_wrap': True})
-        fmt_locked = wb.add_format({'locked': True, 'align': 'center', 'valign': 'vcenter', 'border': 1})
-        fmt_locked_gray = wb.add_format({'locked': True, 'align': 'center', 'valign': 'vcenter', 'border': 1, 'bg_color': '#e0e0e0'})
-        fmt_edit = wb.add_format({'locked': False, 'align': 'center', 'valign': 'vcenter', 'border': 1, 'bg_color': '#FFFFCC'})
-        fmt_abs = wb.add_format({'locked': True, 'align': 'center', 'valign': 'vcenter', 'border': 1, 'bg_color': '#FFC7CE', 'font_color': '#9C0006', 'bold': True})
-        fmt_footer = wb.add_format({'bold': True, 'font_size': 11, 'valign': 'vcenter'})
-        fmt_footer_val = wb.add_format({'bold': True, 'font_size': 11, 'valign': 'vcenter', 'align': 'left', 'font_color': '#0000FF'})
-        
-        end_col_idx = 2 + (num_q * 4) 
-        col_tot = xl_col_to_name(end_col_idx)
-        col_mod = xl_col_to_name(end_col_idx + 1)
-        col_diff = xl_col_to_name(end_col_idx + 2)
-        col_final = xl_col_to_name(end_col_idx + 3)
-        last_q_col = xl_col_to_name(end_col_idx - 1)
-
-        ws_marks.protect('admin123')
-        ws_marks.merge_range(f'A1:{col_final}1', 'AMC Engineering College', fmt_title)
-        ws_marks.merge_range(f'A2:{col_final}2', 'AMC Campus Bannerghatta Road, Bengaluru', fmt_sub)
-        ws_marks.merge_range(f'A3:{col_final}3', 'Autonomous Institution under VTU, Belagavi | NAAC A+ Accredited', fmt_sub)
-        ws_marks.merge_range(f'A5:{col_final}5', f'Semester End Examination - {cycle_name} | CBCS Scheme', fmt_sub)
-        ws_marks.merge_range(f'A6:{col_final}6', f'Evaluation & Marks Allotment | Course: {course_code} - {course_name} | Bundle {bundle_seq}/{total_bundles}', fmt_sub)
-        
-        ws_marks.merge_range('A8:A9', 'Sl. No.', fmt_head)
-        ws_marks.merge_range('B8:B9', 'Coding No.', fmt_head)
-        
-        col_idx = 2
-        for q in range(1, num_q + 1):
-            ws_marks.merge_range(7, col_idx, 7, col_idx+2, f'Q. {q}', fmt_head)
-            ws_marks.write(8, col_idx, 'a', fmt_head)
-            ws_marks.write(8, col_idx+1, 'b', fmt_head)
-            ws_marks.write(8, col_idx+2, 'c', fmt_head)
-            ws_marks.merge_range(7, col_idx+3, 8, col_idx+3, f'Q.{q} Total', fmt_head)
-            col_idx += 4
-            
-        ws_marks.merge_range(7, end_col_idx, 8, end_col_idx, 'Total SEE Marks (100)', fmt_head)
-        ws_marks.merge_range(7, end_col_idx+1, 8, end_col_idx+1, 'Total Moderation', fmt_head)
-        ws_marks.merge_range(7, end_col_idx+2, 8, end_col_idx+2, 'Marks Difference', fmt_head)
-        ws_marks.merge_range(7, end_col_idx+3, 8, end_col_idx+3, 'Final SEE Marks (100)', fmt_head)
-        
-        row_idx = 9
-        for local_idx, (_, s) in enumerate(df.iterrows()):
-            ws_marks.write(row_idx, 0, local_idx+1, fmt_locked)
-            ws_marks.write(row_idx, 1, s['Dummy_ID'], fmt_locked) 
-            
-            if s['Status'] != "PRESENT":
-                for c in range(2, end_col_idx+3): ws_marks.write(row_idx, c, "", fmt_locked_gray)
-                ws_marks.write(row_idx, end_col_idx+3, s['Status'], fmt_abs)
-            else:
-                c = 2
-                for q in range(1, num_q + 1):
-                    ws_marks.write(row_idx, c, "", fmt_edit)
-                    ws_marks.write(row_idx, c+1, "", fmt_edit)
-                    ws_marks.write(row_idx, c+2, "", fmt_edit)
-                    cell_a = xl_rowcol_to_cell(row_idx, c)
-                    cell_c = xl_rowcol_to_cell(row_idx, c+2)
-                    ws_marks.write_formula(row_idx, c+3, f'=SUM({cell_a}:{cell_c})', fmt_locked)
-                    c += 4
-                
-                r = row_idx + 1
-                if is_mba:
-                    q1_7_cells = f"F{r},J{r},N{r},R{r},V{r},Z{r},AD{r}"
-                    formula_see = f"=IFERROR(LARGE(({q1_7_cells}),1),0)+IFERROR(LARGE(({q1_7_cells}),2),0)+IFERROR(LARGE(({q1_7_cells}),3),0)+IFERROR(LARGE(({q1_7_cells}),4),0)+AH{r}"
-                else:
-                    formula_see = f"=MAX(F{r},J{r})+MAX(N{r},R{r})+MAX(V{r},Z{r})+MAX(AD{r},AH{r})+MAX(AL{r},AP{r})"
-                
-                ws_marks.write_formula(row_idx, end_col_idx, formula_see, fmt_locked)
-                ws_marks.write(row_idx, end_col_idx+1, "", fmt_edit) 
-                
-                ws_marks.write_formula(row_idx, end_col_idx+2, f'=IF({col_mod}{r}>0,{col_tot}{r}-{col_mod}{r},"")', fmt_locked)
-                ws_marks.write_formula(row_idx, end_col_idx+3, f"=MAX({col_tot}{r},{col_mod}{r})", fmt_locked)
-
-            row_idx += 1
-            
-        eval_row = row_idx + 2
-        ws_marks.merge_range(eval_row, 0, eval_row, 1, "Evaluator Name:", fmt_head)
-        ws_marks.merge_range(eval_row, 2, eval_row, 5, "", fmt_edit) 
-        eval_input_cell = xl_rowcol_to_cell(eval_row, 2)
-            
-        ws_marks.set_column('A:A', 8)
-        ws_marks.set_column('B:B', 12)
-        ws_marks.set_column(f'C:{last_q_col}', 5)
-        ws_marks.set_column(f'{col_tot}:{col_final}', 14)
-        
-        ws_print.protect('admin123')
-        ws_print.set_row(0, 45) 
-        
-        ws_print.merge_range('A1:D1', 'AMC Engineering College', fmt_title)
-        ws_print.merge_range('A2:D2', f'Semester End Examination - {cycle_name}', fmt_sub)
-        ws_print.merge_range('A3:D3', f'Course Code: {course_code} | Course Title: {course_name}', fmt_sub)
-        
-        if "logo" in assets:
-            ws_print.insert_image('A1', 'logo.png', {'image_data': resize_image_for_excel(assets["logo"]), 'x_offset': 10, 'y_offset': 5})
-        if "naac" in assets:
-            ws_print.insert_image('D1', 'naac.png', {'image_data': resize_image_for_excel(assets["naac"]), 'x_offset': 180, 'y_offset': 5})
-
-        headers_print = ['Sl. No.', 'Answer Booklet Code', 'SEE Marks in Figures (100)', 'SEE Marks in Words']
-        for c, h in enumerate(headers_print):
-            ws_print.write(4, c, h, fmt_head)
-            
-        row_idx = 5
-        for local_idx, (_, s) in enumerate(df.iterrows()):
-            ws_print.write(row_idx, 0, local_idx+1, fmt_locked)
-            ws_print.write(row_idx, 1, s['Dummy_ID'], fmt_locked)
-            
-            if s['Status'] != "PRESENT":
-                ws_print.write(row_idx, 2, s['Status'], fmt_abs)
-                ws_print.write(row_idx, 3, "-", fmt_locked_gray)
-            else:
-                final_marks_cell = xl_rowcol_to_cell(9 + local_idx, end_col_idx+3) 
-                ws_print.write_formula(row_idx, 2, f"='Marks Entry'!{final_marks_cell}", fmt_locked)
-                
-                c_cell = xl_rowcol_to_cell(row_idx, 2) 
-                ch = 'CHOOSE(MID({},{},1)+1, "Zero","One","Two","Three","Four","Five","Six","Seven","Eight","Nine")'
-                p1 = f'IF(LEN({c_cell})>=1, {ch.format(c_cell, 1)}, "")'
-                p2 = f'IF(LEN({c_cell})>=2, " " & {ch.format(c_cell, 2)}, "")'
-                p3 = f'IF(LEN({c_cell})>=3, " " & {ch.format(c_cell, 3)}, "")'
-                words_formula = f'=IF({c_cell}="","",TRIM({p1} & {p2} & {p3}))'
-                
-                ws_print.write_formula(row_idx, 3, words_formula, fmt_locked)
-                
-            row_idx += 1
-            
-        ws_print.set_column('A:A', 8)
-        ws_print.set_column('B:B', 20)
-        ws_print.set_column('C:C', 25)
-        ws_print.set_column('D:D', 35)
-
-        row_idx += 3
-        ws_print.write(row_idx, 1, "Evaluator Name:", fmt_footer)
-        ws_print.write_formula(row_idx, 2, f'=IF(\'Marks Entry\'!{eval_input_cell}="","",\'Marks Entry\'!{eval_input_cell})', fmt_footer_val)
-        ws_print.write(row_idx, 3, "Signature with Date: _________________________", fmt_footer)
-
-    return out.getvalue()
-
-def gen_marks_bundles(df, assets, cycle_name):
-    global USED_PREFIXES
-    USED_PREFIXES.clear() 
-    
-    zip_buf = io.BytesIO()
-    key_log = []
-    
-    def get_bundle_group(row):
-        usn = str(row['USN']).strip().upper()
-        branch = str(row['Branch']).strip().upper()
-        
-        if branch == 'CS' or 'CS' in usn:
-            if usn.startswith('1AX'):
-                return 'CS_1AX'
-            else:
-                return 'CS_1AM'
-        return branch 
-
-    df_bundles = df.copy()
-    df_bundles['BundleGroup'] = df_bundles.apply(get_bundle_group, axis=1)
+def run_allocation(df_students, df_rooms, engine="classic", per_bench=None, fill_target=1.0):
+    """
+    Returns (allocation, {constraint: violations left}).
+    'classic' (default): OMR subjects first, then alternating A/B subjects per seat (seating_engine.allocate_seats).
+    'solver' (opt-in): greedy + local search over subject/branch neighbours, bench_type, fill target and OMR rooms (seating_solver).
+    Raises ValueError when the rooms cannot seat everyone under the chosen bench/fill limits.
+    """
+    if engine == "classic":
+        return allocate_seats(df_students, df_rooms), {}
+    return solve_seating(df_students, df_rooms, per_bench=per_bench, fill_target=fill_target)
+
+def allocate_timetable(rosters, df_rooms, **engine_opts):
+    """
+    Seats every session with the same room set. Returns ({(date, session): allocation}, [shortfall rows]);
+    sessions that do not fit the rooms are reported and left unallocated.
+    """
+    capacity = int(df_rooms['capacity'].sum())
+    plans, shortfalls = {}, []
+    for (date, session), roster in rosters.items():
+        if len(roster) > capacity:
+            shortfalls.append({"Date": date, "Session": session, "Students": len(roster), "Capacity": capacity})
+            continue
+        try:
+            df_alloc, _ = run_allocation(roster, df_rooms, **engine_opts)
+        except ValueError:
+            shortfalls.append({"Date": date, "Session": session, "Students": len(roster), "Capacity": capacity})
+            continue
+        df_alloc['Status'] = "PRESENT"
+        plans[(date, session)] = df_alloc
+    return plans, shortfalls
     
-    with zipfile.ZipFile(zip_buf, "w", zipfile.ZIP_DEFLATED) as zf:
-        for (cc, b_group), group in df_bundles.groupby(['Subject Code', 'BundleGroup']):
-            group = group.sort_values('USN').reset_index(drop=True)
-            n_chunks = math.ceil(len(group) / 20)
-            
-            for i in range(n_chunks):
-                chunk = group.iloc[i*20 : (i+1)*20].copy()
-                chunk['Dummy_ID'] = generate_dummy_ids(len(chunk))
-                
-                dummy_prefix = chunk['Dummy_ID'].iloc[0][:2]
-                b_id = f"{b_group}-{cc}-{str(i+1).zfill(2)}-{dummy_prefix}"
-                course_name = chunk['Subject Name'].iloc[0] if 'Subject Name' in chunk.columns else cc
-                
-                for _, s in chunk.iterrows():
-                    key_log.append({
-                        'Bundle_ID': b_id, 
-                        'Original_Room': s.get('RoomNo', 'N/A'), 
-                        'USN': s['USN'], 
-                        'Subject': cc, 
-                        'Branch_Group': b_group,
-                        'Dummy_ID': s['Dummy_ID'], 
-                        'Status': s['Status']
-                    })
-                
-                excel_bytes = create_locked_bundle(chunk, cc, course_name, b_group, i+1, n_chunks, cycle_name, assets)
-                zf.writestr(f"Bundles/{b_id}.xlsx", excel_bytes)
-                
-        kdf = pd.DataFrame(key_log)
-        out_k = io.BytesIO()
-        kdf.to_excel(out_k, index=False)
-        zf.writestr("MASTER_SECRET_KEY.xlsx", out_k.getvalue())
-        
-    return zip_buf.getvalue()
-
 # ==========================================
 # 5. LIVE EXAM DAY UI FLOW
 # ==========================================
@@ -717,13 +219,69 @@ pdf_assets = load_pdf_assets()
 
 st.title("🚀 Live Exam Day Operations")
 
+c_note, c_refresh = st.columns([3, 1])
+c_note.caption("Timetable sessions, session rosters and rooms are cached for 30 minutes. Refresh after editing registrations, the timetable or rooms.")
+if c_refresh.button("🔄 Refresh Cached Data", help="Reload sessions, rosters and rooms from the database"):
+    refresh_exam_day_cache()
+    clear_allocation()
+
 sessions = fetch_exam_sessions(selected_cycle_id)
 if not sessions:
     st.error("No timetable records found for this cycle.")
     st.stop()
 
-def clear_allocation():
-    if "alloc_df" in st.session_state: del st.session_state["alloc_df"]
+with st.expander("🗓️ Batch Mode: Allocate Every Session of the Timetable"):
+    st.write("Seats all sessions of this cycle in one run with the chosen rooms, saves every allotment, and renders each session's posters, Form B, Form A, QPDS and appearing list in parallel.")
+    df_rooms_batch = fetch_rooms()
+    if df_rooms_batch.empty:
+        st.error("No rooms defined in Infrastructure master.")
+    else:
+        room_labels = df_rooms_batch['room_no'].astype(str).tolist()
+        batch_rooms = st.multiselect("Rooms to Use", room_labels, default=room_labels, key="batch_rooms")
+        batch_workers = st.slider("Parallel document renderers", 1, 8, DEFAULT_VOLUME_WORKERS, key="batch_workers")
+        batch_engine = st.radio("Allocation Engine", list(ALLOCATION_ENGINES), horizontal=True, key="batch_engine")
+        
+        if st.button("⚙️ Allocate Whole Timetable", type="primary", disabled=not batch_rooms):
+            rooms_sel = df_rooms_batch[df_rooms_batch['room_no'].astype(str).isin(batch_rooms)]
+            with st.spinner("Building rosters and seating every session..."):
+                rosters = fetch_cycle_rosters(selected_cycle_id)
+                plans, shortfalls = allocate_timetable(rosters, rooms_sel, engine=ALLOCATION_ENGINES[batch_engine])
+            
+            if shortfalls:
+                st.error(f"⚠️ {len(shortfalls)} sessions need more seats than the selected rooms provide and were skipped.")
+                st.dataframe(pd.DataFrame(shortfalls), hide_index=True, use_container_width=True)
+            
+            if plans:
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                saved, save_errors = 0, []
+                for idx, ((d, s), df_alloc) in enumerate(plans.items()):
+                    status_text.text(f"Saving allotments for {d} | {s}...")
+                    try: saved += save_session_allotments(supabase, selected_cycle_id, d, s, df_alloc)
+                    except Exception as e: save_errors.append({"Date": d, "Session": s, "Error": str(e)})
+                    progress_bar.progress((idx + 1) / (2 * len(plans)))
+                if save_errors:
+                    st.warning(f"⚠️ {len(save_errors)} session plans could not be saved (is sql/seat_allotments.sql applied?). The documents below are still built from them.")
+                    st.dataframe(pd.DataFrame(save_errors), hide_index=True, use_container_width=True)
+                
+                jobs = ((session_pack_name(d, s), {"date": d, "session": s, "rows": df_alloc.to_dict('records')}) for (d, s), df_alloc in plans.items())
+                bundle = tempfile.TemporaryFile()
+                with zipfile.ZipFile(bundle, "w", zipfile.ZIP_STORED, allowZip64=True) as zf:
+                    done = 0
+                    for pack_name, pack_path, _ in render_volumes(jobs, render_session_pack, init_session_worker, (pdf_assets, active_cycle_name), max_workers=batch_workers):
+                        with zipfile.ZipFile(pack_path) as pack:
+                            for member in pack.namelist():
+                                zf.writestr(f"{pack_name}/{member}", pack.read(member))
+                        try: os.remove(pack_path)
+                        except OSError: pass
+                        done += 1
+                        status_text.text(f"Rendered {pack_name} ({done}/{len(plans)})")
+                        progress_bar.progress(0.5 + done / (2 * len(plans)))
+                bundle.seek(0)
+                
+                status_text.success(f"✅ Seated {saved} candidates across {len(plans)} sessions. Allotments saved.")
+                st.dataframe(pd.DataFrame([{"Date": d, "Session": s, "Students": len(a), "Rooms": a['RoomNo'].nunique()} for (d, s), a in plans.items()]), hide_index=True, use_container_width=True)
+                st.download_button("📥 Download All Session Documents (ZIP)", bundle, f"Exam_Day_Packs_{active_cycle_name}.zip", "application/zip", type="primary")
 
 selected_slot = st.selectbox("📅 Select Date & Session", sessions, on_change=clear_allocation)
 
@@ -732,6 +290,20 @@ date_str, sess_str = selected_slot.split(" | ")
 df_stus = fetch_exam_data(selected_cycle_id, date_str, sess_str)
 df_rooms_master = fetch_rooms()
 
+# A saved plan is the source of truth: every staff member and every refresh sees the same seats
+if "alloc_df" not in st.session_state:
+    try:
+        stored_alloc = load_session_allotments(supabase, selected_cycle_id, date_str, sess_str, roster=df_stus)
+        if not stored_alloc.empty:
+            st.session_state.alloc_df = stored_alloc
+    except Exception as e:
+        st.warning(f"Could not read saved seat allotments: {e}")
+
+if "alloc_df" in st.session_state and not st.session_state.alloc_df.empty:
+    st.success(f"💾 Seating plan saved for this session ({len(st.session_state.alloc_df)} candidates). Re-running the allocation below replaces it.")
+    if st.session_state.get("alloc_report"):
+        st.warning("Solver could not fully satisfy: " + ", ".join(f"{k} ({v})" for k, v in st.session_state.alloc_report.items()))
+
 if df_stus.empty:
     st.error("No registered active students found for this session.")
 elif df_rooms_master.empty:
@@ -763,18 +335,33 @@ else:
         
         st.write(f"**Selected Capacity:** {selected_capacity} / {total_students} needed.")
         
+        engine_label = st.radio("Allocation Engine", list(ALLOCATION_ENGINES), horizontal=True)
+        c_bench, c_fill = st.columns(2)
+        per_bench = c_bench.number_input("Max candidates per bench (0 = every seat)", 0, 4, 0, help="Solver only. 2 on triple benches leaves the middle seat empty.")
+        fill_pct = c_fill.slider("Room fill target (%)", 50, 100, 100, help="Solver only. Share of each room's seats to use.")
+        
         submitted_allocation = st.form_submit_button("⚙️ Run Allocation Algorithm", type="primary")
         
         if submitted_allocation:
             if selected_capacity < total_students:
                 st.error("⚠️ Not enough capacity! Please select more rooms.")
             else:
+                df_alloc = None
                 with st.spinner("Assigning seats..."):
-                    df_alloc = run_allocation(df_stus, selected_rooms_df)
+                    try:
+                        df_alloc, left = run_allocation(df_stus, selected_rooms_df, ALLOCATION_ENGINES[engine_label], per_bench or None, fill_pct / 100)
+                    except ValueError as e:
+                        st.error(f"⚠️ {e} Please select more rooms or relax the bench / fill limits.")
+                if df_alloc is not None:
                     df_alloc['Status'] = "PRESENT" 
                     st.session_state.alloc_df = df_alloc
-                    st.success(f"✅ Allocated {len(df_alloc)} students successfully!")
-                    st.rerun()
+                    st.session_state.alloc_report = {k: v for k, v in left.items() if v}
+                    try:
+                        save_session_allotments(supabase, selected_cycle_id, date_str, sess_str, df_alloc)
+                        st.success(f"✅ Allocated {len(df_alloc)} students successfully!")
+                        st.rerun()
+                    except Exception as e:
+                        st.warning(f"✅ Allocated {len(df_alloc)} students, but the plan could not be saved (it lives in this browser session only): {e}")
 
 if "alloc_df" in st.session_state and not st.session_state.alloc_df.empty:
     df_a = st.session_state.alloc_df
@@ -794,9 +381,16 @@ if "alloc_df" in st.session_state and not st.session_state.alloc_df.empty:
             absent_list = [x.strip().upper() for x in abs_text.replace('\n', ',').split(',') if x.strip()]
             mal_list = [x.strip().upper() for x in mal_text.replace('\n', ',').split(',') if x.strip()]
             
-            df_a['Status'] = "PRESENT"
-            df_a.loc[df_a['USN'].isin(absent_list), 'Status'] = "ABSENT"
-            df_a.loc[df_a['USN'].isin(mal_list), 'Status'] = "MALPRACTICE"
+            try:
+                update_allotment_status(supabase, selected_cycle_id, date_str, sess_str, absent_list, mal_list)
+                df_a = load_session_allotments(supabase, selected_cycle_id, date_str, sess_str, roster=df_stus)
+            except Exception as e:
+                # Saved plan unavailable: apply the statuses to the plan in memory, as before seat_allotments existed
+                st.warning(f"Could not update saved seat allotments; statuses apply to this browser session only: {e}")
+                df_a = df_a.copy()
+                df_a['Status'] = "PRESENT"
+                df_a.loc[df_a['USN'].isin(absent_list), 'Status'] = "ABSENT"
+                df_a.loc[df_a['USN'].isin(mal_list), 'Status'] = "MALPRACTICE"
             
             st.session_state.alloc_df = df_a
             st.success(f"Updated! {len(absent_list)} Absentees, {len(mal_list)} Malpractice.")
@@ -804,18 +398,62 @@ if "alloc_df" in st.session_state and not st.session_state.alloc_df.empty:
     st.markdown("---")
     st.subheader("🖨️ 2. Download Exam Documents")
     
-    c1, c2, c3, c4, c5 = st.columns(5)
-    with c1: st.download_button("📌 Room Posters", gen_posters(df_a, date_str, sess_str, pdf_assets), f"Posters_{date_str}.pdf")
-    with c2: st.download_button("📝 Form B", gen_form_b(df_a, date_str, sess_str, pdf_assets), f"FormB_{date_str}.pdf")
-    with c3: st.download_button("📦 Form A", gen_form_a(df_a, date_str, sess_str, pdf_assets, active_cycle_name), f"FormA_{date_str}.pdf")
-    with c4: st.download_button("📋 QPDS", gen_qpds(df_a, date_str, sess_str, pdf_assets), f"QPDS_{date_str}.pdf")
-    with c5: st.download_button("📊 Appearing List", gen_smart_excel(df_a, date_str, sess_str), f"Appearing_{date_str}.xlsx")
+    # Documents are built on request and kept until the seating (or, for Form A and bundles, a status) changes
+    scope = f"{selected_cycle_id}|{date_str}|{sess_str}|"
+    layout_key = scope + allocation_fingerprint(df_a)
+    status_key = scope + allocation_fingerprint(df_a, with_status=True)
+    doc_key = {kind: (status_key if SESSION_DOCS[kind][1] else layout_key) for kind, _ in DOC_BUTTONS}
+    
+    missing = [kind for kind, _ in DOC_BUTTONS if cached_document(kind, doc_key[kind]) is None]
+    c_all, c_pack = st.columns(2)
+    if missing and c_all.button("⚙️ Prepare All Documents"):
+        with st.spinner("Rendering documents in parallel..."):
+            for kind, data, _ in render_session_documents(df_a, date_str, sess_str, pdf_assets, active_cycle_name, kinds=missing):
+                cached_document(kind, doc_key[kind], lambda: data)
+    
+    pack = cached_document("pack", status_key)
+    if pack is None and c_pack.button("🗂️ Build Full Session Pack (ZIP)"):
+        with st.spinner("Rendering every document in parallel..."):
+            pack = cached_document("pack", status_key, lambda: build_session_pack(df_a, date_str, sess_str, pdf_assets, active_cycle_name))
+    if pack is not None:
+        c_pack.download_button("📥 Download Full Session Pack", pack[0], f"Session_Pack_{session_pack_name(date_str, sess_str)}.zip", "application/zip")
+        with st.expander("⏱️ Document render timings"):
+            st.dataframe(pd.DataFrame(pack[1]), hide_index=True, use_container_width=True)
+    
+    for col, (kind, label) in zip(st.columns(len(DOC_BUTTONS)), DOC_BUTTONS):
+        file_name, _, build = SESSION_DOCS[kind]
+        with col:
+            data = cached_document(kind, doc_key[kind])
+            if data is None and st.button(f"⚙️ {label}", key=f"build_{kind}"):
+                with st.spinner(f"Rendering {label}..."):
+                    data = cached_document(kind, doc_key[kind], lambda: build(df_a, date_str, sess_str, pdf_assets, active_cycle_name))
+            if data is not None:
+                st.download_button(label, data, file_name.format(date=date_str), key=f"dl_{kind}")
         
     st.markdown("---")
     st.subheader("🔐 3. Post-Exam Processing")
-    st.info("Generates secure Evaluation Excel bundles. Maximum 20 papers per bundle. Absentees are dynamically locked. USNs are completely masked from Evaluators.")
+    st.info("Generates secure Evaluation Excel bundles. Maximum 20 papers per bundle. Absentees are dynamically locked. USNs are completely masked from Evaluators. Dummy codes are recorded server-side, so the Bundle Decoder needs no key file.")
     
-    if st.button("📦 Generate Locked Marks Bundles (.zip)", type="primary"):
+    zip_bytes = cached_document("bundles", status_key)
+    if zip_bytes is None and st.button("📦 Generate Locked Marks Bundles (.zip)", type="primary"):
         with st.spinner("Encrypting bundles and generating Secret Key..."):
-            zip_bytes = gen_marks_bundles(df_a, pdf_assets, active_cycle_name)
-            st.download_button("📥 Click to Download ZIP", zip_bytes, f"Evaluation_Bundles_{date_str}.zip", "application/zip")
+            try:
+                zip_bytes = cached_document("bundles", status_key, lambda: gen_marks_bundles(df_a, pdf_assets, active_cycle_name,
+                                           lambda key_log: register_dummy_codes(supabase, selected_cycle_id, date_str, sess_str, key_log)))
+            except Exception as e:
+                st.error(f"Could not record dummy codes (CoE staff only; is sql/dummy_codes.sql applied?): {e}")
+    if zip_bytes is not None:
+        st.download_button("📥 Click to Download ZIP", zip_bytes, f"Evaluation_Bundles_{date_str}.zip", "application/zip")
+
+st.markdown("---")
+with st.expander("🔎 Find a Candidate's Seats (whole cycle)"):
+    seek_usn = st.text_input("USN", key="seat_lookup").strip().upper()
+    if seek_usn:
+        try: seats = load_student_allotments(supabase, selected_cycle_id, seek_usn)
+        except Exception as e:
+            seats = None
+            st.warning(f"Could not read saved seat allotments: {e}")
+        if seats:
+            st.dataframe(pd.DataFrame(seats).rename(columns={"exam_date": "Date", "session": "Session", "room_no": "Room", "seat_no": "Seat", "usn": "USN", "course_code": "Subject Code", "status": "Status"}), hide_index=True, use_container_width=True)
+        elif seats is not None:
+            st.info("No saved seat allotments for this USN in the cycle.")
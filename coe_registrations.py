@@ -1,26 +1,20 @@
 import streamlit as st
 import pandas as pd
 import io
+import os
 import zipfile
 import datetime
-import os
-import re
-import concurrent.futures
-from PIL import Image as PILImage
-from utils import init_db, clean_data_for_db
-
-# --- REPORTLAB IMPORTS FOR PDF GENERATION ---
-from reportlab.lib.pagesizes import A4
-from reportlab.lib import colors
-from reportlab.platypus import Table, TableStyle, Paragraph, Spacer, Image as RLImage
-from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
-from reportlab.lib.utils import ImageReader
-from reportlab.pdfgen import canvas
+import tempfile
+from utils import init_db
+from photo_pipeline import fetch_complete_bucket_map, stream_photos, DEFAULT_PHOTO_WORKERS, DEFAULT_PHOTO_PREFETCH
+from pdf_assets import fetch_system_asset_bytes, print_size_px, PHOTO_PRINT_SIZE
+from pdf_volumes import VOLUME_MODES, DEFAULT_VOLUME_WORKERS, SINGLE_PDF_CHUNK, plan_volumes, render_volumes, stitch_volumes, attach_photos, VolumeZip
+from upload_validation import validate_registration_upload
+from registration_template import TEMPLATE_FORMATS, build_template_frame, write_template
+from registration_sync import diff_registrations, apply_registration_diff
+from registration_form_pdf import safe_float, course_sort_key, build_form_entry, init_volume_worker, render_volume
 
 # --- CONFIGURATION ---
-LOGO_FILENAME = "College_logo.png"       
-NAAC_FILENAME = "NAAC_A_Logo.jpg"        
-WATERMARK_FILENAME = "AMC_watermark.png" 
 supabase = init_db()
 
 st.title("📝 Semester Course Registration")
@@ -44,241 +38,6 @@ def fetch_all_records(table_name, select_query="*", filters=None):
         current_start += step
     return all_data
 
-def safe_float(val, default=0.0):
-    try: return float(val) if val and pd.notna(val) else default
-    except: return default
-
-def get_checkbox():
-    """Generates a perfect square box for the table cells"""
-    t = Table([[""]], colWidths=[12], rowHeights=[12])
-    t.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 0.8, colors.black),
-        ('BACKGROUND', (0,0), (-1,-1), colors.white)
-    ]))
-    return t
-
-def course_sort_key(s):
-    """
-    Extracts the main 3-digit course number (e.g., 201, 202) for perfect numeric sorting.
-    It finds all numbers in the string and uses the last one as the primary sort key.
-    """
-    code_str = str(s).strip().upper()
-    numbers = re.findall(r'\d+', code_str)
-    # The course number is almost always the last set of digits in the code (e.g. '1BESC204C' -> 204)
-    main_num = int(numbers[-1]) if numbers else 9999
-    return (main_num, code_str)
-
-# ==========================================
-# PHOTO BUCKET MAPPING UTILS 
-# ==========================================
-def fetch_complete_bucket_map(bucket_name):
-    file_map = {}
-    limit = 1000; offset = 0
-    while True:
-        try:
-            files = supabase.storage.from_(bucket_name).list("", options={"limit": limit, "offset": offset})
-            if not files: break
-            for f in files:
-                fname = f.get('name', '')
-                if not fname or fname == '.emptyFolderPlaceholder': continue
-                basename = os.path.basename(fname)
-                key = re.sub(r'[^A-Z0-9]', '', os.path.splitext(basename)[0].upper())
-                file_map[key] = fname
-            if len(files) < limit: break
-            offset += limit
-        except: break
-    return file_map
-
-def download_photo_worker(args):
-    usn, file_map = args
-    clean_usn = re.sub(r'[^A-Z0-9]', '', usn.upper())
-    
-    if clean_usn in file_map:
-        try:
-            res = supabase.storage.from_("StakeHolders_Photos").download(file_map[clean_usn])
-            if res:
-                img = PILImage.open(io.BytesIO(res))
-                if img.mode != 'RGB': img = img.convert('RGB')
-                clean_io = io.BytesIO()
-                img.save(clean_io, format='JPEG', quality=95)
-                clean_io.seek(0)
-                return usn, clean_io
-        except: pass
-
-    for ext in ['.webp', '.jpg', '.jpeg', '.png', '.WEBP', '.JPG', '.PNG']:
-        try:
-            res = supabase.storage.from_("StakeHolders_Photos").download(f"{clean_usn}{ext}")
-            if res:
-                img = PILImage.open(io.BytesIO(res))
-                if img.mode != 'RGB': img = img.convert('RGB')
-                clean_io = io.BytesIO()
-                img.save(clean_io, format='JPEG', quality=95)
-                clean_io.seek(0)
-                return usn, clean_io
-        except: pass
-            
-    return usn, None
-
-# ==========================================
-# 🟢 EXACT REPLICA PDF GENERATOR ENGINE
-# ==========================================
-def draw_header(c, w, y_start, assets):
-    margin = 35
-    if assets.get("logo"):
-        c.drawImage(ImageReader(assets["logo"]), margin, y_start - 35, width=60, height=60, mask='auto', preserveAspectRatio=True)
-    if assets.get("naac"):
-        c.drawImage(ImageReader(assets["naac"]), w - margin - 60, y_start - 35, width=60, height=60, mask='auto', preserveAspectRatio=True)
-
-    c.setFont("Helvetica-Bold", 15)
-    c.drawCentredString(w/2, y_start, "AMC ENGINEERING COLLEGE")
-    c.setFont("Helvetica", 9)
-    c.drawCentredString(w/2, y_start - 15, "AMC Campus, Bannerghatta Road, Bengaluru, Karnataka - 560083")
-    c.drawCentredString(w/2, y_start - 27, "Autonomous Institution Affiliated to VTU, Belagavi | NAAC A+ Accredited")
-    
-    c.setLineWidth(1)
-    c.line(margin, y_start - 45, w - margin, y_start - 45)
-    return y_start - 65
-
-def draw_registration_page(c, w, h, student, courses, assets, photo_io, form_title, sem, date_str, prog_type):
-    margin = 35
-    content_w = w - (2 * margin) 
-    
-    if assets.get("watermark"):
-        c.saveState()
-        c.setFillAlpha(0.08)
-        c.drawImage(ImageReader(assets["watermark"]), w/2 - 175, h/2 - 175, width=350, height=350, mask='auto', preserveAspectRatio=True)
-        c.restoreState()
-
-    y = draw_header(c, w, h - margin, assets)
-    
-    c.setFont("Helvetica-Bold", 12)
-    c.drawCentredString(w/2, y, form_title)
-    y -= 25
-
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(margin, y, "Student Details")
-    y -= 5
-
-    if photo_io:
-        photo_io.seek(0)
-        p_img = RLImage(photo_io, width=55, height=70)
-        p_img.hAlign = 'CENTER'
-        p_img.vAlign = 'MIDDLE'
-        s_data = [
-            ["USN", "Student Name", "Branch", "Type", "Photo"],
-            [student['usn'], student.get('full_name',''), student.get('branch_code',''), prog_type, p_img]
-        ]
-        style_cmds = [
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE')
-        ]
-    else:
-        p_img = Paragraph("<para align=center>PHOTO</para>", getSampleStyleSheet()['Normal'])
-        s_data = [
-            ["USN", "Student Name", "Branch", "Type", p_img],
-            [student['usn'], student.get('full_name',''), student.get('branch_code',''), prog_type, ""]
-        ]
-        style_cmds = [
-            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
-            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-            ('SPAN', (4, 0), (4, 1))
-        ]
-
-    t1 = Table(s_data, colWidths=[70, 205.27, 60, 90, 100], rowHeights=[20, 75])
-    t1.setStyle(TableStyle(style_cmds))
-    t1.wrapOn(c, w, h)
-    _, t1_h = t1.wrap(w, h)
-    t1.drawOn(c, margin, y - t1_h)
-    y -= (t1_h + 20)
-
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(margin, y, f"Semester: {sem}")
-    y -= 20
-
-    c.drawString(margin, y, "Courses offered")
-    y -= 5
-
-    c_data = [["Course code", "Course title", "Credits", "Select"]]
-    total_cr = 0
-    for crs in courses:
-        cr_val = safe_float(crs.get('credits', 0))
-        total_cr += cr_val
-        c_data.append([
-            crs['course_code'],
-            Paragraph(crs.get('title',''), getSampleStyleSheet()['Normal']),
-            str(int(cr_val) if cr_val.is_integer() else cr_val),
-            get_checkbox()
-        ])
-    c_data.append(["", Paragraph("<b>Total Credits</b>", getSampleStyleSheet()['Normal']), str(int(total_cr)), ""])
-
-    t2 = Table(c_data, colWidths=[80, 315.27, 60, 70])
-    t2.setStyle(TableStyle([
-        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
-        ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
-        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
-        ('ALIGN', (0,0), (0,-1), 'CENTER'), 
-        ('ALIGN', (2,0), (-1,-1), 'CENTER'), 
-        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
-    ]))
-    t2.wrapOn(c, w, h)
-    _, t2_h = t2.wrap(w, h)
-    t2.drawOn(c, margin, y - t2_h)
-    y -= (t2_h + 25)
-
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(margin, y, "STUDENT UNDERTAKING:")
-    y -= 15
-
-    c.setLineWidth(1)
-    c.setFont("Helvetica", 9)
-    
-    undertakings = [
-        "I will follow the AMCEC / VTU autonomy guidelines.",
-        "I have paid the full tuition fees and examination fees for the current semester.",
-        "I am aware that I must maintain a minimum of 85% attendance to appear for SEE.",
-        "I have verified that my selected credits align with the academic regulations."
-    ]
-    
-    for u in undertakings:
-        c.rect(margin, y - 8, 10, 10) 
-        c.drawString(margin + 18, y - 6, u)
-        y -= 18
-
-    y -= 10
-    
-    c.setFont("Helvetica-Bold", 10)
-    c.drawString(margin, y, "DECLARATION:")
-    y -= 15
-    
-    p_style = getSampleStyleSheet()['Normal']
-    p_style.fontSize = 9
-    decl = Paragraph("I hereby declare that the information provided is true to the best of my knowledge. I have carefully selected the courses listed above and I request to be registered for the same in the current semester.", p_style)
-    decl.wrapOn(c, content_w, 50)
-    _, decl_h = decl.wrap(content_w, 50)
-    decl.drawOn(c, margin, y - decl_h)
-    y -= (decl_h + 30)
-
-    sig_data = [
-        [f"Date: {date_str}", "________________________"],
-        ["", "Signature of the Student"]
-    ]
-    t_sig = Table(sig_data, colWidths=[content_w/2, content_w/2])
-    t_sig.setStyle(TableStyle([
-        ('ALIGN', (0,0), (0,-1), 'LEFT'),
-        ('ALIGN', (1,0), (1,-1), 'RIGHT'),
-        ('FONTNAME', (0,0), (-1,-1), 'Helvetica-Bold'),
-        ('FONTSIZE', (0,0), (-1,-1), 10),
-    ]))
-    t_sig.wrapOn(c, content_w, 50)
-    _, sig_h = t_sig.wrap(content_w, 50)
-    t_sig.drawOn(c, margin, y - sig_h)
-
 # --- GLOBAL CONTEXT ---
 selected_cycle_id = st.session_state.get('active_cycle_id')
 if not selected_cycle_id:
@@ -317,6 +76,24 @@ with reg_tabs[0]:
     st.markdown("#### Course Source")
     f_csv = st.file_uploader("Override Syllabus with Custom CSV (Optional - Filters by 'Streams')", type="csv", key="pdf_csv_upload")
     
+    with st.expander("⚙️ Photo Download Settings"):
+        pc1, pc2 = st.columns(2)
+        photo_workers = pc1.number_input("Parallel photo downloads", min_value=1, max_value=32, value=DEFAULT_PHOTO_WORKERS, key="reg_photo_workers")
+        photo_prefetch = pc2.number_input("Photos buffered ahead of rendering", min_value=1, max_value=256, value=DEFAULT_PHOTO_PREFETCH, key="reg_photo_prefetch")
+    
+    output_mode = st.radio("Output", ["Single PDF"] + VOLUME_MODES, horizontal=True, key="reg_output_mode")
+    vc1, vc2 = st.columns(2)
+    volume_workers = vc2.number_input("Parallel page renderers", min_value=1, max_value=16, value=DEFAULT_VOLUME_WORKERS, key="reg_volume_workers")
+    per_volume = None
+    if output_mode == "Single PDF":
+        st.caption(f"Pages are rendered in chunks of {SINGLE_PDF_CHUNK} students and appended to one PDF on disk, so memory stays flat for any batch size.")
+    else:
+        if output_mode == "Every N Students":
+            per_volume = vc1.number_input("Students per volume", min_value=10, max_value=5000, value=250, step=50, key="reg_per_volume")
+        else:
+            per_volume = vc1.number_input("Max students per branch volume (0 = whole branch)", min_value=0, max_value=5000, value=0, step=50, key="reg_per_volume") or None
+        st.caption("Volumes are rendered side by side and bundled into one ZIP with an INDEX.csv (USN → volume, page). Every PDF is bookmarked by USN.")
+    
     if st.button("🖨️ Generate Master PDF", type="primary"):
         if f_branch == "-- Select --":
             st.error("Please select a target branch.")
@@ -360,62 +137,65 @@ with reg_tabs[0]:
                                 if br not in branch_courses_dict: branch_courses_dict[br] = []
                                 branch_courses_dict[br].append(c)
 
-                        system_assets = {"logo": None, "naac": None, "watermark": None}
-                        sys_map = {"logo": LOGO_FILENAME, "naac": NAAC_FILENAME, "watermark": WATERMARK_FILENAME}
-                        for k, f in sys_map.items():
-                            try:
-                                res = supabase.storage.from_("College_Logos").download(f)
-                                if res: system_assets[k] = io.BytesIO(res) 
-                            except: pass
+                        raw_assets = fetch_system_asset_bytes(supabase)
                         
-                        photo_file_map = fetch_complete_bucket_map("StakeHolders_Photos")
+                        photo_file_map = fetch_complete_bucket_map(supabase)
                         
-                        final_pdf_buffer = io.BytesIO()
-                        c = canvas.Canvas(final_pdf_buffer, pagesize=A4)
                         progress_bar = st.progress(0)
                         total_stu = len(students)
                         
-                        batch_photos = {}
-                        with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-                            futures = {executor.submit(download_photo_worker, (s['usn'], photo_file_map)): s['usn'] for s in students}
-                            for future in concurrent.futures.as_completed(futures):
-                                u, p_stream = future.result()
-                                if p_stream: batch_photos[u] = p_stream
-
                         date_str = datetime.date.today().strftime('%d-%m-%Y')
-
-                        for i, stu in enumerate(students):
-                            s_br = str(stu['branch_code']).upper()
-                            prog_type = branch_prog_map.get(s_br, "UG")
-                            
-                            raw_courses = branch_courses_dict.get(s_br, []) + branch_courses_dict.get("COMMON", [])
-                            raw_courses = sorted(raw_courses, key=lambda x: course_sort_key(x['course_code']))
-                            
-                            seen = set()
-                            dedup_courses = []
-                            for crs in raw_courses:
-                                if crs['course_code'] not in seen:
-                                    seen.add(crs['course_code'])
-                                    dedup_courses.append(crs)
-                            
-                            photo_stream = batch_photos.get(stu['usn'])
-                            draw_registration_page(c, A4[0], A4[1], stu, dedup_courses, system_assets, photo_stream, f_title, f_sem, date_str, prog_type)
-                            c.showPage() 
-                            progress_bar.progress((i + 1) / total_stu)
-                            
-                        c.save()
-                        for stream in batch_photos.values(): stream.close()
+                        entries = [build_form_entry(s, branch_courses_dict, branch_prog_map) for s in students]
+                        dl_stem = f"Batch_Registrations_ALL_Sem{f_sem}" if f_branch == "ALL BRANCHES" else f"Batch_Registrations_{f_branch}_Sem{f_sem}"
+
+                        if output_mode == "Single PDF":
+                            # Photo downloads -> chunk rendering in worker processes -> in-order appends to a file on disk,
+                            # each stage bounded, so nothing ever holds the whole batch
+                            chunks = plan_volumes(entries, "Per Branch", SINGLE_PDF_CHUNK)
+                            photo_feed = stream_photos(supabase, [e['usn'] for _, v in chunks for e in v], photo_file_map, max_workers=photo_workers, prefetch=photo_prefetch, max_size_px=print_size_px(*PHOTO_PRINT_SIZE))
+                            done = []
+                            def on_chunk(name, usns):
+                                done.extend(usns)
+                                progress_bar.progress(len(done) / total_stu)
+
+                            with tempfile.TemporaryDirectory(prefix="amc_forms_") as tmp_dir:
+                                out_path = os.path.join(tmp_dir, f"{dl_stem}.pdf")
+                                try:
+                                    stitch_volumes(render_volumes(attach_photos(chunks, photo_feed), render_volume, init_volume_worker, (raw_assets, f_title, f_sem, date_str), max_workers=volume_workers, ordered=True), out_path, on_chunk)
+                                finally:
+                                    photo_feed.close()
+                                        
+                                st.success(f"✅ Generated {total_stu} pages into a single Master PDF!")
                                 
-                        st.success(f"✅ Generated {total_stu} pages into a single Master PDF!")
-                        
-                        dl_name = f"Batch_Registrations_ALL_Sem{f_sem}.pdf" if f_branch == "ALL BRANCHES" else f"Batch_Registrations_{f_branch}_Sem{f_sem}.pdf"
-                        st.download_button(
-                            label=f"📥 Download Master PDF",
-                            data=final_pdf_buffer.getvalue(),
-                            file_name=dl_name,
-                            mime="application/pdf",
-                            type="primary"
-                        )
+                                with open(out_path, "rb") as pdf_file:
+                                    st.download_button(
+                                        label=f"📥 Download Master PDF",
+                                        data=pdf_file,
+                                        file_name=f"{dl_stem}.pdf",
+                                        mime="application/pdf",
+                                        type="primary"
+                                    )
+                        else:
+                            volumes = plan_volumes(entries, output_mode, per_volume)
+                            status = st.empty()
+                            photo_feed = stream_photos(supabase, [e['usn'] for _, v in volumes for e in v], photo_file_map, max_workers=photo_workers, prefetch=photo_prefetch, max_size_px=print_size_px(*PHOTO_PRINT_SIZE))
+                            bundle = VolumeZip(pages_per_student=1)
+                            try:
+                                for v_idx, (v_name, pdf_path, v_usns) in enumerate(render_volumes(attach_photos(volumes, photo_feed), render_volume, init_volume_worker, (raw_assets, f_title, f_sem, date_str), max_workers=volume_workers), start=1):
+                                    bundle.add(v_name, pdf_path, v_usns)
+                                    status.text(f"Volume {v_idx}/{len(volumes)} ready ({v_name})")
+                                    progress_bar.progress(v_idx / len(volumes))
+                            finally:
+                                photo_feed.close()
+
+                            st.success(f"✅ Generated {total_stu} pages across {len(volumes)} volumes!")
+                            st.download_button(
+                                label=f"📥 Download Volumes (ZIP)",
+                                data=bundle.finish(),
+                                file_name=f"{dl_stem}.zip",
+                                mime="application/zip",
+                                type="primary"
+                            )
                 except Exception as e:
                     st.error(f"Generation Error: {e}")
 
@@ -435,6 +215,7 @@ with reg_tabs[1]:
         t_ay = st.text_input("Academic Year", value=st.session_state.get('active_academic_year', '2025-26'), key="t_ay_tmpl")
         t_type = st.selectbox("Semester Type", ["ODD", "EVEN", "BOTH"], key="t_type_tmpl")
         t_csv = st.file_uploader("Upload Universal Syllabus (CSV)", type="csv", key="t_csv_tmpl")
+        t_fmt = st.radio("Template Format", list(TEMPLATE_FORMATS), horizontal=True, key="t_fmt_tmpl", help="The bulk upload reads CSV, so save Excel edits back as CSV.")
         
         if st.button("📥 Generate Universal CSV Template", type="secondary"):
             if t_csv is None:
@@ -455,27 +236,16 @@ with reg_tabs[1]:
                     elif not stu_data:
                         st.warning(f"No active students found in Semester {t_sem}.")
                     else:
-                        branch_courses = {}
-                        for _, r in df_crs.iterrows():
-                            br = str(r[stream_col]).strip().upper()
-                            cc = str(r[code_col]).strip()
-                            if br not in branch_courses: branch_courses[br] = []
-                            branch_courses[br].append(cc)
-                            
-                        template_rows = []
-                        for s in stu_data:
-                            s_branch = str(s['branch_code']).upper()
-                            
-                            my_courses = branch_courses.get(s_branch, []) + branch_courses.get("COMMON", []) + branch_courses.get("FIRST_YEAR", [])
-                            my_courses = sorted(list(set(my_courses)), key=course_sort_key)
-                            
-                            for c in my_courses:
-                                template_rows.append({"usn": s['usn'], "course_code": c, "academic_year": t_ay, "semester_type": t_type, "semester": t_sem})
+                        df_tmpl = build_template_frame(stu_data, df_crs, code_col, stream_col, t_ay, t_type, t_sem)
                         
-                        if template_rows:
-                            df_tmpl = pd.DataFrame(template_rows)
-                            st.success(f"✅ Universal Template generated containing {len(stu_data)} students!")
-                            st.download_button(label=f"📥 Download Universal Sem {t_sem} Template", data=df_tmpl.to_csv(index=False).encode('utf-8'), file_name=f"Universal_Registration_Template_Sem{t_sem}.csv", mime="text/csv", type="primary")
+                        if not df_tmpl.empty:
+                            ext, mime = TEMPLATE_FORMATS[t_fmt]
+                            try:
+                                tmpl_file = write_template(df_tmpl, t_fmt)
+                                st.success(f"✅ Universal Template generated containing {df_tmpl['usn'].nunique()} students ({len(df_tmpl)} rows)!")
+                                st.download_button(label=f"📥 Download Universal Sem {t_sem} Template", data=tmpl_file, file_name=f"Universal_Registration_Template_Sem{t_sem}.{ext}", mime=mime, type="primary")
+                            except ValueError as e:
+                                st.error(str(e))
                         else:
                             st.error("Failed to map any subjects. Check if the branch codes in 'Streams' match the database.")
 
@@ -485,46 +255,50 @@ with reg_tabs[1]:
         f_reg = st.file_uploader("Upload Edited CSV", type='csv', key="reg_bulk_upload")
         
         if f_reg and st.button("🚀 Execute Bulk Registration", type="primary"):
-            df = pd.read_csv(f_reg)
-            data = clean_data_for_db(df, ['usn', 'course_code', 'academic_year', 'semester_type', 'semester'])
-            
-            if data:
-                with st.spinner("Processing registrations and validating subjects..."):
-                    valid_courses_db = fetch_all_records("master_courses", "course_code")
-                    db_mapping = {str(c['course_code']).strip().upper(): str(c['course_code']) for c in valid_courses_db}
-                    
-                    uploaded_courses = set()
-                    for row in data:
-                        clean_code = str(row['course_code']).strip().upper()
-                        
-                        if clean_code in db_mapping:
-                            row['course_code'] = db_mapping[clean_code]
-                        else:
-                            row['course_code'] = clean_code
-                            
-                        row['usn'] = str(row['usn']).strip().upper()
-                        row['cycle_id'] = selected_cycle_id
-                        uploaded_courses.add(row['course_code'])
-                        
-                    valid_courses_strict = {str(c['course_code']) for c in valid_courses_db}
-                    invalid_courses = uploaded_courses - valid_courses_strict
-                    
+            with st.spinner("Processing registrations and validating subjects..."):
+                valid_courses_db = fetch_all_records("master_courses", "course_code")
+                student_status = fetch_all_records("master_students", "usn, status")
+                report = validate_registration_upload(f_reg, valid_courses_db, student_status, selected_cycle_id)
+                data = report.records(cycle_id=selected_cycle_id)
+                
+                if report.count("MISSING_COLUMNS"):
+                    st.error(f"❌ Missing required columns: {report.errors['detail'].iloc[0]}")
+                elif not report.ok:
+                    invalid_courses = sorted(report.errors.loc[report.errors['issue'] == 'UNKNOWN_COURSE', 'course_code'].unique())
                     if invalid_courses:
                         st.error("❌ **Upload Failed: Invalid Course Codes Detected!**")
                         st.warning(f"The following course codes from your CSV are entirely missing from the Master Courses database:\n\n**{', '.join(invalid_courses)}**")
                         st.info("Please fix these typos in your Excel file or add the missing subjects in the Course Master before continuing.")
                     else:
-                        try:
-                            uploaded_usns = list(set([r['usn'] for r in data]))
-                            for i in range(0, len(uploaded_usns), 100):
-                                supabase.table("course_registrations").delete().eq("cycle_id", selected_cycle_id).in_("usn", uploaded_usns[i:i+100]).execute()
-                            
-                            for i in range(0, len(data), 500):
-                                supabase.table("course_registrations").insert(data[i:i+500]).execute()
-                                
-                            st.success(f"✅ Successfully registered {len(data)} student-course mappings! Invisible DB spaces were safely bypassed.")
-                        except Exception as e: 
-                            st.error(f"Registration failed: {e}")
+                        st.error(f"❌ **Upload Failed:** {len(report.errors)} rows have errors. Nothing was written.")
+                    st.dataframe(report.errors.head(1000), hide_index=True)
+                    st.download_button("📥 Download Error Report", report.issues.to_csv(index=False).encode('utf-8'), "Registration_Upload_Issues.csv", "text/csv")
+                elif data:
+                    if not report.warnings.empty:
+                        st.warning("⚠️ Skipped rows: " + ", ".join(f"{issue} × {n}" for (_, issue), n in report.summary().items()))
+                        st.download_button("📥 Download Skipped Rows", report.issues.to_csv(index=False).encode('utf-8'), "Registration_Upload_Issues.csv", "text/csv")
+                    try:
+                        # Only touch rows that actually differ from what is already registered for these USNs
+                        existing = fetch_all_records("course_registrations", "usn, course_code, academic_year, semester_type, semester", {"cycle_id": selected_cycle_id})
+                        diff = diff_registrations(existing, data)
+                        
+                        d1, d2, d3, d4 = st.columns(4)
+                        d1.metric("Unchanged", diff['unchanged'])
+                        d2.metric("To Add", len(diff['insert']))
+                        d3.metric("To Update", len(diff['update']))
+                        d4.metric("To Remove", len(diff['delete']))
+                        
+                        if not (diff['insert'] or diff['update'] or diff['delete']):
+                            st.success("✅ Registrations already match the uploaded sheet. Nothing to change.")
+                        else:
+                            counts, used_rpc = apply_registration_diff(supabase, selected_cycle_id, diff)
+                            st.success(f"✅ Registrations synced: {counts.get('inserted', 0)} added, {counts.get('updated', 0)} updated, {counts.get('deleted', 0)} removed. Invisible DB spaces were safely bypassed.")
+                            if not used_rpc:
+                                st.caption("Applied without the `apply_registration_diff` database function (see sql/apply_registration_diff.sql), so it was not a single transaction. If it fails part-way, re-upload the same sheet to finish.")
+                    except Exception as e: 
+                        st.error(f"Registration failed: {e}")
+                else:
+                    st.warning("No valid registration rows found in the uploaded sheet.")
 
 # ==========================================
 # 3. INTERACTIVE INDIVIDUAL MAPPING
@@ -6,6 +6,9 @@ import zipfile
 import xlsxwriter
 import re
 from utils import init_db
+from upload_validation import find_column, validate_cie_upload, validate_see_upload
+from dummy_codes import resolve_dummy_ids
+from bundle_decoder import read_bundles, decode_marks
 
 # --- REPORTLAB IMPORTS FOR PDF GENERATION ---
 from reportlab.lib.pagesizes import A4
@@ -27,13 +30,6 @@ def clean_str(val):
     return str(val).strip().upper() if pd.notna(val) else ""
 
 
-def find_column(df, candidates):
-    cols = [c.upper().strip() for c in df.columns]
-    for candidate in candidates:
-        if candidate.upper() in cols:
-            return df.columns[cols.index(candidate.upper())]
-    return None
-
 def safe_float(val, default):
     if val is None:
         return float(default)
@@ -413,34 +409,26 @@ if show_cie:
         with col_c1:
             f_cie = st.file_uploader("Upload CSV (Required: usn, course_code, cie_marks)", type='csv', key="cie_up")
             if f_cie and st.button("🚀 Process Bulk CIE"):
-                df_cie = pd.read_csv(f_cie)
-                usn_col = find_column(df_cie, ['usn', 'student id'])
-                cc_col = find_column(df_cie, ['course_code', 'course code', 'subject code'])
-                m_col = find_column(df_cie, ['cie_marks', 'cie', 'ia marks', 'internals'])
-                
-                if not (usn_col and cc_col and m_col):
+                with st.spinner("Validating against registrations..."):
+                    regs = fetch_all_records("course_registrations", "usn, course_code", {"cycle_id": selected_cycle_id})
+                    report = validate_cie_upload(f_cie, regs)
+                    records = report.records(cycle_id=selected_cycle_id)
+                    ignored_count = report.count("NOT_REGISTERED")
+                    
+                if report.count("MISSING_COLUMNS"):
                     st.error("Missing standard columns.")
+                elif not records:
+                    st.error("No matching registered students found.")
                 else:
-                    with st.spinner("Validating against registrations..."):
-                        regs = fetch_all_records("course_registrations", "usn, course_code", {"cycle_id": selected_cycle_id})
-                        valid_pairs = set((str(r['usn']).strip().upper(), str(r['course_code']).strip().upper()) for r in regs)
-                        
-                        records, ignored_count = [], 0
-                        for _, r in df_cie.iterrows():
-                            usn, cc = clean_str(r[usn_col]), clean_str(r[cc_col])
-                            if (usn, cc) in valid_pairs:
-                                records.append({"cycle_id": selected_cycle_id, "usn": usn, "course_code": cc, "cie_marks": safe_float(r[m_col], None)})
-                            else:
-                                ignored_count += 1
-                                
-                        if not records:
-                            st.error("No matching registered students found.")
-                        else:
-                            for i in range(0, len(records), 500):
-                                supabase.table("student_results").upsert(records[i:i + 500]).execute()
-                            st.success(f"✅ Successfully uploaded {len(records)} CIE records.")
-                            if ignored_count > 0:
-                                st.warning(f"⚠️ Blocked {ignored_count} records (Not registered).")
+                    for i in range(0, len(records), 500):
+                        supabase.table("student_results").upsert(records[i:i + 500]).execute()
+                    st.success(f"✅ Successfully uploaded {len(records)} CIE records.")
+                    if ignored_count > 0:
+                        st.warning(f"⚠️ Blocked {ignored_count} records (Not registered).")
+                    if report.count("BAD_MARKS") or report.count("DUPLICATE_ROW"):
+                        st.warning(f"⚠️ {report.count('BAD_MARKS')} non-numeric marks saved as blank, {report.count('DUPLICATE_ROW')} duplicate rows superseded.")
+                if not report.issues.empty:
+                    st.download_button("📥 Download CIE Issue Report", report.issues.to_csv(index=False).encode('utf-8'), "CIE_Upload_Issues.csv", "text/csv")
 
             st.divider()
             st.subheader("🔄 Auto-Sync Arrear CIEs from Parent Cycle")
@@ -559,74 +547,37 @@ if show_decoder:
         st.subheader("🔐 Standalone Bundle Decoder")
         col_d1, col_d2 = st.columns(2)
         with col_d1:
-            key_file = st.file_uploader("1. Upload MASTER_SECRET_KEY.xlsx", type=['xlsx'])
+            key_file = st.file_uploader("1. MASTER_SECRET_KEY.xlsx (optional: only for bundles coded before server-side keys)", type=['xlsx'])
         with col_d2:
             bundle_files = st.file_uploader("2. Upload Evaluator Bundles (.xlsx)", type=['xlsx'], accept_multiple_files=True)
 
         if st.button("🔓 Generate Decoded CSV", type="primary"):
-            if not key_file or not bundle_files:
-                st.warning("⚠️ Please upload both the Master Key and at least one Evaluator Bundle.")
+            if not bundle_files:
+                st.warning("⚠️ Please upload at least one Evaluator Bundle.")
             else:
                 with st.spinner("Decrypting Dummy IDs and extracting marks..."):
                     try:
-                        key_df = pd.read_excel(key_file)
-                        key_df['Dummy_ID'] = key_df['Dummy_ID'].astype(str).str.strip().str.upper()
-                        extracted_data = []
+                        marks_df, read_issues = read_bundles([(f.name, f.getvalue()) for f in bundle_files])
+                        if read_issues:
+                            st.warning(f"⚠️ {len(read_issues)} workbooks could not be read and were skipped.")
+                            st.dataframe(pd.DataFrame(read_issues), hide_index=True, use_container_width=True)
                         
-                        for f in bundle_files:
-                            try:
-                                df_preview = pd.read_excel(f, sheet_name='Marks Entry', header=None, nrows=15)
-                                header_idx = -1
-                                for idx, row in df_preview.iterrows():
-                                    if any("CODING" in str(x).upper() or "DUMMY" in str(x).upper() for x in row.tolist()):
-                                        header_idx = idx
-                                        break
-                                if header_idx == -1:
-                                    continue
-                                
-                                df_bun = pd.read_excel(f, sheet_name='Marks Entry', header=header_idx)
-                                dummy_col = next((c for c in df_bun.columns if "DUMMY" in str(c).upper() or "CODING" in str(c).upper()), None)
-                                marks_col = next((c for c in df_bun.columns if "FINAL SEE" in str(c).upper()), None)
-                                if not marks_col:
-                                    marks_col = next((c for c in df_bun.columns if "TOTAL SEE" in str(c).upper()), None)
-                                
-                                if dummy_col and marks_col:
-                                    for _, r in df_bun.iterrows():
-                                        d_id = str(r[dummy_col]).strip().upper()
-                                        m_val = r[marks_col]
-                                        if len(d_id) > 2 and d_id != "NAN":
-                                            extracted_data.append({'Dummy_ID': d_id, 'SEE_Raw_Val': m_val})
-                            except:
-                                pass
-                        
-                        if extracted_data:
-                            marks_df = pd.DataFrame(extracted_data)
-                            final_df = pd.merge(key_df, marks_df, on='Dummy_ID', how='inner')
-                            processed_records = []
-                            for _, r in final_df.iterrows():
-                                m_val = str(r.get('SEE_Raw_Val', '')).strip().upper()
-                                stat, raw_see = "PRESENT", 0.0
-                                
-                                if m_val in ['AB', 'ABSENT']:
-                                    stat = 'ABSENT'
-                                elif m_val in ['MP', 'MAL', 'MALPRACTICE']:
-                                    stat = 'MALPRACTICE'
-                                elif m_val in ['WH', 'WITHHELD']:
-                                    stat = 'WITHHELD'
-                                elif m_val == 'NAN' or m_val == '':
-                                    stat = 'PRESENT'
-                                else:
-                                    try:
-                                        raw_see = float(m_val)
-                                    except ValueError:
-                                        raw_see = 0.0
-                                
-                                processed_records.append({"usn": clean_str(r['USN']), "course_code": clean_str(r['Subject']), "see_marks": raw_see, "status": stat})
+                        if not marks_df.empty:
+                            # Dummy codes resolve by primary key in dummy_code_map; an uploaded key file covers older bundles
+                            key_df = resolve_dummy_ids(supabase, marks_df['Dummy_ID'].unique())
+                            if key_file:
+                                file_key = pd.read_excel(key_file)
+                                file_key['Dummy_ID'] = file_key['Dummy_ID'].astype(str).str.strip().str.upper()
+                                key_df = pd.concat([key_df, file_key[~file_key['Dummy_ID'].isin(key_df['Dummy_ID'])]], ignore_index=True)
+                            unknown = marks_df.loc[~marks_df['Dummy_ID'].isin(key_df['Dummy_ID']), 'Dummy_ID'].nunique()
+                            if unknown:
+                                st.warning(f"⚠️ {unknown} dummy codes are not on record and were skipped." +
+                                           (" The code map is readable by CoE staff only (Admin / COE / Super User)." if key_df.empty else ""))
                             
-                            out_df = pd.DataFrame(processed_records)
+                            out_df = decode_marks(marks_df, key_df)
                             csv_buffer = io.StringIO()
                             out_df.to_csv(csv_buffer, index=False)
-                            st.success(f"✅ Successfully decoded {len(out_df)} records!")
+                            st.success(f"✅ Successfully decoded {len(out_df)} records from {marks_df['Bundle_File'].nunique()} bundles!")
                             st.download_button(label="📥 Download Decoded SEE CSV", data=csv_buffer.getvalue(), file_name="Decoded_SEE_Marks.csv", mime="text/csv", type="primary")
                         else:
                             st.error("No valid marks data extracted from bundles.")
@@ -643,51 +594,26 @@ if show_see:
         with col_s1:
             f_see = st.file_uploader("Upload CSV (Required: usn, course_code, see_marks, status)", type='csv', key="see_up")
             if f_see and st.button("🚀 Process Bulk SEE"):
-                df_see = pd.read_csv(f_see)
-                usn_col = find_column(df_see, ['usn', 'student id'])
-                cc_col = find_column(df_see, ['course_code', 'course code', 'subject code', 'subject'])
-                m_col = find_column(df_see, ['see_marks', 'see', 'marks', 'see_raw'])
-                stat_col = find_column(df_see, ['status', 'exam_status', 'attendance'])
-                
-                if not (usn_col and cc_col and m_col):
+                with st.spinner("Validating against registrations..."):
+                    regs = fetch_all_records("course_registrations", "usn, course_code", {"cycle_id": selected_cycle_id})
+                    report = validate_see_upload(f_see, regs)
+                    records = report.records(cycle_id=selected_cycle_id)
+                    ignored_count = report.count("NOT_REGISTERED")
+                    
+                if report.count("MISSING_COLUMNS"):
                     st.error("Missing standard columns.")
+                elif not records:
+                    st.error("❌ Upload Failed. No valid records.")
                 else:
-                    with st.spinner("Validating against registrations..."):
-                        regs = fetch_all_records("course_registrations", "usn, course_code", {"cycle_id": selected_cycle_id})
-                        valid_pairs = set((str(r['usn']).strip().upper(), str(r['course_code']).strip().upper()) for r in regs)
-                        
-                        records, ignored_count = [], 0
-                        for _, r in df_see.iterrows():
-                            usn, cc = clean_str(r[usn_col]), clean_str(r[cc_col])
-                            if (usn, cc) in valid_pairs:
-                                stat = clean_str(r[stat_col]) if stat_col else "PRESENT"
-                                m_val = str(r[m_col]).strip().upper()
-                                raw_see = None
-                                
-                                if m_val in ['AB', 'ABSENT']:
-                                    stat = 'ABSENT'
-                                elif m_val in ['MP', 'MAL']:
-                                    stat = 'MALPRACTICE'
-                                elif m_val in ['WH']:
-                                    stat = 'WITHHELD'
-                                elif pd.notna(r[m_col]) and m_val != 'NAN' and m_val != '':
-                                    try:
-                                        raw_see = float(m_val)
-                                    except:
-                                        raw_see = None
-
-                                records.append({"cycle_id": selected_cycle_id, "usn": usn, "course_code": cc, "see_raw": raw_see, "exam_status": stat})
-                            else:
-                                ignored_count += 1
-                                
-                        if not records:
-                            st.error("❌ Upload Failed. No valid records.")
-                        else:
-                            for i in range(0, len(records), 500):
-                                supabase.table("student_results").upsert(records[i:i + 500]).execute()
-                            st.success(f"✅ Successfully uploaded {len(records)} valid SEE records.")
-                            if ignored_count > 0:
-                                st.warning(f"⚠️ Blocked {ignored_count} unregistered records.")
+                    for i in range(0, len(records), 500):
+                        supabase.table("student_results").upsert(records[i:i + 500]).execute()
+                    st.success(f"✅ Successfully uploaded {len(records)} valid SEE records.")
+                    if ignored_count > 0:
+                        st.warning(f"⚠️ Blocked {ignored_count} unregistered records.")
+                    if report.count("BAD_MARKS") or report.count("DUPLICATE_ROW"):
+                        st.warning(f"⚠️ {report.count('BAD_MARKS')} non-numeric marks saved as blank, {report.count('DUPLICATE_ROW')} duplicate rows superseded.")
+                if not report.issues.empty:
+                    st.download_button("📥 Download SEE Issue Report", report.issues.to_csv(index=False).encode('utf-8'), "SEE_Upload_Issues.csv", "text/csv")
 
         with col_s2:
             with st.form("manual_see"):
@@ -0,0 +1,137 @@
+import hmac
+import hashlib
+import secrets
+import pandas as pd
+
+# --- CONFIGURATION ---
+CODE_TABLE = "dummy_code_map"          # sql/dummy_codes.sql
+KEY_TABLE = "dummy_code_keys"
+RESERVE_RPC = "reserve_dummy_serials"
+KEY_SCOPE = "global"                   # one key and counter for every cycle, so codes never collide across sessions
+ALPHABET = "0123456789ABCDEFGHJKMNPQRSTVWXYZ"  # Crockford base 32: no I, L, O, U
+CODE_LENGTH = 8                        # 40 bits (~1.1 trillion codes); longer codes are issued once that runs out
+FEISTEL_ROUNDS = 6
+WRITE_BATCH = 500
+READ_PAGE = 1000
+IN_CHUNK = 200
+
+def _is_missing_rpc(err):
+    msg = str(err)
+    return "PGRST202" in msg or "Could not find the function" in msg
+
+# ==========================================
+# 1. KEYED PERMUTATION
+# ==========================================
+def _feistel(value, bits, key, rounds=FEISTEL_ROUNDS, decrypt=False):
+    """Balanced Feistel network over `bits`-bit integers with an HMAC-SHA256 round function: a keyed bijection"""
+    half = bits // 2
+    mask = (1 << half) - 1
+    def f(rnd, half_value):
+        digest = hmac.new(key, rnd.to_bytes(1, "big") + half_value.to_bytes(8, "big"), hashlib.sha256).digest()
+        return int.from_bytes(digest[:8], "big") & mask
+
+    left, right = value >> half, value & mask
+    if decrypt:
+        for rnd in reversed(range(rounds)):
+            left, right = right ^ f(rnd, left), left
+    else:
+        for rnd in range(rounds):
+            left, right = right, left ^ f(rnd, right)
+    return (left << half) | right
+
+def code_length(serial):
+    """Shortest even length (from CODE_LENGTH) whose code space holds `serial`"""
+    length = CODE_LENGTH
+    while serial >= 32 ** length:
+        length += 2
+    return length
+
+def encode_serial(serial, key):
+    """Serial number -> dummy code. Distinct serials always give distinct codes under the same key."""
+    length = code_length(serial)
+    n = _feistel(serial, 5 * length, key)
+    chars = []
+    for _ in range(length):
+        n, d = divmod(n, 32)
+        chars.append(ALPHABET[d])
+    return "".join(reversed(chars))
+
+def decode_code(code, key):
+    """Dummy code -> serial number (None when the code is not well formed)"""
+    code = str(code).strip().upper()
+    if len(code) < CODE_LENGTH or len(code) % 2 or any(c not in ALPHABET for c in code):
+        return None
+    n = 0
+    for c in code:
+        n = n * 32 + ALPHABET.index(c)
+    serial = _feistel(n, 5 * len(code), key, decrypt=True)
+    return serial if code_length(serial) == len(code) else None
+
+# ==========================================
+# 2. SERVER-SIDE KEY & SERIALS
+# ==========================================
+def reserve_serials(supabase, count):
+    """
+    Reserves `count` consecutive serials. Returns (first_serial, key_bytes).
+    The `reserve_dummy_serials` RPC does this under a row lock; without it a read-then-write fallback is used
+    (fine for one operator at a time).
+    """
+    try:
+        res = supabase.rpc(RESERVE_RPC, {"p_scope": KEY_SCOPE, "p_count": count}).execute()
+        row = res.data[0] if isinstance(res.data, list) else res.data
+        return int(row['start_serial']), bytes.fromhex(row['secret'])
+    except Exception as e:
+        if not _is_missing_rpc(e): raise
+
+    rows = supabase.table(KEY_TABLE).select("secret, next_serial").eq("scope", KEY_SCOPE).execute().data
+    if not rows:
+        rows = [{"secret": secrets.token_hex(32), "next_serial": 0}]
+        supabase.table(KEY_TABLE).insert({"scope": KEY_SCOPE, **rows[0]}).execute()
+    start = int(rows[0]['next_serial'])
+    supabase.table(KEY_TABLE).update({"next_serial": start + count}).eq("scope", KEY_SCOPE).execute()
+    return start, bytes.fromhex(rows[0]['secret'])
+
+# ==========================================
+# 3. CODE MAP (write & resolve)
+# ==========================================
+def _session_codes(supabase, cycle_id, exam_date, session):
+    rows, start = [], 0
+    while True:
+        page = (supabase.table(CODE_TABLE).select("dummy_id, usn, course_code")
+                .eq("cycle_id", cycle_id).eq("exam_date", exam_date).eq("session", session)
+                .range(start, start + READ_PAGE - 1).execute().data or [])
+        rows.extend(page)
+        if len(page) < READ_PAGE: return rows
+        start += READ_PAGE
+
+def register_dummy_codes(supabase, cycle_id, exam_date, session, key_log):
+    """
+    Dummy codes for the bundle key log (Bundle_ID, Original_Room, USN, Subject, Branch_Group, Status), aligned with
+    its rows. Candidates already coded for this session keep their code (regenerated bundles stay consistent);
+    new candidates get fresh serials. Every row is upserted into dummy_code_map with its bundle and status.
+    """
+    existing = {(r['usn'], r['course_code']): r['dummy_id'] for r in _session_codes(supabase, cycle_id, exam_date, session)}
+    keys = list(zip(key_log['USN'], key_log['Subject']))
+    fresh = [k for k in dict.fromkeys(keys) if k not in existing]
+    if fresh:
+        start, key = reserve_serials(supabase, len(fresh))
+        existing.update({k: encode_serial(start + i, key) for i, k in enumerate(fresh)})
+
+    codes = [existing[k] for k in keys]
+    records = [
+        {"dummy_id": code, "cycle_id": cycle_id, "exam_date": exam_date, "session": session, "usn": usn, "course_code": cc,
+         "bundle_id": b_id, "room_no": str(room), "status": status}
+        for code, usn, cc, b_id, room, status in zip(codes, key_log['USN'], key_log['Subject'], key_log['Bundle_ID'], key_log['Original_Room'], key_log['Status'])
+    ]
+    for i in range(0, len(records), WRITE_BATCH):
+        supabase.table(CODE_TABLE).upsert(records[i:i + WRITE_BATCH]).execute()
+    return codes
+
+def resolve_dummy_ids(supabase, dummy_ids):
+    """Primary-key lookups for scanned codes -> DataFrame (Dummy_ID, USN, Subject, Bundle_ID, Status); unknown codes are left out"""
+    ids = list(dict.fromkeys(str(d).strip().upper() for d in dummy_ids))
+    rows = []
+    for i in range(0, len(ids), IN_CHUNK):
+        rows.extend(supabase.table(CODE_TABLE).select("dummy_id, usn, course_code, bundle_id, status").in_("dummy_id", ids[i:i + IN_CHUNK]).execute().data or [])
+    return pd.DataFrame(rows, columns=["dummy_id", "usn", "course_code", "bundle_id", "status"]).rename(
+        columns={"dummy_id": "Dummy_ID", "usn": "USN", "course_code": "Subject", "bundle_id": "Bundle_ID", "status": "Status"})
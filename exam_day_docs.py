@@ -0,0 +1,610 @@
+import io
+import os
+import math
+import time
+import zipfile
+import hashlib
+import functools
+import pandas as pd
+from PIL import Image as PILImage
+from seating_engine import ALLOT_COLUMNS
+from pdf_volumes import render_volumes, DEFAULT_VOLUME_WORKERS
+
+# --- PDF LIBRARIES ---
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.platypus import SimpleDocTemplate, Table, TableStyle, Paragraph, Spacer, PageBreak
+from reportlab.lib.styles import getSampleStyleSheet, ParagraphStyle
+from reportlab.lib.units import inch
+from reportlab.lib.enums import TA_CENTER, TA_LEFT
+from reportlab.lib.utils import ImageReader
+
+# --- EXCEL UTILS ---
+import xlsxwriter
+from xlsxwriter.utility import xl_rowcol_to_cell, xl_col_to_name
+
+# ==========================================
+# 1. SHARED HELPERS
+# ==========================================
+def resize_image_for_excel(img_bytes, target_height=50):
+    try:
+        with PILImage.open(io.BytesIO(img_bytes)) as img:
+            w_percent = (target_height / float(img.size[1]))
+            target_width = int(float(img.size[0]) * float(w_percent))
+            
+            resized_img = img.resize((target_width, target_height), PILImage.LANCZOS)
+            if resized_img.mode != 'RGBA':
+                resized_img = resized_img.convert('RGBA')
+                
+            out_io = io.BytesIO()
+            resized_img.save(out_io, format='PNG')
+            out_io.seek(0)
+            return out_io
+    except Exception as e:
+        return io.BytesIO(img_bytes)
+
+def get_header_drawer(assets):
+    def draw_header(c, doc):
+        c.saveState()
+        y_start = A4[1] - 35
+        
+        if "logo" in assets:
+            c.drawImage(ImageReader(io.BytesIO(assets["logo"])), 35, y_start - 35, width=50, height=50, mask='auto', preserveAspectRatio=True)
+            
+        if "naac" in assets:
+            c.drawImage(ImageReader(io.BytesIO(assets["naac"])), A4[0] - 85, y_start - 35, width=50, height=50, mask='auto', preserveAspectRatio=True)
+
+        c.setFont("Helvetica-Bold", 14)
+        c.drawCentredString(A4[0]/2, y_start, "AMC ENGINEERING COLLEGE")
+        c.setFont("Helvetica", 9)
+        c.drawCentredString(A4[0]/2, y_start - 15, "AMC Campus, Bannerghatta Road, Bengaluru - 560083")
+        c.drawCentredString(A4[0]/2, y_start - 27, "Autonomous Institution Affiliated to VTU, Belagavi")
+        c.drawCentredString(A4[0]/2, y_start - 39, "Approved by AICTE, New Delhi | NAAC A+ Accredited")
+        
+        c.setLineWidth(1)
+        c.line(30, y_start - 48, A4[0] - 30, y_start - 48)
+        c.restoreState()
+    return draw_header
+
+def allocation_fingerprint(df, with_status=False):
+    """Short hash of the seating layout (plus the Status column when asked): the cache key for documents built from it"""
+    cols = [c for c in ALLOT_COLUMNS + (['Status'] if with_status else []) if c in df.columns]
+    digest = hashlib.blake2b("|".join(cols).encode(), digest_size=12)
+    digest.update(pd.util.hash_pandas_object(df[cols].astype(str), index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+# ==========================================
+# 2. SESSION DOCUMENTS
+# ==========================================
+def gen_posters(df, date, session, assets):
+    buf = io.BytesIO(); doc = SimpleDocTemplate(buf, pagesize=A4, topMargin=95, bottomMargin=15)
+    elements = []; styles = getSampleStyleSheet()
+    s_seat = ParagraphStyle('S', parent=styles['Normal'], fontSize=8, alignment=TA_CENTER, textColor=colors.gray)
+    s_usn = ParagraphStyle('U', parent=styles['Normal'], fontSize=11, fontName='Helvetica-Bold', alignment=TA_CENTER)
+    s_sub = ParagraphStyle('Sub', parent=styles['Normal'], fontSize=7, alignment=TA_CENTER)
+    
+    for room_no, data in df.groupby('RoomNo'):
+        elements.append(Paragraph(f"ROOM: {room_no} | Date: {date} | Session: {session}", styles['Heading2']))
+        elements.append(Spacer(1, 5))
+        
+        students = data.sort_values('SeatNo').to_dict('records')
+        grid = []; row_buf = []
+        for s in students:
+            row_buf.append([Paragraph(f"Seat: {s['SeatNo']}", s_seat), Spacer(1,1), Paragraph(s['USN'], s_usn), Spacer(1,1), Paragraph(s['Subject Code'], s_sub)])
+            if len(row_buf) == 4: grid.append(row_buf); row_buf = []
+        if row_buf:
+            while len(row_buf) < 4: row_buf.append("")
+            grid.append(row_buf)
+            
+        t = Table(grid, colWidths=[1.8*inch]*4)
+        t.setStyle(TableStyle([('GRID', (0,0), (-1,-1), 0.5, colors.black), ('VALIGN', (0,0), (-1,-1), 'MIDDLE'), ('ALIGN', (0,0), (-1,-1), 'CENTER')]))
+        elements.append(t); elements.append(PageBreak())
+        
+    doc.build(elements, onFirstPage=get_header_drawer(assets), onLaterPages=get_header_drawer(assets))
+    return buf.getvalue()
+
+def gen_form_b(df, date, session, assets):
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=A4, topMargin=90, leftMargin=35, rightMargin=35, bottomMargin=15)
+    elements = []
+    styles = getSampleStyleSheet()
+    
+    sub_title_style = ParagraphStyle('SubTitle', parent=styles['Normal'], alignment=TA_CENTER, fontName='Helvetica-Bold', fontSize=10)
+    meta_style = ParagraphStyle('Meta', parent=styles['Normal'], fontSize=9, leading=12)
+    th_style = ParagraphStyle('th', parent=styles['Normal'], alignment=TA_CENTER, fontName='Helvetica-Bold', fontSize=8)
+    td_style_c = ParagraphStyle('td_c', parent=styles['Normal'], alignment=TA_CENTER, fontSize=9)
+    td_style_l = ParagraphStyle('td_l', parent=styles['Normal'], alignment=TA_LEFT, fontSize=8)
+    
+    for (room, code), group in df.groupby(['RoomNo', 'Subject Code']):
+        course_name = group['Subject Name'].iloc[0] if 'Subject Name' in group.columns else code
+        branch_val = group['Branch'].iloc[0] if 'Branch' in group.columns else "N/A"
+        
+        elements.append(Spacer(1, 5))
+        elements.append(Paragraph("ATTENDANCE & ROOM SUPERINTENDENT’S/EXAMINERS REPORT (In Triplicate)", sub_title_style))
+        elements.append(Spacer(1, 8))
+        
+        m_data = [
+            [Paragraph(f"<b>B.E./B.Arch./MCA/MBA/M.Tech:</b> {branch_val}", meta_style), Paragraph(f"<b>Semester Examination:</b> {date}", meta_style), Paragraph(f"<b>Block No:</b> {room}", meta_style)],
+            [Paragraph(f"<b>Branch / Title of the course:</b> {branch_val}", meta_style), Paragraph(f"<b>Subject Code:</b> {code}", meta_style), ""],
+            [Paragraph(f"<b>Subject:</b> {course_name}", meta_style), "", ""],
+            [Paragraph(f"<b>Centre:</b> AMC ENGINEERING COLLEGE", meta_style), Paragraph(f"<b>Seat No's from:</b> {group['USN'].min()} <b>TO</b> {group['USN'].max()}", meta_style), ""],
+            [Paragraph(f"<b>Date:</b> {date}", meta_style), "", Paragraph(f"<b>Time:</b> {session}", meta_style)]
+        ]
+        
+        m_table = Table(m_data, colWidths=[2.7*inch, 2.7*inch, 2.0*inch])
+        m_table.setStyle(TableStyle([
+            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('SPAN', (0,2), (2,2)), 
+            ('BOTTOMPADDING', (0,0), (-1,-1), 4)
+        ]))
+        elements.append(m_table)
+        elements.append(Spacer(1, 5))
+        
+        t_data = [[
+            Paragraph("<b>ROLL NO</b>", th_style),
+            Paragraph("<b>Seat Number of the Candidate</b>", th_style),
+            Paragraph("<b>Answer Book/Main Drawing Sheet Number</b>", th_style),
+            Paragraph("<b>Signature of the Candidate</b>", th_style),
+            Paragraph("<b>Additional/Drawing/ Graph Sheet Numbers</b>", th_style),
+            Paragraph("<b>Total</b>", th_style)
+        ]]
+        
+        for _, r in group.sort_values('SeatNo').iterrows():
+            t_data.append([Paragraph(r['USN'], td_style_c), Paragraph(str(r['Student Name']), td_style_l), "", "", "", ""])
+            
+        t = Table(t_data, colWidths=[1.1*inch, 2.1*inch, 1.3*inch, 1.3*inch, 1.1*inch, 0.5*inch])
+        t.setStyle(TableStyle([
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 2), 
+            ('TOPPADDING', (0,0), (-1,-1), 2),
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+        ]))
+        elements.append(t)
+        elements.append(Spacer(1, 10))
+        
+        f_data = [
+            [Paragraph("<b>Seat Number of the candidates absent:</b> ____________________________________________________________________", meta_style), "", ""],
+            [Paragraph("<b>Seat Number of the candidates booked under Malpractice:</b> ________________________________________________________", meta_style), "", ""],
+            [Paragraph(f"<b>Total Number of students:</b> {len(group)}", meta_style), Paragraph("<b>Total Present:</b> ________", meta_style), Paragraph("<b>Total Absent:</b> ________", meta_style)],
+            ["\n\nSignature of Room Superintendent", "", "\n\nSignature of Chief Superintendent"]
+        ]
+        f_table = Table(f_data, colWidths=[3.6*inch, 1.9*inch, 1.9*inch])
+        f_table.setStyle(TableStyle([
+            ('SPAN', (0,0), (2,0)), 
+            ('SPAN', (0,1), (2,1)), 
+            ('ALIGN', (0,3), (2,3), 'CENTER'), 
+            ('VALIGN', (0,0), (-1,-1), 'BOTTOM'),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 5)
+        ]))
+        elements.append(f_table)
+        elements.append(PageBreak())
+        
+    doc.build(elements, onFirstPage=get_header_drawer(assets), onLaterPages=get_header_drawer(assets))
+    return buf.getvalue()
+
+def gen_form_a(df, date, session, assets, cycle_name):
+    buf = io.BytesIO()
+    doc = SimpleDocTemplate(buf, pagesize=A4, topMargin=90, leftMargin=35, rightMargin=35, bottomMargin=30)
+    elements = []
+    styles = getSampleStyleSheet()
+    
+    title_style = ParagraphStyle('Title', parent=styles['Heading3'], alignment=TA_CENTER, fontName='Helvetica-Bold', fontSize=12)
+    sub_title_style = ParagraphStyle('SubTitle', parent=styles['Normal'], alignment=TA_CENTER, fontName='Helvetica-Bold', fontSize=10)
+    meta_style = ParagraphStyle('Meta', parent=styles['Normal'], fontSize=10, leading=14)
+    th_style = ParagraphStyle('th', parent=styles['Normal'], fontName='Helvetica-Bold', fontSize=10)
+    td_style_l = ParagraphStyle('td_l', parent=styles['Normal'], fontSize=9, leading=14, alignment=TA_LEFT)
+    td_style_c = ParagraphStyle('td_c', parent=styles['Normal'], fontSize=10, alignment=TA_CENTER, fontName='Helvetica-Bold')
+    
+    for (branch, code), group in df.groupby(['Branch', 'Subject Code']):
+        course_name = group['Subject Name'].iloc[0] if 'Subject Name' in group.columns else code
+        
+        elements.append(Spacer(1, 5))
+        elements.append(Paragraph("FORM - A", title_style))
+        elements.append(Paragraph("CONSOLIDATED ATTENDANCE REPORT FOR PACKING OF ANSWER SCRIPTS  (In Duplicate)", sub_title_style))
+        elements.append(Spacer(1, 15))
+        
+        elements.append(Paragraph(f"<b>Semester End Examination - {cycle_name}</b>", sub_title_style))
+        elements.append(Spacer(1, 10))
+        
+        m_data = [
+            [Paragraph(f"<b>Branch / Program:</b>", meta_style), Paragraph(f"{branch}", meta_style), "", ""],
+            [Paragraph(f"<b>Course Title:</b>", meta_style), Paragraph(f"{course_name}", meta_style), Paragraph(f"<b>Course Code:</b>", meta_style), Paragraph(f"{code}", meta_style)],
+            [Paragraph(f"<b>Date:</b>", meta_style), Paragraph(f"{date}", meta_style), Paragraph(f"<b>Time:</b>", meta_style), Paragraph(f"{session}", meta_style)]
+        ]
+        
+        m_table = Table(m_data, colWidths=[1.3*inch, 3.2*inch, 1.2*inch, 1.3*inch])
+        m_table.setStyle(TableStyle([
+            ('ALIGN', (0,0), (-1,-1), 'LEFT'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 6)
+        ]))
+        elements.append(m_table)
+        elements.append(Spacer(1, 15))
+        
+        present_usns = group[group['Status'] == 'PRESENT']['USN'].sort_values().tolist()
+        absent_usns = group[group['Status'] == 'ABSENT']['USN'].sort_values().tolist()
+        malpractice_usns = group[group['Status'] == 'MALPRACTICE']['USN'].sort_values().tolist()
+        
+        t_data = []
+        t_styles = [
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('TOPPADDING', (0,0), (-1,-1), 6),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 6),
+        ]
+        
+        current_row = 0
+        
+        def add_section(title, usn_list, total_count):
+            nonlocal current_row
+            t_data.append([Paragraph(f"<b>{title}</b>", th_style), Paragraph("<b>COUNT</b>", th_style)])
+            t_styles.append(('BACKGROUND', (0, current_row), (-1, current_row), colors.lightgrey))
+            current_row += 1
+            
+            if not usn_list:
+                t_data.append([Paragraph("Nil", td_style_l), Paragraph("0", td_style_c)])
+                current_row += 1
+            else:
+                chunk_size = 60 
+                for i in range(0, len(usn_list), chunk_size):
+                    chunk = usn_list[i:i+chunk_size]
+                    count_text = str(total_count) if i == 0 else "" 
+                    t_data.append([Paragraph(", ".join(chunk), td_style_l), Paragraph(count_text, td_style_c)])
+                    current_row += 1
+
+        add_section("SEAT NUMBERS OF CANDIDATES PRESENT", present_usns, len(present_usns))
+        add_section("SEAT NUMBERS OF CANDIDATES ABSENT", absent_usns, len(absent_usns))
+        add_section("SEAT NUMBERS OF CANDIDATES BOOKED UNDER MALPRACTICE", malpractice_usns, len(malpractice_usns))
+        
+        t = Table(t_data, colWidths=[6.2*inch, 1.0*inch])
+        t.setStyle(TableStyle(t_styles))
+        elements.append(t)
+        elements.append(Spacer(1, 30))
+        
+        elements.append(Paragraph("<b>Signatures with date:</b>", meta_style))
+        elements.append(Spacer(1, 30))
+        
+        sig_data = [
+            ["Deputy Chief Superintendent", "Chief Superintendent"]
+        ]
+        sig_table = Table(sig_data, colWidths=[3.5*inch, 3.5*inch])
+        sig_table.setStyle(TableStyle([
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('FONTNAME', (0,0), (-1,-1), 'Helvetica-Bold')
+        ]))
+        elements.append(sig_table)
+        elements.append(PageBreak())
+        
+    doc.build(elements, onFirstPage=get_header_drawer(assets), onLaterPages=get_header_drawer(assets))
+    return buf.getvalue()
+
+def gen_qpds(df, date, session, assets):
+    buf = io.BytesIO(); doc = SimpleDocTemplate(buf, pagesize=A4, topMargin=95)
+    elements = []; styles = getSampleStyleSheet()
+    elements.append(Paragraph("<b>QP INDENT (ROOM WISE)</b>", styles['Heading2']))
+    elements.append(Paragraph(f"Date: {date} | Session: {session}", styles['Normal']))
+    elements.append(Spacer(1, 15))
+    
+    for room, data in df.groupby('RoomNo'):
+        elements.append(Paragraph(f"<b>ROOM: {room}</b>", styles['Heading3']))
+        counts = data.groupby('Subject Code').size().reset_index(name='Qty')
+        t_data = [['Course Code', 'Quantity']]
+        for _, r in counts.iterrows(): t_data.append([r['Subject Code'], str(r['Qty'])])
+        t_data.append(['TOTAL', str(counts['Qty'].sum())])
+        
+        t = Table(t_data, colWidths=[2*inch, 1*inch])
+        t.setStyle(TableStyle([('GRID', (0,0), (-1,-1), 0.5, colors.black)]))
+        elements.append(t); elements.append(Spacer(1, 10))
+        
+    doc.build(elements, onFirstPage=get_header_drawer(assets), onLaterPages=get_header_drawer(assets))
+    return buf.getvalue()
+
+def gen_smart_excel(df, date, session):
+    buf = io.BytesIO()
+    with pd.ExcelWriter(buf, engine='xlsxwriter') as writer:
+        df_sorted = df.sort_values(['Branch', 'USN'])
+        df_sorted.to_excel(writer, sheet_name='Appearing_List', index=False, columns=['RoomNo', 'SeatNo', 'USN', 'Student Name', 'Branch', 'Subject Code'])
+        summary = df.groupby(['RoomNo', 'Subject Code']).size().reset_index(name='Count')
+        summary.to_excel(writer, sheet_name='Room_Summary', index=False)
+    return buf.getvalue()
+
+# kind: (file name, reads Status, builder(df, date, session, assets, cycle_name)).
+# Documents that ignore Status stay valid while absentees are being marked.
+SESSION_DOCS = {
+    "posters": ("Posters_{date}.pdf", False, lambda df, d, s, a, c: gen_posters(df, d, s, a)),
+    "form_b": ("FormB_{date}.pdf", False, lambda df, d, s, a, c: gen_form_b(df, d, s, a)),
+    "form_a": ("FormA_{date}.pdf", True, lambda df, d, s, a, c: gen_form_a(df, d, s, a, c)),
+    "qpds": ("QPDS_{date}.pdf", False, lambda df, d, s, a, c: gen_qpds(df, d, s, a)),
+    "appearing": ("Appearing_{date}.xlsx", False, lambda df, d, s, a, c: gen_smart_excel(df, d, s)),
+}
+
+# ==========================================
+# 3. EVALUATION BUNDLES
+# ==========================================
+# --- BUNDLE LAYOUT ---
+BUNDLE_SIZE = 20
+SHEET_PASSWORD = 'admin123'
+PARALLEL_MIN_BUNDLES = 8      # below this a process pool costs more than it saves
+_CELL = {'align': 'center', 'valign': 'vcenter', 'border': 1}
+BUNDLE_FORMATS = {
+    'title': {'bold': True, 'align': 'center', 'valign': 'vcenter', 'font_size': 14},
+    'sub': {'bold': True, 'align': 'center', 'valign': 'vcenter', 'font_size': 11},
+    'head': {**_CELL, 'bold': True, 'bg_color': '#f0f0f0', 'text_wrap': True},
+    'locked': {**_CELL, 'locked': True},
+    'locked_gray': {**_CELL, 'locked': True, 'bg_color': '#e0e0e0'},
+    'edit': {**_CELL, 'locked': False, 'bg_color': '#FFFFCC'},
+    'abs': {**_CELL, 'locked': True, 'bg_color': '#FFC7CE', 'font_color': '#9C0006', 'bold': True},
+    'footer': {'bold': True, 'font_size': 11, 'valign': 'vcenter'},
+    'footer_val': {'bold': True, 'font_size': 11, 'valign': 'vcenter', 'align': 'left', 'font_color': '#0000FF'},
+}
+_DIGIT = 'CHOOSE(MID({{c}},{pos},1)+1, "Zero","One","Two","Three","Four","Five","Six","Seven","Eight","Nine")'
+MARKS_IN_WORDS = ('=IF({c}="","",TRIM(' + ' & '.join(
+    f'IF(LEN({{c}})>={p}, {"" if p == 1 else chr(34) + " " + chr(34) + " & "}{_DIGIT.format(pos=p)}, "")' for p in (1, 2, 3)) + '))')
+
+def prepare_bundle_assets(assets):
+    """Logos resized and PNG-encoded once per run (plain bytes, so workers can receive them)"""
+    return {k: resize_image_for_excel(assets[k]).getvalue() for k in ("logo", "naac") if k in assets}
+
+@functools.lru_cache(maxsize=None)
+def marks_row_template(num_q, is_mba):
+    """Formula templates for one 'present' row of the Marks Entry sheet, filled per row with .format(r=excel_row)"""
+    end_col_idx = 2 + (num_q * 4)
+    col_tot, col_mod = xl_col_to_name(end_col_idx), xl_col_to_name(end_col_idx + 1)
+    questions = [(c, f'=SUM({xl_col_to_name(c)}{{r}}:{xl_col_to_name(c + 2)}{{r}})') for c in range(2, end_col_idx, 4)]
+    if is_mba:
+        q1_7_cells = "F{r},J{r},N{r},R{r},V{r},Z{r},AD{r}"
+        see = "=" + "+".join(f"IFERROR(LARGE(({q1_7_cells}),{k}),0)" for k in (1, 2, 3, 4)) + "+AH{r}"
+    else:
+        see = "=MAX(F{r},J{r})+MAX(N{r},R{r})+MAX(V{r},Z{r})+MAX(AD{r},AH{r})+MAX(AL{r},AP{r})"
+    return {
+        "questions": questions, "see": see,
+        "diff": f'=IF({col_mod}{{r}}>0,{col_tot}{{r}}-{col_mod}{{r}},"")',
+        "final": f"=MAX({col_tot}{{r}},{col_mod}{{r}})",
+    }
+
+def create_locked_bundle(rows, course_code, course_name, b_group, bundle_seq, total_bundles, cycle_name, bundle_assets):
+    """
+    One evaluation workbook. `rows` is [(dummy_id, status)] in bundle order; `bundle_assets` comes from
+    prepare_bundle_assets. Rows are written a run of cells at a time from precomputed formula templates.
+    """
+    out = io.BytesIO()
+    is_mba = 'MBA' in course_code.upper()
+    num_q = 8 if is_mba else 10
+    tpl = marks_row_template(num_q, is_mba)
+    
+    wb = xlsxwriter.Workbook(out, {'in_memory': True})
+    ws_marks = wb.add_worksheet('Marks Entry')
+    ws_print = wb.add_worksheet('Print')
+    fmt = {name: wb.add_format(spec) for name, spec in BUNDLE_FORMATS.items()}
+    
+    end_col_idx = 2 + (num_q * 4) 
+    col_tot = xl_col_to_name(end_col_idx)
+    col_final = xl_col_to_name(end_col_idx + 3)
+    last_q_col = xl_col_to_name(end_col_idx - 1)
+
+    ws_marks.protect(SHEET_PASSWORD)
+    ws_marks.merge_range(f'A1:{col_final}1', 'AMC Engineering College', fmt['title'])
+    ws_marks.merge_range(f'A2:{col_final}2', 'AMC Campus Bannerghatta Road, Bengaluru', fmt['sub'])
+    ws_marks.merge_range(f'A3:{col_final}3', 'Autonomous Institution under VTU, Belagavi | NAAC A+ Accredited', fmt['sub'])
+    ws_marks.merge_range(f'A5:{col_final}5', f'Semester End Examination - {cycle_name} | CBCS Scheme', fmt['sub'])
+    ws_marks.merge_range(f'A6:{col_final}6', f'Evaluation & Marks Allotment | Course: {course_code} - {course_name} | Bundle {bundle_seq}/{total_bundles}', fmt['sub'])
+    
+    ws_marks.merge_range('A8:A9', 'Sl. No.', fmt['head'])
+    ws_marks.merge_range('B8:B9', 'Coding No.', fmt['head'])
+    for q, (c, _) in enumerate(tpl['questions'], start=1):
+        ws_marks.merge_range(7, c, 7, c+2, f'Q. {q}', fmt['head'])
+        ws_marks.write_row(8, c, ['a', 'b', 'c'], fmt['head'])
+        ws_marks.merge_range(7, c+3, 8, c+3, f'Q.{q} Total', fmt['head'])
+    for offset, title in enumerate(['Total SEE Marks (100)', 'Total Moderation', 'Marks Difference', 'Final SEE Marks (100)']):
+        ws_marks.merge_range(7, end_col_idx + offset, 8, end_col_idx + offset, title, fmt['head'])
+    
+    gray_run = [""] * (end_col_idx + 1)
+    for local_idx, (dummy_id, status) in enumerate(rows):
+        row_idx = 9 + local_idx
+        ws_marks.write_row(row_idx, 0, [local_idx+1, dummy_id], fmt['locked'])
+        if status != "PRESENT":
+            ws_marks.write_row(row_idx, 2, gray_run, fmt['locked_gray'])
+            ws_marks.write(row_idx, end_col_idx+3, status, fmt['abs'])
+            continue
+        r = row_idx + 1
+        for c, sum_formula in tpl['questions']:
+            ws_marks.write_row(row_idx, c, ["", "", ""], fmt['edit'])
+            ws_marks.write_formula(row_idx, c+3, sum_formula.format(r=r), fmt['locked'])
+        ws_marks.write_formula(row_idx, end_col_idx, tpl['see'].format(r=r), fmt['locked'])
+        ws_marks.write(row_idx, end_col_idx+1, "", fmt['edit']) 
+        ws_marks.write_formula(row_idx, end_col_idx+2, tpl['diff'].format(r=r), fmt['locked'])
+        ws_marks.write_formula(row_idx, end_col_idx+3, tpl['final'].format(r=r), fmt['locked'])
+        
+    eval_row = 9 + len(rows) + 2
+    ws_marks.merge_range(eval_row, 0, eval_row, 1, "Evaluator Name:", fmt['head'])
+    ws_marks.merge_range(eval_row, 2, eval_row, 5, "", fmt['edit']) 
+    eval_input_cell = xl_rowcol_to_cell(eval_row, 2)
+        
+    ws_marks.set_column('A:A', 8)
+    ws_marks.set_column('B:B', 12)
+    ws_marks.set_column(f'C:{last_q_col}', 5)
+    ws_marks.set_column(f'{col_tot}:{col_final}', 14)
+    
+    ws_print.protect(SHEET_PASSWORD)
+    ws_print.set_row(0, 45) 
+    
+    ws_print.merge_range('A1:D1', 'AMC Engineering College', fmt['title'])
+    ws_print.merge_range('A2:D2', f'Semester End Examination - {cycle_name}', fmt['sub'])
+    ws_print.merge_range('A3:D3', f'Course Code: {course_code} | Course Title: {course_name}', fmt['sub'])
+    
+    if "logo" in bundle_assets:
+        ws_print.insert_image('A1', 'logo.png', {'image_data': io.BytesIO(bundle_assets["logo"]), 'x_offset': 10, 'y_offset': 5})
+    if "naac" in bundle_assets:
+        ws_print.insert_image('D1', 'naac.png', {'image_data': io.BytesIO(bundle_assets["naac"]), 'x_offset': 180, 'y_offset': 5})
+
+    ws_print.write_row(4, 0, ['Sl. No.', 'Answer Booklet Code', 'SEE Marks in Figures (100)', 'SEE Marks in Words'], fmt['head'])
+        
+    final_col = end_col_idx + 3
+    for local_idx, (dummy_id, status) in enumerate(rows):
+        row_idx = 5 + local_idx
+        ws_print.write_row(row_idx, 0, [local_idx+1, dummy_id], fmt['locked'])
+        if status != "PRESENT":
+            ws_print.write(row_idx, 2, status, fmt['abs'])
+            ws_print.write(row_idx, 3, "-", fmt['locked_gray'])
+        else:
+            ws_print.write_formula(row_idx, 2, f"='Marks Entry'!{xl_rowcol_to_cell(9 + local_idx, final_col)}", fmt['locked'])
+            ws_print.write_formula(row_idx, 3, MARKS_IN_WORDS.format(c=xl_rowcol_to_cell(row_idx, 2)), fmt['locked'])
+        
+    ws_print.set_column('A:A', 8)
+    ws_print.set_column('B:B', 20)
+    ws_print.set_column('C:C', 25)
+    ws_print.set_column('D:D', 35)
+
+    footer_row = 5 + len(rows) + 3
+    ws_print.write(footer_row, 1, "Evaluator Name:", fmt['footer'])
+    ws_print.write_formula(footer_row, 2, f'=IF(\'Marks Entry\'!{eval_input_cell}="","",\'Marks Entry\'!{eval_input_cell})', fmt['footer_val'])
+    ws_print.write(footer_row, 3, "Signature with Date: _________________________", fmt['footer'])
+
+    wb.close()
+    return out.getvalue()
+
+_BUNDLE_CTX = {}
+
+def init_bundle_worker(bundle_assets, cycle_name):
+    """Process-pool initializer: resized logos and cycle name are sent once per worker"""
+    _BUNDLE_CTX.update(assets=bundle_assets, cycle_name=cycle_name)
+
+def render_bundle(b_id, payload, out_dir):
+    """Worker: one planned bundle -> workbook in `out_dir`. Returns (b_id, path, dummy_ids) like the volume workers."""
+    data = create_locked_bundle(payload['rows'], payload['course_code'], payload['course_name'], payload['b_group'],
+                                payload['seq'], payload['total'], _BUNDLE_CTX['cycle_name'], _BUNDLE_CTX['assets'])
+    path = os.path.join(out_dir, f"{b_id}.xlsx")
+    with open(path, "wb") as f: f.write(data)
+    return b_id, path, [d for d, _ in payload['rows']]
+
+def bundle_groups(df):
+    """CS candidates are split by campus prefix (1AX / 1AM); everyone else is bundled by branch"""
+    usn = df['USN'].astype(str).str.strip().str.upper()
+    branch = df['Branch'].astype(str).str.strip().str.upper()
+    is_cs = (branch == 'CS') | usn.str.contains('CS', regex=False)
+    return branch.mask(is_cs, 'CS_1AM').mask(is_cs & usn.str.startswith('1AX'), 'CS_1AX')
+
+def plan_marks_bundles(df):
+    """
+    Splits a session into bundles of BUNDLE_SIZE (per subject and bundle group, USN order).
+    Returns (bundles, key_log): each bundle's rows are key_log.iloc[start:end]; codes are assigned afterwards.
+    """
+    df_bundles = df.assign(BundleGroup=bundle_groups(df))
+    bundles, key_log = [], {k: [] for k in ('Bundle_ID', 'Original_Room', 'USN', 'Subject', 'Branch_Group', 'Status')}
+    for (cc, b_group), group in df_bundles.groupby(['Subject Code', 'BundleGroup']):
+        group = group.sort_values('USN').reset_index(drop=True)
+        n_chunks = math.ceil(len(group) / BUNDLE_SIZE)
+        
+        for i in range(n_chunks):
+            chunk = group.iloc[i*BUNDLE_SIZE : (i+1)*BUNDLE_SIZE]
+            b_id = f"{b_group}-{cc}-{str(i+1).zfill(2)}"
+            course_name = chunk['Subject Name'].iloc[0] if 'Subject Name' in chunk.columns else cc
+            
+            n, start = len(chunk), len(key_log['USN'])
+            key_log['Bundle_ID'] += [b_id] * n
+            key_log['Original_Room'] += chunk['RoomNo'].tolist() if 'RoomNo' in chunk.columns else ['N/A'] * n
+            key_log['USN'] += chunk['USN'].tolist()
+            key_log['Subject'] += [cc] * n
+            key_log['Branch_Group'] += [b_group] * n
+            key_log['Status'] += chunk['Status'].tolist()
+            bundles.append({"b_id": b_id, "course_code": cc, "course_name": course_name, "b_group": b_group,
+                            "seq": i+1, "total": n_chunks, "start": start, "end": start + n})
+    return bundles, pd.DataFrame(key_log)
+
+def gen_marks_bundles(df, assets, cycle_name, assign_codes, max_workers=DEFAULT_VOLUME_WORKERS):
+    """
+    ZIP of locked evaluation workbooks plus MASTER_SECRET_KEY.xlsx (offline copy of the key).
+    `assign_codes(key_log)` returns one dummy code per key-log row (dummy_codes.register_dummy_codes records them
+    server-side). Logos are resized once; with enough bundles (and cores) the workbooks are built across the process pool.
+    """
+    bundles, kdf = plan_marks_bundles(df)
+    kdf.insert(5, 'Dummy_ID', list(assign_codes(kdf)))
+    codes, statuses = kdf['Dummy_ID'].tolist(), kdf['Status'].tolist()
+    jobs = [(b['b_id'], {**b, "rows": list(zip(codes[b['start']:b['end']], statuses[b['start']:b['end']]))}) for b in bundles]
+    bundle_assets = prepare_bundle_assets(assets)
+    workers = max(1, min(max_workers, os.cpu_count() or 1))
+    
+    zip_buf = io.BytesIO()
+    with zipfile.ZipFile(zip_buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        # workbooks are already compressed: store them as they are
+        if workers == 1 or len(jobs) < PARALLEL_MIN_BUNDLES:
+            for b_id, p in jobs:
+                zf.writestr(f"Bundles/{b_id}.xlsx", create_locked_bundle(p['rows'], p['course_code'], p['course_name'], p['b_group'], p['seq'], p['total'], cycle_name, bundle_assets), compress_type=zipfile.ZIP_STORED)
+        else:
+            for b_id, path, _ in render_volumes(iter(jobs), render_bundle, init_bundle_worker, (bundle_assets, cycle_name), max_workers=workers):
+                zf.write(path, f"Bundles/{b_id}.xlsx", compress_type=zipfile.ZIP_STORED)
+                os.remove(path)
+                
+        out_k = io.BytesIO()
+        kdf.to_excel(out_k, index=False)
+        zf.writestr("MASTER_SECRET_KEY.xlsx", out_k.getvalue())
+        
+    return zip_buf.getvalue()
+
+# ==========================================
+# 4. SESSION PACK WORKER (batch mode)
+# ==========================================
+_DOC_CTX = {}
+
+def init_session_worker(assets, cycle_name):
+    """Process-pool initializer: logos and cycle name are sent once per worker, not once per session"""
+    _DOC_CTX.update(assets=assets, cycle_name=cycle_name)
+
+def session_pack_name(date, session):
+    return f"{date}_{session}".replace(" ", "_").replace("/", "-").replace(":", "")
+
+def render_session_pack(pack_name, payload, out_dir):
+    """
+    Worker: one session's allotment (records + date/session) -> a ZIP of its posters, Form B, Form A, QPDS
+    and appearing list written to `out_dir`. Returns (pack_name, zip_path, usns) like the volume workers.
+    """
+    df = pd.DataFrame(payload['rows'])
+    date, session, assets = payload['date'], payload['session'], _DOC_CTX['assets']
+    path = os.path.join(out_dir, f"{pack_name}.zip")
+    with zipfile.ZipFile(path, "w", zipfile.ZIP_DEFLATED) as zf:
+        for file_name, _, build in SESSION_DOCS.values():
+            zf.writestr(file_name.format(date=date), build(df, date, session, assets, _DOC_CTX['cycle_name']))
+    return pack_name, path, df['USN'].tolist()
+
+def render_session_document(kind, payload, out_dir):
+    """Worker: one SESSION_DOCS document of one session, written to `out_dir`. Returns (kind, file_path, render_seconds)."""
+    started = time.perf_counter()
+    file_name, _, build = SESSION_DOCS[kind]
+    data = build(pd.DataFrame(payload['rows']), payload['date'], payload['session'], _DOC_CTX['assets'], _DOC_CTX['cycle_name'])
+    path = os.path.join(out_dir, f"{kind}_{file_name.format(date=payload['date'])}")
+    with open(path, "wb") as f: f.write(data)
+    return kind, path, time.perf_counter() - started
+
+def render_session_documents(df, date, session, assets, cycle_name, kinds=None, max_workers=DEFAULT_VOLUME_WORKERS):
+    """Renders the chosen session documents (all by default) side by side in worker processes (one per core at most); yields (kind, bytes, seconds) as each finishes"""
+    kinds = list(kinds or SESSION_DOCS)
+    workers = max(1, min(max_workers, len(kinds), os.cpu_count() or 1))
+    if workers == 1:
+        # one core: a process pool would only add start-up time
+        for kind in kinds:
+            started = time.perf_counter()
+            data = SESSION_DOCS[kind][2](df, date, session, assets, cycle_name)
+            yield kind, data, time.perf_counter() - started
+        return
+    payload = {"date": date, "session": session, "rows": df.to_dict('records')}
+    jobs = ((kind, payload) for kind in kinds)
+    for kind, path, seconds in render_volumes(jobs, render_session_document, init_session_worker, (assets, cycle_name), max_workers=workers):
+        with open(path, "rb") as f:
+            yield kind, f.read(), seconds
+
+def build_session_pack(df, date, session, assets, cycle_name, max_workers=DEFAULT_VOLUME_WORKERS):
+    """
+    Full session pack: every SESSION_DOCS document rendered in parallel into one ZIP.
+    Returns (zip_bytes, timings) with timings as [{Document, Seconds}], slowest first, then the wall-clock total.
+    """
+    started = time.perf_counter()
+    timings, zip_buf = [], io.BytesIO()
+    with zipfile.ZipFile(zip_buf, "w", zipfile.ZIP_DEFLATED) as zf:
+        for kind, data, seconds in render_session_documents(df, date, session, assets, cycle_name, max_workers=max_workers):
+            zf.writestr(SESSION_DOCS[kind][0].format(date=date), data)
+            timings.append({"Document": SESSION_DOCS[kind][0].format(date=date), "Seconds": round(seconds, 2)})
+    timings.sort(key=lambda t: t["Seconds"], reverse=True)
+    timings.append({"Document": "TOTAL (wall clock)", "Seconds": round(time.perf_counter() - started, 2)})
+    return zip_buf.getvalue(), timings
@@ -1,6 +1,6 @@
 import streamlit as st
 import pandas as pd
-from utils import init_db, clean_data_for_db
+from utils import init_db, clean_data_for_db, bulk_patch_students
 
 # --- CONFIGURATION ---
 supabase = init_db()
@@ -350,10 +350,7 @@ with tabs[3]:
                     if not students:
                         st.warning(f"No active {target_prog} students found in Semester {target_sem} for the selected branches.")
                     else:
-                        update_payload = [{**s, "current_sem": target_sem + 1} for s in students]
-                        
-                        for i in range(0, len(update_payload), 1000):
-                            supabase.table("master_students").upsert(update_payload[i:i+1000]).execute()
+                        bulk_patch_students(supabase, {s['usn']: {"current_sem": target_sem + 1} for s in students})
                         st.success(f"✅ {len(students)} {target_prog} students successfully promoted to Semester {target_sem + 1}!")
 
     # --- EVEN TO ODD PROMOTION (WITH HISTORICAL RESOLVER) ---
@@ -432,7 +429,7 @@ with tabs[3]:
                                 is_eligible = total_credits >= threshold
                                 
                             if is_eligible:
-                                eligible_students.append({**s, "current_sem": current_even_sem + 1})
+                                eligible_students.append({"usn": usn, "current_sem": current_even_sem + 1})
                             else:
                                 detained_students.append({
                                     "USN": usn, 
@@ -482,8 +479,7 @@ with tabs[3]:
                 st.warning("⚠️ Warning: Confirming this action will update the Master Student Database.")
                 if st.button("✅ Confirm & Promote Eligible Students", type="primary"):
                     with st.spinner("Updating student records..."):
-                        for i in range(0, len(eligible), 1000):
-                            supabase.table("master_students").upsert(eligible[i:i+1000]).execute()
+                        bulk_patch_students(supabase, {s['usn']: {"current_sem": s['current_sem']} for s in eligible})
                         st.success(f"✅ {len(eligible)} {prog_type} students successfully promoted to Semester {t_sem}!")
                         del st.session_state['promo_preview'] 
                         st.rerun()
@@ -542,20 +538,8 @@ with tabs[3]:
                                 # Has backlogs
                                 cc_payload.append({"usn": usn, "status": "COURSE_COMPLETED"})
                         
-                        # Execute DB updates
-                        update_payload = alumni_payload + cc_payload
-                        for i in range(0, len(update_payload), 1000):
-                            # Updating just the status column for these USNs
-                            # We must include the existing data to satisfy the upsert, 
-                            # so we merge the new status into the student's existing record dict
-                            batch = []
-                            for row in update_payload[i:i+1000]:
-                                target_usn = row['usn']
-                                original_record = next(stu for stu in students if stu['usn'] == target_usn)
-                                original_record['status'] = row['status']
-                                batch.append(original_record)
-                                
-                            supabase.table("master_students").upsert(batch).execute()
+                        # Execute DB updates (status column only, one statement per chunk of USNs)
+                        bulk_patch_students(supabase, {row['usn']: {"status": row['status']} for row in alumni_payload + cc_payload})
                         
                         st.success(f"✅ Processed {len(students)} students!")
                         
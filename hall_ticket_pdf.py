@@ -0,0 +1,582 @@
+import io
+import os
+import datetime
+import hashlib
+import json
+import re
+import fitz  # PyMuPDF
+from reportlab.pdfgen import canvas
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.platypus import Table, TableStyle, Paragraph
+from reportlab.lib.styles import getSampleStyleSheet
+from pdf_assets import prepare_system_assets, photo_reader, ReaderImage
+
+HALF_A4 = 841.89 / 2
+
+# ==========================================
+# 1. STUDENT HELPERS
+# ==========================================
+def get_branch_code(usn):
+    try:
+        if len(usn) > 5:
+            match = re.search(r'[A-Za-z]+', usn[5:])
+            if match:
+                return match.group(0).upper()
+    except: pass
+    return "GEN"
+
+def generate_app_id(usn, cycle_id):
+    h = hashlib.md5(f"{usn}{cycle_id}{datetime.date.today()}".encode()).hexdigest()[:6].upper()
+    return f"AMC-26-{h}"
+
+def get_sem_num(sem_val):
+    try:
+        return int(re.search(r'\d+', str(sem_val)).group())
+    except:
+        return 99
+
+def sort_subjects_by_timetable(subs, timetable_map):
+    def get_date(sub):
+        date_str = timetable_map.get(sub['code'], {}).get('date', 'TBD')
+        if date_str == 'TBD' or not date_str:
+            return datetime.datetime(2099, 1, 1)
+        try:
+            return datetime.datetime.strptime(date_str, "%d-%m-%Y")
+        except:
+            return datetime.datetime(2099, 1, 1)
+    return sorted(subs, key=get_date)
+
+def draw_header(c, w, y_start, assets, is_hall_ticket=False):
+    if assets.get("logo"):
+        c.drawImage(assets["logo"], 35, y_start - 35, width=60, height=60, mask='auto', preserveAspectRatio=True)
+    if assets.get("naac"):
+        if is_hall_ticket:
+            c.drawImage(assets["naac"], w - 85, y_start - 30, width=50, height=50, mask='auto', preserveAspectRatio=True)
+        else:
+            c.drawImage(assets["naac"], w - 95, y_start - 35, width=60, height=60, mask='auto', preserveAspectRatio=True)
+
+    c.setFont("Helvetica-Bold", 15)
+    c.drawCentredString(w/2, y_start, "AMC ENGINEERING COLLEGE")
+    c.setFont("Helvetica", 9)
+    c.drawCentredString(w/2, y_start - 15, "AMC Campus, Bannerghatta Road, Bengaluru, Karnataka - 560083")
+    c.drawCentredString(w/2, y_start - 27, "Autonomous Institution Affiliated to VTU, Belagavi")
+    c.drawCentredString(w/2, y_start - 39, "Approved by AICTE, New Delhi | NAAC A+ Accredited")
+    c.setLineWidth(1)
+    c.line(30, y_start - 50, w - 30, y_start - 50)
+    return y_start - 70
+
+# ==========================================
+# 2. PDF ENGINE (DYNAMIC LAYOUT)
+# ==========================================
+def draw_application_page(c, w, h, student, subjects, fees, assets, app_id, cycle_name, photo_img, prog_type, db_branch_code, branch_name_str):
+    if assets.get("watermark"):
+        c.saveState(); c.setFillAlpha(0.08)
+        c.drawImage(assets["watermark"], w/2 - 175, h/2 - 175, width=350, height=350, mask='auto', preserveAspectRatio=True)
+        c.restoreState()
+
+    y = draw_header(c, w, h - 30, assets, is_hall_ticket=False)
+    c.setFont("Helvetica-Bold", 11)
+    
+    c.drawCentredString(w/2, y, f"Examination Application Form - {cycle_name}")
+    y -= 20
+
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(30, y, "Student Details")
+    y -= 5
+    
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.enums import TA_LEFT
+    bold_9pt_style = ParagraphStyle('Bold9', fontName='Helvetica-Bold', fontSize=9, alignment=TA_LEFT)
+
+    if photo_img:
+        p_img = ReaderImage(photo_img, width=65, height=75)
+    else:
+        p_img = Paragraph("<para align=center>PHOTO</para>", getSampleStyleSheet()['Normal'])
+    
+    stu_sem_str = str(student.get('current_sem', '1'))
+    stu_sem_num = get_sem_num(stu_sem_str)
+
+    s_data = [
+        ["USN", student['usn'], "Student Name", Paragraph(student['full_name'], bold_9pt_style), p_img],
+        ["Semester", stu_sem_str, "Student Type", prog_type, ""],
+        ["Branch Code", db_branch_code, "Programme", Paragraph(branch_name_str, bold_9pt_style), ""]
+    ]
+    
+    t1 = Table(s_data, colWidths=[85, 85, 80, 205, 80], rowHeights=25)
+    t1.setStyle(TableStyle([
+        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+        ('FONTSIZE', (0,0), (-1,-1), 9),
+        ('FONTNAME', (0,0), (0,-1), 'Helvetica-Bold'), 
+        ('FONTNAME', (2,0), (2,-1), 'Helvetica-Bold'), 
+        ('BACKGROUND', (0,0), (0,-1), colors.lightgrey), 
+        ('BACKGROUND', (2,0), (2,-1), colors.lightgrey), 
+        ('SPAN', (4,0), (4,2)), 
+        ('VALIGN', (4,0), (4,2), 'MIDDLE'),
+        ('ALIGN', (4,0), (4,2), 'CENTER'),
+        ('ALIGN', (1,0), (1,2), 'LEFT'),
+        ('ALIGN', (3,0), (3,2), 'LEFT'), 
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'), 
+    ]))
+    t1.wrapOn(c, w, h)
+    _, th1 = t1.wrap(w, h)
+    t1.drawOn(c, 30, y - th1)
+    y -= (th1 + 15)
+    
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(30, y, f"Application ID: {app_id}")
+    c.drawRightString(w - 30, y, f"Application Date: {datetime.date.today().strftime('%d-%m-%Y')}")
+    y -= 15
+
+    regular_subs = []
+    arrear_subs = []
+    
+    for s in subjects:
+        sub_sem_str = str(s.get('sem', '-'))
+        sub_sem_num = get_sem_num(sub_sem_str)
+        if sub_sem_num < stu_sem_num:
+            arrear_subs.append(s)
+        else:
+            regular_subs.append(s)
+            
+    arrear_count = len(arrear_subs)
+    regular_count = len(regular_subs)
+    
+    row_h = 16 if len(subjects) > 10 else None
+    fontsize = 8 if len(subjects) > 10 else 9
+
+    if regular_count > 0:
+        c.setFont("Helvetica-Bold", 10); c.drawString(30, y, "Regular Courses"); y -= 5
+        reg_rows = [["Sem", "Course Code", "Course Title", "Type"]]
+        for s in regular_subs:
+            reg_rows.append([str(s.get('sem', '-')), s['code'], Paragraph(s['title'], getSampleStyleSheet()['Normal']), "Regular"])
+            
+        t_reg = Table(reg_rows, colWidths=[40, 80, 335, 80], rowHeights=row_h)
+        t_reg.setStyle(TableStyle([
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('ALIGN', (0,0), (0,-1), 'CENTER'),
+            ('ALIGN', (3,0), (3,-1), 'CENTER'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('FONTSIZE', (0,0), (-1,-1), fontsize), 
+        ]))
+        t_reg.wrapOn(c, w, h)
+        _, th_reg = t_reg.wrap(w, h)
+        t_reg.drawOn(c, 30, y - th_reg)
+        y -= (th_reg + 10)
+
+    if arrear_count > 0:
+        c.setFont("Helvetica-Bold", 10); c.drawString(30, y, "Arrear Courses"); y -= 5
+        arr_rows = [["Sem", "Course Code", "Course Title", "Type"]]
+        for s in arrear_subs:
+            arr_rows.append([str(s.get('sem', '-')), s['code'], Paragraph(s['title'], getSampleStyleSheet()['Normal']), "Arrear"])
+            
+        t_arr = Table(arr_rows, colWidths=[40, 80, 335, 80], rowHeights=row_h)
+        t_arr.setStyle(TableStyle([
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('ALIGN', (0,0), (0,-1), 'CENTER'),
+            ('ALIGN', (3,0), (3,-1), 'CENTER'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('FONTSIZE', (0,0), (-1,-1), fontsize), 
+        ]))
+        t_arr.wrapOn(c, w, h)
+        _, th_arr = t_arr.wrap(w, h)
+        t_arr.drawOn(c, 30, y - th_arr)
+        y -= (th_arr + 10)
+
+    c.setFont("Helvetica-Bold", 10); c.drawString(30, y, "Fee Details"); y -= 5
+    
+    base_exam_fee = float(fees.get('Exam', 2000))
+    fee_exam = base_exam_fee if regular_count > 0 else 0.0  
+    
+    fee_arrear_per_sub = float(fees.get('Arrear', 0))
+    fee_arrear_total = fee_arrear_per_sub * arrear_count
+    
+    fee_penalty = float(fees.get('Penalty', 0))
+    fee_misc = float(fees.get('Misc', 400))
+    
+    total = fee_exam + fee_arrear_total + fee_penalty + fee_misc
+    
+    f_rows = [
+        ["Description", "Amount (Rs)"],
+        ["Regular Examination Fees", f"{fee_exam:.2f}"],
+        [f"Arrear Examination Fees ({arrear_count} x {fee_arrear_per_sub:.2f})", f"{fee_arrear_total:.2f}"],
+        ["Penalty Fees", f"{fee_penalty:.2f}"],
+        ["Application & Marks Card Fees", f"{fee_misc:.2f}"],
+        ["TOTAL AMOUNT", f"{total:.2f}"]
+    ]
+    
+    t3 = Table(f_rows, colWidths=[435, 100], rowHeights=16 if len(subjects) > 10 else None)
+    t3.setStyle(TableStyle([
+        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+        ('FONTNAME', (-1,-1), (-1,-1), 'Helvetica-Bold'),
+        ('ALIGN', (1,0), (1,-1), 'RIGHT'),
+        ('FONTSIZE', (0,0), (-1,-1), 8 if len(subjects) > 10 else 9)
+    ]))
+    t3.wrapOn(c, w, h)
+    _, th3 = t3.wrap(w, h)
+    t3.drawOn(c, 30, y - th3)
+    y -= (th3 + 15) 
+
+    c.rect(30, y - 25, w - 60, 25)
+    c.setFont("Helvetica", 9)
+    c.drawString(40, y - 17, "Receipt No: ______________________")
+    c.drawString(350, y - 17, "Date: ______________________")
+    y -= 40
+
+    c.setFont("Helvetica-Bold", 10); c.drawString(30, y, "Declaration:"); y -= 12
+    decl = "The subjects listed in this application are the only subjects I wish to apply for this Examination. I understand this application overrides any previous submission."
+    p = Paragraph(decl, getSampleStyleSheet()['Normal']); p.wrapOn(c, w - 60, 50); p.drawOn(c, 30, y - 20)
+    
+    y -= 45
+    c.setFont("Helvetica-Bold", 9); c.drawRightString(w - 30, y, "Signature of the Candidate")
+    
+    c.setFont("Helvetica", 8)
+    c.drawRightString(w - 30, y - 12, "Contact No: ___________________________")
+    c.drawRightString(w - 30, y - 24, "Email ID:   ___________________________")
+
+
+def draw_hall_ticket_half(c, w, base_y, student, subjects, section, app_id, assets, cycle_name, photo_img, timetable_map, eligibility_map, header_branch, branch_name_str):
+    HALF_HEIGHT = 420.94 
+    
+    if assets.get("watermark"):
+        c.saveState(); c.setFillAlpha(0.08)
+        c.drawImage(assets["watermark"], w/2 - 140, base_y + (HALF_HEIGHT/2) - 140, width=280, height=280, mask='auto', preserveAspectRatio=True)
+        c.restoreState()
+
+    y = draw_header(c, w, base_y + HALF_HEIGHT - 20, assets, is_hall_ticket=True)
+    c.setFont("Helvetica-Bold", 11)
+    c.drawCentredString(w/2, y + 5, f"Admission Ticket - {cycle_name}")
+    c.setFont("Helvetica-Bold", 9)
+    c.drawRightString(w - 40, y - 5, f"[{section}]")
+    y -= 15 
+
+    compact_style = getSampleStyleSheet()['Normal'].clone('Compact')
+    compact_style.fontName = 'Helvetica-Bold'
+    compact_style.fontSize = 7.5
+    compact_style.leading = 8.5
+    compact_style.alignment = 0 
+
+    h_data = [
+        ["USN:", student['usn'], "Name:", Paragraph(f"{student['full_name']}", compact_style)],
+        ["App ID:", app_id, "Date:", datetime.date.today().strftime('%d-%m-%Y')],
+        ["Semester:", str(student.get('current_sem', '1')), "Programme:", Paragraph(f"{branch_name_str}", compact_style)],
+        ["Center:", "AMC ENGINEERING COLLEGE", "", ""]
+    ]
+    
+    t_text = Table(h_data, colWidths=[50, 90, 55, 280], rowHeights=14)
+    t_text.setStyle(TableStyle([
+        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+        ('FONTSIZE', (0,0), (-1,-1), 8),
+        ('FONTNAME', (0,0), (0,-1), 'Helvetica-Bold'),
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('SPAN', (1,3), (3,3)), 
+        ('ALIGN', (1,0), (1,-1), 'LEFT'),
+        ('ALIGN', (3,0), (3,-1), 'LEFT'),
+        ('TOPPADDING', (0,0), (-1,-1), 1),    
+        ('BOTTOMPADDING', (0,0), (-1,-1), 1), 
+    ]))
+    
+    if photo_img:
+        p_img2 = ReaderImage(photo_img, width=48, height=54)
+    else:
+        p_img2 = Paragraph("<para align=center>PHOTO</para>", compact_style)
+
+    master_data = [[t_text, p_img2]]
+    t_master = Table(master_data, colWidths=[475, 60])
+    t_master.setStyle(TableStyle([
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+        ('ALIGN', (1,0), (1,0), 'CENTER'),
+        ('GRID', (1,0), (1,0), 0.5, colors.black),
+        ('LEFTPADDING', (0,0), (-1,-1), 0),
+        ('RIGHTPADDING', (0,0), (-1,-1), 0),
+        ('TOPPADDING', (0,0), (-1,-1), 0),
+        ('BOTTOMPADDING', (0,0), (-1,-1), 0),
+    ]))
+    
+    t_master.wrapOn(c, w, 500)
+    _, h_mast = t_master.wrap(w, 500)
+    t_master.drawOn(c, 30, y - h_mast)
+    
+    y -= (h_mast + 15) 
+    c.setFont("Helvetica-Bold", 9)
+    c.drawString(30, y, "Exam Schedule:")
+    y -= 8 
+    
+    valid_subs = [s for s in subjects if eligibility_map.get(s['code'], False)]
+    
+    if len(valid_subs) >= 10:
+        mid = (len(valid_subs) + 1) // 2
+        left_subs = valid_subs[:mid]
+        right_subs = valid_subs[mid:]
+        
+        left_data = [["Date", "Session", "Sem", "Course Code", "Sign"]]
+        for s in left_subs:
+            sch = timetable_map.get(s['code'], {"date": "", "session": ""})
+            left_data.append([sch['date'], sch['session'], str(s.get('sem', '-')), s['code'], ""])
+            
+        right_data = [["Date", "Session", "Sem", "Course Code", "Sign"]]
+        for s in right_subs:
+            sch = timetable_map.get(s['code'], {"date": "", "session": ""})
+            right_data.append([sch['date'], sch['session'], str(s.get('sem', '-')), s['code'], ""])
+            
+        while len(right_data) < len(left_data):
+            right_data.append(["", "", "", "", ""])
+            
+        split_style = TableStyle([
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('FONTSIZE', (0,0), (-1,-1), 7),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('TOPPADDING', (0,0), (-1,-1), 1),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 1),
+        ])
+        
+        t_left = Table(left_data, colWidths=[50, 80, 25, 55, 45], rowHeights=13)
+        t_left.setStyle(split_style)
+        
+        t_right = Table(right_data, colWidths=[50, 80, 25, 55, 45], rowHeights=13)
+        t_right.setStyle(split_style)
+        
+        tg = Table([[t_left, t_right]], colWidths=[260, 260])
+        tg.setStyle(TableStyle([
+            ('VALIGN', (0,0), (-1,-1), 'TOP'),
+            ('LEFTPADDING', (0,0), (-1,-1), 0),
+            ('RIGHTPADDING', (0,0), (-1,-1), 0),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 0),
+            ('TOPPADDING', (0,0), (-1,-1), 0),
+        ]))
+        
+        tg.wrapOn(c, w, 500)
+        _, gh = tg.wrap(w, 500)
+        tg.drawOn(c, 30, y - gh)
+
+    else:
+        grid_data = [["Date", "Session", "Sem", "Course Code", "Invigilator Sign"]]
+        
+        for s in valid_subs:
+            sch = timetable_map.get(s['code'], {"date": "", "session": ""})
+            grid_data.append([sch['date'], sch['session'], str(s.get('sem', '-')), s['code'], ""])
+
+        MIN_ROWS = 8
+        if (len(grid_data) - 1) < MIN_ROWS:
+            for _ in range(MIN_ROWS - (len(grid_data) - 1)):
+                grid_data.append(["", "", "", "", ""])
+
+        total_rows = len(grid_data)
+        if total_rows <= 8:
+            row_h = 18   
+        else:
+            row_h = 15   
+
+        tg = Table(grid_data, colWidths=[75, 120, 35, 85, 220], rowHeights=row_h)
+        tg.setStyle(TableStyle([
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('FONTSIZE', (0,0), (-1,-1), 8),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('TOPPADDING', (0,0), (-1,-1), 2),
+            ('BOTTOMPADDING', (0,0), (-1,-1), 2),
+        ]))
+        tg.wrapOn(c, w, 500)
+        _, gh = tg.wrap(w, 500)
+        tg.drawOn(c, 30, y - gh)
+    
+    footer_y = base_y + 20 
+    
+    c.setFont("Helvetica", 7)
+    c.drawString(30, footer_y + 45, "Candidate must read the instructions provided in the answer booklet, before the commencement of examination.")
+    
+    c.setLineWidth(0.5)
+    c.setFont("Helvetica-Bold", 9)
+    sig_w = 80
+    
+    c.line(40, footer_y + 25, 40 + sig_w, footer_y + 25)
+    c.drawCentredString(40 + sig_w/2, footer_y + 15, "Candidate")
+    
+    c.line(w/2 - sig_w/2, footer_y + 25, w/2 + sig_w/2, footer_y + 25)
+    c.drawCentredString(w/2, footer_y + 15, "CoE")
+    
+    c.line(w - 40 - sig_w, footer_y + 25, w - 40, footer_y + 25)
+    c.drawCentredString(w - 40 - sig_w/2, footer_y + 15, "Principal")
+    
+    c.setFont("Helvetica-Oblique", 7)
+    c.drawCentredString(w/2, footer_y, "Note: Please verify the eligibility of candidate before issuing the admission ticket.")
+    
+    return y - 10
+
+# ==========================================
+# 3. PER-STUDENT DOCUMENT SET
+# ==========================================
+def subject_from_registration(reg):
+    """course_registrations row (with embedded master_courses) -> subject dict used by the layouts"""
+    mc = reg.get('master_courses') or {}
+    sem = reg.get('semester')
+    if not sem:
+        sem = mc.get('semester_id', '-')
+    return {"code": reg['course_code'], "title": mc.get('title', "Unknown Title"), "sem": sem}
+
+def build_student_entry(stu, raw_subs, timetable_map, branch_map, cycle_id):
+    """Resolves everything the two hall-ticket pages need for one student (photo excluded)"""
+    usn = stu['usn']
+    unique_subs = []
+    seen_codes = set()
+    for sub in raw_subs:
+        if sub['code'] not in seen_codes:
+            unique_subs.append(sub)
+            seen_codes.add(sub['code'])
+
+    db_branch_code = stu.get('branch_code', get_branch_code(usn))
+    b_info = branch_map.get(db_branch_code, {"program_type": "UG", "branch_name": db_branch_code})
+    return {
+        "usn": usn,
+        "student": stu,
+        "subs": sort_subjects_by_timetable(unique_subs, timetable_map),
+        "app_id": generate_app_id(usn, cycle_id),
+        "prog_type": b_info.get("program_type", "UG"),
+        "branch_code": db_branch_code,
+        "branch_name": b_info.get("branch_name", db_branch_code),
+    }
+
+def draw_student_documents(c, entry, fees, assets, cycle_name, photo_img, timetable_map, eligibility_map):
+    """Application page + the STUDENT / COLLEGE copy hall-ticket page"""
+    stu, subs, app_id = entry['student'], entry['subs'], entry['app_id']
+    draw_application_page(c, A4[0], A4[1], stu, subs, fees, assets, app_id, cycle_name, photo_img, entry['prog_type'], entry['branch_code'], entry['branch_name'])
+    c.showPage()
+
+    draw_hall_ticket_half(c, A4[0], HALF_A4, stu, subs, "STUDENT COPY", app_id, assets, cycle_name, photo_img, timetable_map, eligibility_map, entry['branch_code'], entry['branch_name'])
+
+    c.setDash(4, 4)
+    c.line(20, HALF_A4, A4[0]-20, HALF_A4)
+    c.setDash([])
+
+    draw_hall_ticket_half(c, A4[0], 0, stu, subs, "COLLEGE COPY", app_id, assets, cycle_name, photo_img, timetable_map, eligibility_map, entry['branch_code'], entry['branch_name'])
+    c.showPage()
+
+def render_student_pdf(entries_with_photos, fees, assets, cycle_name, timetable_map, eligibility_map):
+    """
+    In-memory PDF for a handful of students [(entry, photo_img), ...], bookmarked by USN.
+    Used by the help-desk path, where assets and layout maps come from the cached cycle context.
+    """
+    buf = io.BytesIO(); c = canvas.Canvas(buf, pagesize=A4)
+    for entry, photo_img in entries_with_photos:
+        c.bookmarkPage(entry['usn'])
+        c.addOutlineEntry(f"{entry['usn']} - {entry['student'].get('full_name', '')}", entry['usn'], level=0)
+        draw_student_documents(c, entry, fees, assets, cycle_name, photo_img, timetable_map, eligibility_map)
+    c.showOutline(); c.save()
+    return buf.getvalue()
+
+# ==========================================
+# 4. VOLUME WORKER (runs in a separate process)
+# ==========================================
+_VOLUME_CTX = {}
+
+def init_volume_worker(raw_assets, fees, timetable_map, eligibility_map, cycle_name):
+    _VOLUME_CTX.update({
+        "assets": prepare_system_assets(raw_assets),
+        "fees": fees,
+        "timetable_map": timetable_map,
+        "eligibility_map": eligibility_map,
+        "cycle_name": cycle_name,
+    })
+
+def render_volume(volume_name, entries, out_dir):
+    """Writes one volume to disk with a USN bookmark per student. Entries carry photo JPEG bytes under 'photo'."""
+    ctx = _VOLUME_CTX
+    path = os.path.join(out_dir, f"{volume_name}.pdf")
+    c = canvas.Canvas(path, pagesize=A4)
+    c.setTitle(f"Hall Tickets - {ctx['cycle_name']} - {volume_name}")
+
+    for entry in entries:
+        photo = entry.get('photo')
+        photo_img = photo_reader(io.BytesIO(photo)) if photo else None
+        c.bookmarkPage(entry['usn'])
+        c.addOutlineEntry(f"{entry['usn']} - {entry['student'].get('full_name', '')}", entry['usn'], level=0)
+        draw_student_documents(c, entry, ctx['fees'], ctx['assets'], ctx['cycle_name'], photo_img, ctx['timetable_map'], ctx['eligibility_map'])
+
+    c.showOutline()
+    c.save()
+    return volume_name, path, [e['usn'] for e in entries]
+
+# ==========================================
+# 5. INCREMENTAL REPRINTS
+# ==========================================
+VOLATILE_STUDENT_FIELDS = {'created_at', 'updated_at'}
+
+def student_fingerprint(entry, fees, timetable_map, eligibility_map, photo_version):
+    """sha256 over everything that ends up on a student's two pages: profile, subjects + slots, eligibility, fees and photo version"""
+    payload = {
+        "student": {k: v for k, v in entry['student'].items() if k not in VOLATILE_STUDENT_FIELDS},
+        "subs": [[s['code'], s['title'], str(s['sem']), timetable_map.get(s['code']), eligibility_map.get(s['code'], True)] for s in entry['subs']],
+        "branch": [entry['branch_code'], entry['branch_name'], entry['prog_type']],
+        "fees": fees,
+        "photo": photo_version,
+    }
+    return hashlib.sha256(json.dumps(payload, sort_keys=True, default=str).encode()).hexdigest()
+
+def bookmark_spans(doc):
+    """{usn: (first_page, end_page, title)} (0-based, end exclusive) from the per-student USN outline entries"""
+    starts = sorted(((page - 1, title) for level, title, page in doc.get_toc() if level == 1 and page > 0), key=lambda x: x[0])
+    spans = {}
+    for i, (start, title) in enumerate(starts):
+        end = starts[i + 1][0] if i + 1 < len(starts) else doc.page_count
+        spans[title.split(' - ')[0].strip()] = (start, end, title)
+    return spans
+
+def splice_volume(pdf_bytes, replacements, drop_usns=()):
+    """
+    Swaps each bookmarked student in `replacements` ({usn: rendered pdf bytes}) for the new pages and removes `drop_usns`.
+    Untouched pages are copied as-is. Returns (new_pdf_bytes, {usn: first_page (1-based)}, touched_usns).
+    """
+    doc = fitz.open(stream=pdf_bytes, filetype="pdf")
+    spans = bookmark_spans(doc)
+    touched = [u for u in spans if u in replacements or u in drop_usns]
+    if not touched:
+        doc.close()
+        return pdf_bytes, {u: v[0] + 1 for u, v in spans.items()}, []
+
+    new_lengths = {}; new_titles = {}
+    # Back to front so the page numbers of earlier students stay valid
+    for usn in sorted(touched, key=lambda u: spans[u][0], reverse=True):
+        start, end, _ = spans[usn]
+        doc.delete_pages(from_page=start, to_page=end - 1)
+        new_lengths[usn] = 0
+        if usn in replacements:
+            src = fitz.open(stream=replacements[usn], filetype="pdf")
+            doc.insert_pdf(src, start_at=start)
+            new_lengths[usn] = src.page_count
+            src_toc = src.get_toc()
+            if src_toc: new_titles[usn] = src_toc[0][1]
+            src.close()
+
+    toc = []; page_index = {}; page = 1
+    for usn, (start, end, title) in sorted(spans.items(), key=lambda kv: kv[1][0]):
+        length = new_lengths.get(usn, end - start)
+        if length:
+            toc.append([1, new_titles.get(usn, title), page]); page_index[usn] = page
+        page += length
+    doc.set_toc(toc)
+    out = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return out, page_index, touched
+
+def join_student_pdfs(parts):
+    """Concatenates per-student PDFs ([(usn, pdf_bytes)]) into one bookmarked PDF. Returns (pdf_bytes, {usn: first_page})"""
+    doc = fitz.open()
+    toc = []; page_index = {}
+    for usn, pdf_bytes in parts:
+        src = fitz.open(stream=pdf_bytes, filetype="pdf")
+        src_toc = src.get_toc()
+        page_index[usn] = doc.page_count + 1
+        toc.append([1, src_toc[0][1] if src_toc else usn, doc.page_count + 1])
+        doc.insert_pdf(src)
+        src.close()
+    doc.set_toc(toc)
+    out = doc.tobytes(garbage=3, deflate=True)
+    doc.close()
+    return out, page_index
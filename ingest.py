@@ -0,0 +1,97 @@
+import csv
+import importlib.util
+import pandas as pd
+
+# --- CONFIGURATION ---
+INGEST_CHUNK_ROWS = 50000
+UPSERT_BATCH = 500
+HAS_PYARROW = importlib.util.find_spec("pyarrow") is not None
+
+# Column kinds: key = strip + upper (must be present), code = strip (must be present),
+# text = strip, int = whole number, number = int when whole else float
+TABLE_SCHEMAS = {
+    "master_rooms": {"room_number": "code", "capacity": "int", "block_name": "text"},
+    "master_students": {"usn": "key", "full_name": "text", "branch_code": "key", "current_sem": "int", "batch_year": "int"},
+    "master_evaluators": {"faculty_id": "code", "name": "text", "department": "text"},
+    "master_branches": {"branch_code": "key", "branch_name": "text", "program_type": "key"},
+    "master_courses": {"course_code": "code", "title": "text", "branch_code": "key", "semester_id": "int",
+                       "credits": "number", "max_cie": "number", "max_see": "number", "total_marks": "number"},
+}
+
+# ==========================================
+# 1. READERS (all columns as strings)
+# ==========================================
+def _header(file):
+    file.seek(0)
+    first = file.readline()
+    file.seek(0)
+    if isinstance(first, bytes): first = first.decode("utf-8-sig")
+    return next(csv.reader([first]), [])
+
+def read_string_chunks(file, chunk_rows=INGEST_CHUNK_ROWS):
+    """Streams a CSV upload as string-typed DataFrames; pyarrow's multithreaded reader when installed, pandas otherwise"""
+    if HAS_PYARROW:
+        import pyarrow as pa
+        import pyarrow.csv as pa_csv
+        names = _header(file)
+        reader = pa_csv.open_csv(
+            file,
+            read_options=pa_csv.ReadOptions(block_size=8 << 20),
+            convert_options=pa_csv.ConvertOptions(column_types={n: pa.string() for n in names}, strings_can_be_null=True),
+        )
+        for batch in reader:
+            df = batch.to_pandas()
+            for i in range(0, len(df), chunk_rows):
+                yield df.iloc[i:i + chunk_rows]
+    else:
+        if hasattr(file, "seek"): file.seek(0)
+        yield from pd.read_csv(file, dtype=str, chunksize=chunk_rows)
+
+# ==========================================
+# 2. COLUMN-WISE COERCION
+# ==========================================
+def _coerce(series, kind):
+    s = series.astype("string").str.strip().replace({"": pd.NA})
+    if kind == "key":
+        return s.str.upper()
+    if kind in ("code", "text"):
+        return s
+    num = pd.to_numeric(s.replace({"-": pd.NA}), errors="coerce")
+    if kind == "int" or (num.dropna() % 1 == 0).all():
+        return num.where(num % 1 == 0).astype("Int64")
+    return num
+
+def typed_frame(df, table):
+    """Applies the table schema to one string chunk. Returns (frame, rows_dropped_for_missing_keys)"""
+    schema = TABLE_SCHEMAS[table]
+    by_name = {str(c).strip().lower(): c for c in df.columns}
+    required = [c for c, k in schema.items() if k in ("key", "code")]
+    missing = [c for c in required if c not in by_name]
+    if missing:
+        raise ValueError(f"Missing required column(s): {', '.join(missing)}")
+
+    out = pd.DataFrame({col: _coerce(df[by_name[col]], kind) for col, kind in schema.items() if col in by_name})
+    keep = out[required].notna().all(axis=1)
+    return out.loc[keep], int((~keep).sum())
+
+def to_records(df):
+    """JSON-ready dicts (NaN / NA -> None, Python scalars), zipped from per-column lists instead of boxing cell by cell"""
+    names = list(df.columns)
+    columns = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in names]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+def iter_table_records(file, table, chunk_rows=INGEST_CHUNK_ROWS):
+    """Yields (records, dropped) per chunk, so very large uploads never sit in memory as one frame or one record list"""
+    for chunk in read_string_chunks(file, chunk_rows):
+        frame, dropped = typed_frame(chunk, table)
+        yield to_records(frame), dropped
+
+def upload_table_csv(supabase, file, table, batch_size=UPSERT_BATCH):
+    """Schema-driven CSV -> upsert. Returns (rows_written, rows_dropped)."""
+    written = dropped = 0
+    for records, skipped in iter_table_records(file, table):
+        dropped += skipped
+        for i in range(0, len(records), batch_size):
+            supabase.table(table).upsert(records[i:i + batch_size]).execute()
+        written += len(records)
+    return written, dropped
@@ -1,9 +1,10 @@
 import streamlit as st
 import pandas as pd
-import io
-import zipfile
 import datetime
-from utils import init_db, clean_data_for_db
+from utils import init_db, bulk_patch_students
+from ingest import upload_table_csv
+from backup_engine import BACKUP_TABLES, BACKUP_FORMATS, DEFAULT_BACKUP_WORKERS, write_backup_archive, read_manifest, reconstruct_snapshot, verify_archive, restore_archive
+from usn_migration import read_migration_map, plan_usn_migration, apply_usn_migration, rollback_usn_migration, list_migration_batches
 
 # --- CONFIGURATION ---
 supabase = init_db()
@@ -62,12 +63,10 @@ with tabs[1]:
         st.subheader("Bulk Upload Rooms")
         f_rooms = st.file_uploader("Upload CSV (room_number, capacity, block_name)", type='csv')
         if f_rooms and st.button("Upload Rooms"):
-            df = pd.read_csv(f_rooms)
-            expected = ['room_number', 'capacity', 'block_name']
-            data = clean_data_for_db(df, expected)
             try:
-                supabase.table("master_rooms").upsert(data).execute()
-                st.success(f"Added {len(data)} rooms successfully.")
+                written, dropped = upload_table_csv(supabase, f_rooms, "master_rooms")
+                st.success(f"Added {written} rooms successfully.")
+                if dropped: st.warning(f"⚠️ Skipped {dropped} rows without a room_number.")
             except Exception as e: st.error(f"Error: {e}")
             
     with col_i2:
@@ -93,12 +92,10 @@ with tabs[2]:
         with col_s1:
             f_stu = st.file_uploader("Upload CSV (usn, full_name, branch_code, current_sem, batch_year)", type='csv')
             if f_stu and st.button("Upload Students"):
-                df = pd.read_csv(f_stu)
-                expected = ['usn', 'full_name', 'branch_code', 'current_sem', 'batch_year']
-                data = clean_data_for_db(df, expected)
                 try:
-                    supabase.table("master_students").upsert(data).execute()
-                    st.success(f"Enrolled {len(data)} students.")
+                    written, dropped = upload_table_csv(supabase, f_stu, "master_students")
+                    st.success(f"Enrolled {written} students.")
+                    if dropped: st.warning(f"⚠️ Skipped {dropped} rows without a USN.")
                 except Exception as e: st.error(f"Error: {e}")
         
         with col_s2:
@@ -110,12 +107,10 @@ with tabs[2]:
         with col_e1:
             f_fac = st.file_uploader("Upload CSV (faculty_id, name, department)", type='csv')
             if f_fac and st.button("Upload Faculty"):
-                df = pd.read_csv(f_fac)
-                expected = ['faculty_id', 'name', 'department']
-                data = clean_data_for_db(df, expected)
                 try:
-                    supabase.table("master_evaluators").upsert(data).execute()
-                    st.success(f"Added {len(data)} faculty members.")
+                    written, dropped = upload_table_csv(supabase, f_fac, "master_evaluators")
+                    st.success(f"Added {written} faculty members.")
+                    if dropped: st.warning(f"⚠️ Skipped {dropped} rows without a faculty_id.")
                 except Exception as e: st.error(f"Error: {e}")
         with col_e2:
             with st.form("fac_manual"):
@@ -135,58 +130,58 @@ with tabs[2]:
             
         f_mig = st.file_uploader("Upload Migration CSV (temp_usn, official_usn)", type='csv')
         
-        if f_mig and st.button("🚀 Execute USN Migration", type="primary"):
-            df_mig = pd.read_csv(f_mig)
-            df_mig.columns = [str(c).strip().lower() for c in df_mig.columns]
+        if f_mig:
+            try:
+                mig_pairs, mig_issues = read_migration_map(f_mig)
+            except ValueError as e:
+                st.error(f"❌ {e}")
+                mig_pairs, mig_issues = [], []
             
-            if 'temp_usn' not in df_mig.columns or 'official_usn' not in df_mig.columns:
-                st.error("❌ CSV must contain exact headers: 'temp_usn' and 'official_usn'.")
-            else:
-                with st.spinner("Migrating student records across the database..."):
-                    success_count = 0
-                    error_count = 0
-                    error_logs = []
-                    migrations = df_mig.to_dict('records')
-                    progress_bar = st.progress(0)
+            if mig_issues:
+                st.warning(f"⚠️ {len(mig_issues)} rows rejected before the dry run.")
+                st.dataframe(pd.DataFrame(mig_issues), hide_index=True, use_container_width=True)
+            
+            if mig_pairs:
+                # Dry run: nothing is written, only counted
+                try:
+                    plan, _ = plan_usn_migration(supabase, mig_pairs)
+                except Exception as e:
+                    plan = None
+                    st.error(f"Dry run failed: {e}")
+                
+                if plan:
+                    counts = plan.get('counts', {})
+                    st.markdown("**Dry Run: rows that will move**")
+                    m_cols = st.columns(len(counts) or 1)
+                    for col, (table, n) in zip(m_cols, counts.items()):
+                        col.metric(table, n)
+                    if plan.get('skipped'):
+                        st.warning(f"⚠️ {len(plan['skipped'])} pairs will be skipped.")
+                        st.dataframe(pd.DataFrame(plan['skipped']), hide_index=True, use_container_width=True)
                     
-                    for idx, row in enumerate(migrations):
-                        old_usn = str(row['temp_usn']).strip().upper()
-                        new_usn = str(row['official_usn']).strip().upper()
-                        
-                        try:
-                            old_stu_res = supabase.table("master_students").select("*").eq("usn", old_usn).execute()
-                            if not old_stu_res.data:
-                                error_count += 1
-                                error_logs.append(f"{old_usn}: Not found.")
-                                continue
-                                
-                            new_stu_data = old_stu_res.data[0].copy()
-                            new_stu_data['usn'] = new_usn
-                            new_stu_data['admission_number'] = old_usn
-                            
-                            supabase.table("master_students").upsert(new_stu_data).execute()
-                            supabase.table("course_registrations").update({"usn": new_usn}).eq("usn", old_usn).execute()
-                            supabase.table("student_results").update({"usn": new_usn}).eq("usn", old_usn).execute()
-                            
+                    if counts.get('master_students') and st.button("🚀 Execute USN Migration", type="primary"):
+                        with st.spinner("Migrating student records across the database..."):
                             try:
-                                supabase.table("marks_audit_log").update({"usn": new_usn}).eq("usn", old_usn).execute()
-                            except: pass
-                                
-                            supabase.table("master_students").delete().eq("usn", old_usn).execute()
-                            success_count += 1
-                            
-                        except Exception as e:
-                            error_count += 1
-                            error_logs.append(f"{old_usn} -> {new_usn}: {str(e)}")
-                            
-                        progress_bar.progress((idx + 1) / len(migrations))
-                        
-                    if success_count > 0:
-                        st.success(f"✅ Successfully migrated {success_count} students to their official USNs!")
-                    if error_count > 0:
-                        st.error(f"⚠️ Failed to migrate {error_count} records.")
-                        with st.expander("View Error Logs"):
-                            for err in error_logs: st.write(err)
+                                batch_id, result, used_rpc = apply_usn_migration(supabase, mig_pairs)
+                                moved = result.get('counts', {}).get('master_students', 0)
+                                st.success(f"✅ Successfully migrated {moved} students to their official USNs! (Batch `{batch_id}`)")
+                                if not used_rpc:
+                                    st.caption("ℹ️ `migrate_usns` is not installed (sql/migrate_usns.sql); ran as batched table calls instead.")
+                            except Exception as e:
+                                st.error(f"❌ Migration failed and was rolled back: {e}")
+        
+        with st.expander("↩️ Undo a Migration Batch"):
+            batches = list_migration_batches(supabase)
+            if not batches:
+                st.caption("No journalled migrations to undo.")
+            else:
+                labels = {f"{b} ({n} students, {str(at)[:16]})": b for b, n, at in batches}
+                pick = st.selectbox("Batch", list(labels.keys()))
+                if st.button("Rollback Batch"):
+                    try:
+                        restored, _ = rollback_usn_migration(supabase, labels[pick])
+                        st.success(f"✅ Restored {restored} students to their temporary USNs.")
+                    except Exception as e: st.error(f"Error: {e}")
 
     # 🟢 THE NEW STATUS MANAGER ENGINE
     with st_tabs[3]:
@@ -235,20 +230,22 @@ with tabs[2]:
                 
             f_stat = st.file_uploader("Upload Status CSV (usn, status)", type='csv')
             if f_stat and st.button("Execute Bulk Update"):
-                df_stat = pd.read_csv(f_stat)
+                df_stat = pd.read_csv(f_stat, dtype=str)
                 df_stat.columns = [str(c).strip().lower() for c in df_stat.columns]
                 
                 if 'usn' not in df_stat.columns or 'status' not in df_stat.columns:
                     st.error("❌ CSV must contain exact headers: 'usn' and 'status'.")
                 else:
                     with st.spinner("Updating statuses..."):
-                        updates = df_stat.to_dict('records')
-                        for row in updates:
-                            clean_usn = str(row['usn']).strip().upper()
-                            clean_status = str(row['status']).strip().upper()
-                            if clean_status in ["ACTIVE", "DETAINED", "DISCONTINUED"]:
-                                supabase.table("master_students").update({"status": clean_status}).eq("usn", clean_usn).execute()
-                    st.success(f"✅ Successfully processed {len(updates)} status updates.")
+                        clean_usn = df_stat['usn'].astype("string").str.strip().str.upper()
+                        clean_status = df_stat['status'].astype("string").str.strip().str.upper()
+                        valid = clean_usn.notna() & (clean_usn != "") & clean_status.isin(["ACTIVE", "DETAINED", "DISCONTINUED"])
+                        # Later rows win for repeated USNs
+                        patches = {u: {"status": s} for u, s in zip(clean_usn[valid], clean_status[valid])}
+                        patched = bulk_patch_students(supabase, patches)
+                    st.success(f"✅ Successfully processed {patched} status updates.")
+                    if (~valid).any():
+                        st.warning(f"⚠️ Skipped {int((~valid).sum())} rows with a blank USN or an unknown status.")
 
 # ==========================================
 # 3. ACADEMIC MASTER (COURSES & BRANCHES)
@@ -262,12 +259,10 @@ with tabs[3]:
         with c_b1:
             f_br = st.file_uploader("Upload CSV (branch_code, branch_name, program_type)", type='csv')
             if f_br and st.button("Upload Branches"):
-                df = pd.read_csv(f_br)
-                expected = ['branch_code', 'branch_name', 'program_type']
-                data = clean_data_for_db(df, expected)
                 try:
-                    supabase.table("master_branches").upsert(data).execute()
-                    st.success(f"Added {len(data)} branches.")
+                    written, dropped = upload_table_csv(supabase, f_br, "master_branches")
+                    st.success(f"Added {written} branches.")
+                    if dropped: st.warning(f"⚠️ Skipped {dropped} rows without a branch_code.")
                 except Exception as e: st.error(f"Error: {e}")
         with c_b2:
             with st.form("branch_manual"):
@@ -285,12 +280,10 @@ with tabs[3]:
         with c_m1:
             f_crs = st.file_uploader("Upload Scheme CSV (course_code, title, branch_code, semester_id, credits, max_cie, max_see, total_marks)", type='csv')
             if f_crs and st.button("Upload Scheme"):
-                df = pd.read_csv(f_crs)
-                expected = ['course_code', 'title', 'branch_code', 'semester_id', 'credits', 'max_cie', 'max_see', 'total_marks']
-                data = clean_data_for_db(df, expected)
                 try:
-                    supabase.table("master_courses").upsert(data).execute()
-                    st.success("✅ Scheme Updated Successfully.")
+                    written, dropped = upload_table_csv(supabase, f_crs, "master_courses")
+                    st.success(f"✅ Scheme Updated Successfully ({written} courses).")
+                    if dropped: st.warning(f"⚠️ Skipped {dropped} rows without a course_code.")
                 except Exception as e:
                     st.error(f"🚨 RAW DATABASE ERROR: {e}")
                     
@@ -322,62 +315,43 @@ with tabs[3]:
 # ==========================================
 with tabs[4]:
     st.header("Step 4: Master Data Backup Engine")
-    st.info("This utility securely pulls your entire University ERP database and packages it into a single, highly compressed ZIP file for offline storage.")
-
-    def fetch_backup_records(table_name):
-        all_data = []
-        start = 0
-        step = 1000
-        while True:
-            try:
-                res = supabase.table(table_name).select("*").range(start, start + step - 1).execute()
-                if not res.data: break
-                all_data.extend(res.data)
-                if len(res.data) < step: break
-                start += step
-            except Exception as e:
-                st.error(f"Error fetching table {table_name}: {e}")
-                break
-        return all_data
+    st.info("This utility securely pulls your entire University ERP database and packages it into a single ZIP of compressed per-table files, with a manifest of row counts and checksums, for offline storage.")
 
     st.write("### Prepare Offline Backup")
+    backup_mode = st.radio("Backup Type", ["Full", "Differential (changes since a previous backup)"], horizontal=True)
+    b_col1, b_col2 = st.columns(2)
+    backup_fmt = b_col1.radio("File Format", list(BACKUP_FORMATS.keys()), horizontal=True)
+    backup_workers = b_col2.slider("Tables exported in parallel", 1, 8, DEFAULT_BACKUP_WORKERS)
+    
+    base_manifest = None
+    if backup_mode != "Full":
+        st.caption("Differentials keep the previous backup's file format. Tables without a change watermark (sql/backup_watermarks.sql) are exported in full.")
+        f_base = st.file_uploader("Previous Backup (ZIP or MANIFEST.json)", type=['zip', 'json'], key="backup_base")
+        if f_base:
+            try: base_manifest = read_manifest(f_base)
+            except Exception as e: st.error(f"Could not read the manifest: {e}")
 
-    if st.button("🚀 Generate Master Database Backup", type="primary"):
-        tables_to_backup = [
-            "master_students", "master_courses", "master_branches", "master_fees",
-            "exam_cycles", "exam_timetable", "course_registrations",
-            "student_results", "marks_audit_log"
-        ]
-        
+    if st.button("🚀 Generate Master Database Backup", type="primary", disabled=(backup_mode != "Full" and not base_manifest)):
         progress_bar = st.progress(0)
         status_text = st.empty()
-        zip_buffer = io.BytesIO()
+        done = []
+        
+        def on_table(table, meta):
+            done.append(table)
+            status_text.text(f"Extracted {table} ({meta['rows']} rows)... ({len(done)}/{len(BACKUP_TABLES)})")
+            progress_bar.progress(len(done) / len(BACKUP_TABLES))
         
         try:
-            with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-                total_tables = len(tables_to_backup)
-                
-                for index, table in enumerate(tables_to_backup):
-                    status_text.text(f"Extracting {table}... ({index + 1}/{total_tables})")
-                    data = fetch_backup_records(table)
-                    
-                    if data:
-                        df = pd.DataFrame(data)
-                        csv_string = df.to_csv(index=False)
-                        zf.writestr(f"{table}_backup.csv", csv_string)
-                    else:
-                        zf.writestr(f"{table}_backup_EMPTY.csv", "No data currently exists in this table.")
-                    
-                    progress_bar.progress((index + 1) / total_tables)
-                    
+            archive, manifest = write_backup_archive(supabase, BACKUP_FORMATS[backup_fmt], max_workers=backup_workers, on_table=on_table, base_manifest=base_manifest)
             timestamp = datetime.datetime.now().strftime("%Y_%m_%d_%H%M")
-            zip_filename = f"AMC_ERP_Master_Backup_{timestamp}.zip"
+            zip_filename = f"AMC_ERP_{'Diff' if base_manifest else 'Master'}_Backup_{timestamp}.zip"
             
             status_text.success("✅ Database compiled successfully! Ready for download.")
+            st.dataframe(pd.DataFrame([{"Table": t, "Export": m['mode'], "Rows": m['rows'], "Checksum": m['checksum']} for t, m in manifest['tables'].items()]), hide_index=True, use_container_width=True)
             
             st.download_button(
                 label="📥 Download Master Backup (ZIP)",
-                data=zip_buffer.getvalue(),
+                data=archive,
                 file_name=zip_filename,
                 mime="application/zip",
                 type="primary",
@@ -386,3 +360,65 @@ with tabs[4]:
             
         except Exception as e:
             status_text.error(f"🚨 Backup generation failed: {e}")
+
+    st.write("### 🧩 Reconstruct a Point-in-Time Snapshot")
+    st.caption("Upload a full backup together with its chain of differentials (any order) to rebuild one full backup as of the latest differential.")
+    f_chain = st.file_uploader("Backup Archives (ZIP)", type='zip', accept_multiple_files=True, key="backup_chain")
+    if f_chain and st.button("Rebuild Snapshot"):
+        with st.spinner("Merging backup chain..."):
+            try:
+                snap, snap_manifest = reconstruct_snapshot([(f, read_manifest(f)) for f in f_chain])
+                st.success(f"✅ Snapshot rebuilt from {len(snap_manifest['reconstructed_from'])} archives.")
+                st.dataframe(pd.DataFrame([{"Table": t, "Rows": m['rows'], "Checksum": m['checksum']} for t, m in snap_manifest['tables'].items()]), hide_index=True, use_container_width=True)
+                st.download_button("📥 Download Snapshot (ZIP)", snap, f"AMC_ERP_Snapshot_{datetime.datetime.now():%Y_%m_%d_%H%M}.zip", "application/zip")
+            except ValueError as e: st.error(f"❌ {e}")
+            except Exception as e: st.error(f"🚨 Reconstruction failed: {e}")
+
+    st.write("### ♻️ Restore from Backup")
+    st.warning("Restoring upserts every row of the chosen tables back into the live database (parents first). Rows added since the backup are kept; rows changed since are overwritten.")
+    f_restore = st.file_uploader("Full Backup or Snapshot (ZIP)", type='zip', key="backup_restore")
+    if f_restore:
+        try:
+            r_manifest = read_manifest(f_restore)
+        except Exception as e:
+            r_manifest = None
+            st.error(f"Could not read the manifest: {e}")
+        
+        if r_manifest and r_manifest.get("mode") == "diff":
+            st.error("❌ This is a differential backup. Rebuild a snapshot from its chain first.")
+        elif r_manifest:
+            st.caption(f"Backup `{r_manifest.get('backup_id', r_manifest.get('created_at'))}` taken {r_manifest.get('created_at')} ({r_manifest.get('format')})")
+            r_tables = st.multiselect("Tables to Restore", list(r_manifest['tables'].keys()), default=list(r_manifest['tables'].keys()))
+            r_col1, r_col2 = st.columns(2)
+            r_verify = r_col1.checkbox("Verify checksums before loading", value=True)
+            r_workers = r_col2.slider("Parallel upsert streams", 1, 8, DEFAULT_BACKUP_WORKERS, key="restore_workers")
+            r_confirm = st.checkbox("I understand this overwrites live records with the backup's values.")
+            
+            if st.button("♻️ Restore Database", type="primary", disabled=not (r_confirm and r_tables)):
+                progress_bar = st.progress(0)
+                status_text = st.empty()
+                try:
+                    if r_verify:
+                        status_text.text("Verifying archive against its manifest...")
+                        check = verify_archive(f_restore, tables=r_tables)
+                        bad = [c['table'] for c in check if not c['checksum_ok']]
+                        if bad:
+                            st.dataframe(pd.DataFrame(check), hide_index=True, use_container_width=True)
+                            raise ValueError(f"Checksum mismatch in: {', '.join(bad)}. Nothing was restored.")
+                    
+                    done = []
+                    def on_restored(table, row):
+                        done.append(table)
+                        status_text.text(f"Restored {table} ({row['rows']} rows)... ({len(done)}/{len(r_tables)})")
+                        progress_bar.progress(len(done) / len(r_tables))
+                    
+                    started = datetime.datetime.now()
+                    report = restore_archive(supabase, f_restore, tables=r_tables, max_workers=r_workers, on_table=on_restored)
+                    elapsed = (datetime.datetime.now() - started).total_seconds()
+                    st.dataframe(pd.DataFrame(report), hide_index=True, use_container_width=True)
+                    if all(r['checksum_ok'] for r in report):
+                        status_text.success(f"✅ Restored {sum(r['rows'] for r in report)} rows across {len(report)} tables in {elapsed:.0f}s.")
+                    else:
+                        status_text.warning("⚠️ Restore finished, but some tables did not match their manifest counts or checksums.")
+                except ValueError as e: status_text.error(f"❌ {e}")
+                except Exception as e: status_text.error(f"🚨 Restore failed: {e}")
@@ -0,0 +1,87 @@
+import io
+from PIL import Image as PILImage
+from reportlab.lib.utils import ImageReader
+from reportlab.platypus import Flowable
+
+# --- CONFIGURATION ---
+ASSET_BUCKET = "College_Logos"
+SYSTEM_ASSET_FILES = {"logo": "College_logo.png", "naac": "NAAC_A_Logo.jpg", "watermark": "AMC_watermark.png"}
+
+# Largest box (in points) each image is ever printed at across the hall-ticket / registration layouts
+ASSET_PRINT_SIZES = {"logo": (60, 60), "naac": (60, 60), "watermark": (350, 350)}
+PHOTO_PRINT_SIZE = (65, 75)
+PRINT_DPI = 200
+
+def print_size_px(width_pt, height_pt, dpi=PRINT_DPI):
+    return max(1, int(width_pt * dpi / 72)), max(1, int(height_pt * dpi / 72))
+
+def downscale_image(raw_bytes, width_pt, height_pt, dpi=PRINT_DPI):
+    """
+    Shrinks an image so it is no larger than needed to print at `dpi` inside a width x height (pt) box.
+    Aspect ratio is kept; transparency is kept for PNG logos / watermarks.
+    """
+    img = PILImage.open(io.BytesIO(raw_bytes))
+    img.load()
+    has_alpha = img.mode in ('RGBA', 'LA', 'P') and (img.mode != 'P' or 'transparency' in img.info)
+    img = img.convert('RGBA' if has_alpha else 'RGB')
+    img.thumbnail(print_size_px(width_pt, height_pt, dpi), PILImage.LANCZOS)
+    return img
+
+def image_reader(raw_bytes, width_pt, height_pt, dpi=PRINT_DPI):
+    """Builds one reusable ImageReader holding the downscaled image (None if the bytes are unreadable)"""
+    if not raw_bytes: return None
+    try:
+        img = downscale_image(raw_bytes, width_pt, height_pt, dpi)
+        if img.mode == 'RGB':
+            # Opaque images go in as small JPEGs so ReportLab embeds them as DCT streams, not raw pixels
+            out = io.BytesIO()
+            img.save(out, format='JPEG', quality=90)
+            out.seek(0)
+            return ImageReader(out)
+        return ImageReader(img)
+    except:
+        return None
+
+def photo_reader(photo_io, width_pt=PHOTO_PRINT_SIZE[0], height_pt=PHOTO_PRINT_SIZE[1]):
+    """Wraps a downloaded student photo once so every copy on the page set shares the same image"""
+    if not photo_io: return None
+    photo_io.seek(0)
+    return image_reader(photo_io.read(), width_pt, height_pt)
+
+def fetch_system_asset_bytes(supabase):
+    """Raw logo / NAAC / watermark bytes (picklable, so they can be shipped to worker processes)"""
+    raw = {"logo": None, "naac": None, "watermark": None}
+    for k, fname in SYSTEM_ASSET_FILES.items():
+        try:
+            res = supabase.storage.from_(ASSET_BUCKET).download(fname)
+            if res: raw[k] = res
+        except: pass
+    return raw
+
+def prepare_system_assets(raw_assets):
+    """Print-sized ImageReaders keyed like the old asset dict"""
+    return {k: image_reader(raw_assets.get(k), *ASSET_PRINT_SIZES[k]) for k in SYSTEM_ASSET_FILES}
+
+def load_system_assets(supabase):
+    """Downloads logo / NAAC / watermark once and returns print-sized ImageReaders"""
+    return prepare_system_assets(fetch_system_asset_bytes(supabase))
+
+class ReaderImage(Flowable):
+    """
+    Table-cell image drawn from an existing ImageReader.
+    ReportLab keys image XObjects by content digest, so drawing the same reader on several
+    pages/halves embeds the pixels once and only adds a `Do` reference each time.
+    """
+    def __init__(self, reader, width, height, hAlign='CENTER', vAlign='MIDDLE'):
+        Flowable.__init__(self)
+        self.reader = reader
+        self.drawWidth = width
+        self.drawHeight = height
+        self.hAlign = hAlign
+        self.vAlign = vAlign
+
+    def wrap(self, availWidth, availHeight):
+        return self.drawWidth, self.drawHeight
+
+    def draw(self):
+        self.canv.drawImage(self.reader, 0, 0, width=self.drawWidth, height=self.drawHeight, mask='auto')
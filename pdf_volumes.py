@@ -0,0 +1,164 @@
+import os
+import re
+import shutil
+import tempfile
+import zipfile
+import itertools
+import collections
+import multiprocessing
+import concurrent.futures
+import fitz  # PyMuPDF
+
+# --- CONFIGURATION ---
+VOLUME_MODES = ["Per Branch", "Every N Students"]
+DEFAULT_VOLUME_WORKERS = max(1, min(4, (os.cpu_count() or 2) - 1))
+SINGLE_PDF_CHUNK = 100
+
+def safe_volume_name(label):
+    return re.sub(r'[^A-Za-z0-9_-]+', '_', str(label)).strip('_') or "VOLUME"
+
+def _chunks(items, size):
+    if not size or size <= 0:
+        yield items
+        return
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+# ==========================================
+# 1. VOLUME PLANNING
+# ==========================================
+def plan_volumes(entries, mode, per_volume=None, branch_key='branch_code'):
+    """
+    Splits entries (dicts with 'usn' and a branch field) into [(volume_name, [entry, ...])].
+    "Per Branch" gives one volume per branch (split further if `per_volume` is set),
+    "Every N Students" gives fixed-size volumes over the whole USN-sorted roster.
+    """
+    ordered = sorted(entries, key=lambda e: (str(e.get(branch_key) or 'GEN').upper(), str(e['usn'])))
+    volumes = []
+
+    if mode == "Per Branch":
+        for branch, group in itertools.groupby(ordered, key=lambda e: str(e.get(branch_key) or 'GEN').upper()):
+            parts = list(_chunks(list(group), per_volume))
+            for p_idx, part in enumerate(parts, start=1):
+                suffix = f"_Part{p_idx}" if len(parts) > 1 else ""
+                volumes.append((safe_volume_name(f"{len(volumes) + 1:02d}_{branch}{suffix}"), part))
+    else:
+        ordered = sorted(entries, key=lambda e: str(e['usn']))
+        for part in _chunks(ordered, per_volume):
+            volumes.append((safe_volume_name(f"{len(volumes) + 1:03d}_{part[0]['usn']}-{part[-1]['usn']}"), part))
+
+    return volumes
+
+# ==========================================
+# 2. PARALLEL RENDERING
+# ==========================================
+def render_volumes(volume_jobs, worker_fn, initializer, initargs, max_workers=DEFAULT_VOLUME_WORKERS, max_pending=None, ordered=False):
+    """
+    Renders (volume_name, payload) jobs in worker processes and yields whatever `worker_fn` returns (volume_name, pdf_path, usns)
+    as soon as each volume is written. `volume_jobs` may be a lazy generator: at most `max_pending`
+    volumes are queued at once, so only a few volumes' worth of payload is ever held in memory.
+    With `ordered=True` results come back in job order (for stitching chunks into one document).
+    Finished PDFs live in a temp directory that is removed when the generator closes.
+    """
+    max_pending = max_pending or max_workers * 2
+    out_dir = tempfile.mkdtemp(prefix="amc_volumes_")
+    # spawn keeps the workers clear of the Streamlit server's threads and sockets
+    mp_ctx = multiprocessing.get_context("spawn")
+
+    try:
+        with concurrent.futures.ProcessPoolExecutor(max_workers=max_workers, mp_context=mp_ctx, initializer=initializer, initargs=initargs) as pool:
+            if ordered:
+                pending = collections.deque()
+                for name, payload in volume_jobs:
+                    pending.append(pool.submit(worker_fn, name, payload, out_dir))
+                    if len(pending) >= max_pending:
+                        yield pending.popleft().result()
+                while pending:
+                    yield pending.popleft().result()
+                return
+
+            pending = set()
+            for name, payload in volume_jobs:
+                pending.add(pool.submit(worker_fn, name, payload, out_dir))
+                if len(pending) >= max_pending:
+                    done, pending = concurrent.futures.wait(pending, return_when=concurrent.futures.FIRST_COMPLETED)
+                    for f in done: yield f.result()
+            for f in concurrent.futures.as_completed(pending):
+                yield f.result()
+    finally:
+        shutil.rmtree(out_dir, ignore_errors=True)
+
+def stitch_volumes(results, out_path, on_volume=None):
+    """
+    Appends rendered chunks (in order) onto one PDF at `out_path` using incremental saves, so only the
+    chunk being added is ever loaded. Each chunk file is deleted once appended and the USN outline is
+    rebuilt at the end. `on_volume(volume_name, usns)` is called after every chunk. Returns the page count.
+    """
+    toc = []; page_count = 0
+    for volume_name, pdf_path, usns in results:
+        src = fitz.open(pdf_path)
+        toc.extend([level, title, page + page_count] for level, title, page in src.get_toc())
+        if not page_count:
+            page_count = src.page_count
+            src.close()
+            shutil.copyfile(pdf_path, out_path)
+        else:
+            doc = fitz.open(out_path)
+            doc.insert_pdf(src)
+            page_count = doc.page_count
+            doc.saveIncr(); doc.close(); src.close()
+        try: os.remove(pdf_path)
+        except OSError: pass
+        if on_volume: on_volume(volume_name, usns)
+
+    if page_count:
+        doc = fitz.open(out_path)
+        doc.set_toc(toc)
+        doc.saveIncr(); doc.close()
+    return page_count
+
+class VolumeZip:
+    """ZIP bundle spooled to a temp file; PDFs are added as they finish and deleted from disk straight after."""
+    def __init__(self, pages_per_student=1):
+        self.file = tempfile.TemporaryFile()
+        # PDFs are already compressed internally, storing them keeps zipping near-instant
+        self.zf = zipfile.ZipFile(self.file, "w", zipfile.ZIP_STORED, allowZip64=True)
+        self.pages_per_student = pages_per_student
+        self.index = []
+
+    def add(self, volume_name, pdf_path, usns):
+        self.zf.write(pdf_path, f"{volume_name}.pdf")
+        for pos, usn in enumerate(usns):
+            self.index.append((usn, volume_name, pos * self.pages_per_student + 1))
+        try: os.remove(pdf_path)
+        except OSError: pass
+
+    def add_bytes(self, volume_name, pdf_bytes, page_index):
+        """Adds an in-memory PDF whose student start pages are already known ({usn: first_page})"""
+        self.zf.writestr(f"{volume_name}.pdf", pdf_bytes)
+        self.index.extend((usn, volume_name, page) for usn, page in page_index.items())
+
+    def add_file(self, arcname, data):
+        """Extra non-indexed member (supplements, change reports)"""
+        self.zf.writestr(arcname, data)
+
+    def finish(self):
+        """Closes the archive with an INDEX.csv (USN -> volume, first page) and returns the rewound file"""
+        lines = ["USN,Volume,Page"] + [f"{u},{v},{p}" for u, v, p in sorted(self.index)]
+        self.zf.writestr("INDEX.csv", "\n".join(lines) + "\n")
+        self.zf.close()
+        self.file.seek(0)
+        return self.file
+
+def attach_photos(volumes, photo_feed):
+    """
+    Lazily turns planned volumes into render jobs, pulling JPEG bytes from one ordered photo stream
+    (built over the USNs of `volumes` in order). New dicts are built per job so nothing shared is
+    mutated while the pool is still pickling it.
+    """
+    for name, entries in volumes:
+        payload = []
+        for e in entries:
+            _, photo_io = next(photo_feed)
+            payload.append({**e, 'photo': photo_io.getvalue() if photo_io else None})
+        yield name, payload
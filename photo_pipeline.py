@@ -0,0 +1,120 @@
+import io
+import os
+import re
+import collections
+import concurrent.futures
+from PIL import Image as PILImage
+
+# --- CONFIGURATION ---
+PHOTO_BUCKET = "StakeHolders_Photos"
+FALLBACK_EXTENSIONS = ['.webp', '.jpg', '.jpeg', '.png', '.WEBP', '.JPG', '.PNG']
+DEFAULT_PHOTO_WORKERS = 8
+DEFAULT_PHOTO_PREFETCH = 32
+
+def clean_usn_key(usn):
+    """Normalises a USN / file stem into the lookup key used by the bucket map"""
+    return re.sub(r'[^A-Z0-9]', '', str(usn).upper())
+
+# ==========================================
+# 1. BUCKET INDEX
+# ==========================================
+def fetch_bucket_index(supabase, bucket_name=PHOTO_BUCKET):
+    """
+    One listing pass over the bucket. Returns (file_map, version_map), both keyed by clean USN:
+    the stored file name, and its eTag (falling back to updated_at) so photo replacements can be detected.
+    """
+    file_map = {}; version_map = {}
+    limit = 1000; offset = 0
+    while True:
+        try:
+            files = supabase.storage.from_(bucket_name).list("", options={"limit": limit, "offset": offset})
+            if not files: break
+            for f in files:
+                fname = f.get('name', '')
+                if not fname or fname == '.emptyFolderPlaceholder':
+                    continue
+                basename = os.path.basename(fname)
+                key = clean_usn_key(os.path.splitext(basename)[0])
+                file_map[key] = fname
+                meta = f.get('metadata') or {}
+                version_map[key] = f"{fname}:{meta.get('eTag') or f.get('updated_at') or ''}"
+            if len(files) < limit: break
+            offset += limit
+        except: break
+    return file_map, version_map
+
+def fetch_complete_bucket_map(supabase, bucket_name=PHOTO_BUCKET):
+    return fetch_bucket_index(supabase, bucket_name)[0]
+
+# ==========================================
+# 2. SINGLE PHOTO DOWNLOAD
+# ==========================================
+def _to_clean_jpeg(raw_bytes, max_size_px=None):
+    img = PILImage.open(io.BytesIO(raw_bytes))
+    if img.mode != 'RGB': img = img.convert('RGB')
+    if max_size_px: img.thumbnail(max_size_px, PILImage.LANCZOS)
+    clean_io = io.BytesIO()
+    img.save(clean_io, format='JPEG', quality=95)
+    clean_io.seek(0)
+    return clean_io
+
+def download_photo(supabase, usn, file_map, bucket_name=PHOTO_BUCKET, max_size_px=None):
+    """
+    Returns the student's photo as a clean RGB JPEG stream, or None if it cannot be found.
+    `max_size_px` (w, h) shrinks camera-sized originals down to what the PDF actually prints.
+    """
+    clean_usn = clean_usn_key(usn)
+    storage = supabase.storage.from_(bucket_name)
+
+    if clean_usn in file_map:
+        try:
+            res = storage.download(file_map[clean_usn])
+            if res: return _to_clean_jpeg(res, max_size_px)
+        except: pass
+
+    for ext in FALLBACK_EXTENSIONS:
+        try:
+            res = storage.download(f"{clean_usn}{ext}")
+            if res: return _to_clean_jpeg(res, max_size_px)
+        except: pass
+
+    return None
+
+# ==========================================
+# 3. STREAMING PRODUCER
+# ==========================================
+def stream_photos(supabase, usns, file_map, max_workers=DEFAULT_PHOTO_WORKERS, prefetch=DEFAULT_PHOTO_PREFETCH, max_size_px=None):
+    """
+    Yields (usn, photo_io) in the same order as `usns` while later photos keep downloading.
+
+    One long-lived thread pool feeds a bounded window of at most `prefetch` pending downloads,
+    so the caller can draw page N while photos N+1..N+prefetch are in flight. All workers share
+    the Supabase client, which keeps its HTTP connections alive between requests.
+    """
+    prefetch = max(int(prefetch), int(max_workers), 1)
+    usn_iter = iter(usns)
+    window = collections.deque()
+
+    with concurrent.futures.ThreadPoolExecutor(max_workers=max_workers) as executor:
+        def submit_next():
+            for u in usn_iter:
+                window.append((u, executor.submit(download_photo, supabase, u, file_map, PHOTO_BUCKET, max_size_px)))
+                return True
+            return False
+
+        while len(window) < prefetch and submit_next():
+            pass
+
+        try:
+            while window:
+                u, future = window.popleft()
+                try:
+                    photo_io = future.result()
+                except Exception:
+                    photo_io = None
+                submit_next()
+                yield u, photo_io
+        finally:
+            # Consumer stopped early (error / st.stop) - drop anything still queued
+            for _, future in window:
+                future.cancel()
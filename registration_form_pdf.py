@@ -0,0 +1,239 @@
+import io
+import os
+import re
+import pandas as pd
+from reportlab.lib.pagesizes import A4
+from reportlab.lib import colors
+from reportlab.platypus import Table, TableStyle, Paragraph
+from reportlab.lib.styles import getSampleStyleSheet
+from reportlab.pdfgen import canvas
+from pdf_assets import prepare_system_assets, photo_reader, ReaderImage
+
+# ==========================================
+# 1. HELPERS
+# ==========================================
+def safe_float(val, default=0.0):
+    try: return float(val) if val and pd.notna(val) else default
+    except: return default
+
+def get_checkbox():
+    """Generates a perfect square box for the table cells"""
+    t = Table([[""]], colWidths=[12], rowHeights=[12])
+    t.setStyle(TableStyle([
+        ('GRID', (0,0), (-1,-1), 0.8, colors.black),
+        ('BACKGROUND', (0,0), (-1,-1), colors.white)
+    ]))
+    return t
+
+def course_sort_key(s):
+    """
+    Extracts the main 3-digit course number (e.g., 201, 202) for perfect numeric sorting.
+    It finds all numbers in the string and uses the last one as the primary sort key.
+    """
+    code_str = str(s).strip().upper()
+    numbers = re.findall(r'\d+', code_str)
+    # The course number is almost always the last set of digits in the code (e.g. '1BESC204C' -> 204)
+    main_num = int(numbers[-1]) if numbers else 9999
+    return (main_num, code_str)
+
+def build_form_entry(stu, branch_courses_dict, branch_prog_map):
+    """Resolves the course list and programme type printed on one student's form (photo excluded)"""
+    s_br = str(stu['branch_code']).upper()
+    raw_courses = branch_courses_dict.get(s_br, []) + branch_courses_dict.get("COMMON", [])
+    raw_courses = sorted(raw_courses, key=lambda x: course_sort_key(x['course_code']))
+
+    seen = set()
+    dedup_courses = []
+    for crs in raw_courses:
+        if crs['course_code'] not in seen:
+            seen.add(crs['course_code'])
+            dedup_courses.append(crs)
+    return {"usn": stu['usn'], "student": stu, "courses": dedup_courses, "branch_code": s_br, "prog_type": branch_prog_map.get(s_br, "UG")}
+
+# ==========================================
+# 2. EXACT REPLICA PDF GENERATOR ENGINE
+# ==========================================
+def draw_header(c, w, y_start, assets):
+    margin = 35
+    if assets.get("logo"):
+        c.drawImage(assets["logo"], margin, y_start - 35, width=60, height=60, mask='auto', preserveAspectRatio=True)
+    if assets.get("naac"):
+        c.drawImage(assets["naac"], w - margin - 60, y_start - 35, width=60, height=60, mask='auto', preserveAspectRatio=True)
+
+    c.setFont("Helvetica-Bold", 15)
+    c.drawCentredString(w/2, y_start, "AMC ENGINEERING COLLEGE")
+    c.setFont("Helvetica", 9)
+    c.drawCentredString(w/2, y_start - 15, "AMC Campus, Bannerghatta Road, Bengaluru, Karnataka - 560083")
+    c.drawCentredString(w/2, y_start - 27, "Autonomous Institution Affiliated to VTU, Belagavi | NAAC A+ Accredited")
+    
+    c.setLineWidth(1)
+    c.line(margin, y_start - 45, w - margin, y_start - 45)
+    return y_start - 65
+
+def draw_registration_page(c, w, h, student, courses, assets, photo_img, form_title, sem, date_str, prog_type):
+    margin = 35
+    content_w = w - (2 * margin) 
+    
+    if assets.get("watermark"):
+        c.saveState()
+        c.setFillAlpha(0.08)
+        c.drawImage(assets["watermark"], w/2 - 175, h/2 - 175, width=350, height=350, mask='auto', preserveAspectRatio=True)
+        c.restoreState()
+
+    y = draw_header(c, w, h - margin, assets)
+    
+    c.setFont("Helvetica-Bold", 12)
+    c.drawCentredString(w/2, y, form_title)
+    y -= 25
+
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(margin, y, "Student Details")
+    y -= 5
+
+    if photo_img:
+        p_img = ReaderImage(photo_img, width=55, height=70)
+        s_data = [
+            ["USN", "Student Name", "Branch", "Type", "Photo"],
+            [student['usn'], student.get('full_name',''), student.get('branch_code',''), prog_type, p_img]
+        ]
+        style_cmds = [
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE')
+        ]
+    else:
+        p_img = Paragraph("<para align=center>PHOTO</para>", getSampleStyleSheet()['Normal'])
+        s_data = [
+            ["USN", "Student Name", "Branch", "Type", p_img],
+            [student['usn'], student.get('full_name',''), student.get('branch_code',''), prog_type, ""]
+        ]
+        style_cmds = [
+            ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+            ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+            ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+            ('ALIGN', (0,0), (-1,-1), 'CENTER'),
+            ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+            ('SPAN', (4, 0), (4, 1))
+        ]
+
+    t1 = Table(s_data, colWidths=[70, 205.27, 60, 90, 100], rowHeights=[20, 75])
+    t1.setStyle(TableStyle(style_cmds))
+    t1.wrapOn(c, w, h)
+    _, t1_h = t1.wrap(w, h)
+    t1.drawOn(c, margin, y - t1_h)
+    y -= (t1_h + 20)
+
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(margin, y, f"Semester: {sem}")
+    y -= 20
+
+    c.drawString(margin, y, "Courses offered")
+    y -= 5
+
+    c_data = [["Course code", "Course title", "Credits", "Select"]]
+    total_cr = 0
+    for crs in courses:
+        cr_val = safe_float(crs.get('credits', 0))
+        total_cr += cr_val
+        c_data.append([
+            crs['course_code'],
+            Paragraph(crs.get('title',''), getSampleStyleSheet()['Normal']),
+            str(int(cr_val) if cr_val.is_integer() else cr_val),
+            get_checkbox()
+        ])
+    c_data.append(["", Paragraph("<b>Total Credits</b>", getSampleStyleSheet()['Normal']), str(int(total_cr)), ""])
+
+    t2 = Table(c_data, colWidths=[80, 315.27, 60, 70])
+    t2.setStyle(TableStyle([
+        ('GRID', (0,0), (-1,-1), 0.5, colors.black),
+        ('BACKGROUND', (0,0), (-1,0), colors.lightgrey),
+        ('FONTNAME', (0,0), (-1,0), 'Helvetica-Bold'),
+        ('ALIGN', (0,0), (0,-1), 'CENTER'), 
+        ('ALIGN', (2,0), (-1,-1), 'CENTER'), 
+        ('VALIGN', (0,0), (-1,-1), 'MIDDLE'),
+    ]))
+    t2.wrapOn(c, w, h)
+    _, t2_h = t2.wrap(w, h)
+    t2.drawOn(c, margin, y - t2_h)
+    y -= (t2_h + 25)
+
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(margin, y, "STUDENT UNDERTAKING:")
+    y -= 15
+
+    c.setLineWidth(1)
+    c.setFont("Helvetica", 9)
+    
+    undertakings = [
+        "I will follow the AMCEC / VTU autonomy guidelines.",
+        "I have paid the full tuition fees and examination fees for the current semester.",
+        "I am aware that I must maintain a minimum of 85% attendance to appear for SEE.",
+        "I have verified that my selected credits align with the academic regulations."
+    ]
+    
+    for u in undertakings:
+        c.rect(margin, y - 8, 10, 10) 
+        c.drawString(margin + 18, y - 6, u)
+        y -= 18
+
+    y -= 10
+    
+    c.setFont("Helvetica-Bold", 10)
+    c.drawString(margin, y, "DECLARATION:")
+    y -= 15
+    
+    p_style = getSampleStyleSheet()['Normal']
+    p_style.fontSize = 9
+    decl = Paragraph("I hereby declare that the information provided is true to the best of my knowledge. I have carefully selected the courses listed above and I request to be registered for the same in the current semester.", p_style)
+    decl.wrapOn(c, content_w, 50)
+    _, decl_h = decl.wrap(content_w, 50)
+    decl.drawOn(c, margin, y - decl_h)
+    y -= (decl_h + 30)
+
+    sig_data = [
+        [f"Date: {date_str}", "________________________"],
+        ["", "Signature of the Student"]
+    ]
+    t_sig = Table(sig_data, colWidths=[content_w/2, content_w/2])
+    t_sig.setStyle(TableStyle([
+        ('ALIGN', (0,0), (0,-1), 'LEFT'),
+        ('ALIGN', (1,0), (1,-1), 'RIGHT'),
+        ('FONTNAME', (0,0), (-1,-1), 'Helvetica-Bold'),
+        ('FONTSIZE', (0,0), (-1,-1), 10),
+    ]))
+    t_sig.wrapOn(c, content_w, 50)
+    _, sig_h = t_sig.wrap(content_w, 50)
+    t_sig.drawOn(c, margin, y - sig_h)
+
+# ==========================================
+# 3. VOLUME WORKER (runs in a separate process)
+# ==========================================
+_VOLUME_CTX = {}
+
+def init_volume_worker(raw_assets, form_title, sem, date_str):
+    _VOLUME_CTX.update({
+        "assets": prepare_system_assets(raw_assets),
+        "form_title": form_title,
+        "sem": sem,
+        "date_str": date_str,
+    })
+
+def render_volume(volume_name, entries, out_dir):
+    """Writes one volume of registration forms with a USN bookmark per page. Entries carry photo JPEG bytes under 'photo'."""
+    ctx = _VOLUME_CTX
+    path = os.path.join(out_dir, f"{volume_name}.pdf")
+    c = canvas.Canvas(path, pagesize=A4)
+    c.setTitle(f"{ctx['form_title']} - {volume_name}")
+
+    for entry in entries:
+        photo = entry.get('photo')
+        c.bookmarkPage(entry['usn'])
+        c.addOutlineEntry(f"{entry['usn']} - {entry['student'].get('full_name', '')}", entry['usn'], level=0)
+        draw_registration_page(c, A4[0], A4[1], entry['student'], entry['courses'], ctx['assets'], photo_reader(io.BytesIO(photo)) if photo else None, ctx['form_title'], ctx['sem'], ctx['date_str'], entry['prog_type'])
+        c.showPage()
+
+    c.showOutline()
+    c.save()
+    return volume_name, path, [e['usn'] for e in entries]
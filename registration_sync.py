@@ -0,0 +1,96 @@
+import collections
+
+# --- CONFIGURATION ---
+REG_VALUE_FIELDS = ("academic_year", "semester_type", "semester")
+APPLY_RPC = "apply_registration_diff"  # sql/apply_registration_diff.sql
+
+def _norm(val):
+    """Compares '1', 1 and 1.0 (CSV vs DB types) as the same value"""
+    if val is None: return ""
+    if isinstance(val, float):
+        if val != val: return ""
+        if val.is_integer(): return str(int(val))
+    return str(val).strip()
+
+# ==========================================
+# 1. DIFF
+# ==========================================
+def diff_registrations(existing_rows, incoming_rows):
+    """
+    Works out what turns the existing registrations of the uploaded USNs into exactly the uploaded sheet
+    (the same end state as delete-then-reinsert). Rows are keyed by (usn, course_code); duplicates in the
+    sheet collapse to their last occurrence. Returns {"insert": [...], "update": [...], "delete": [...], "unchanged": n}.
+    """
+    incoming = {}
+    for r in incoming_rows:
+        incoming[(r['usn'], r['course_code'])] = r
+    uploaded_usns = {usn for usn, _ in incoming}
+
+    existing = {}
+    for r in existing_rows:
+        if r['usn'] in uploaded_usns:
+            existing[(r['usn'], r['course_code'])] = r
+
+    diff = {"insert": [], "update": [], "delete": [], "unchanged": 0}
+    for key, row in incoming.items():
+        old = existing.get(key)
+        if old is None:
+            diff["insert"].append(row)
+        elif any(_norm(old.get(f)) != _norm(row.get(f)) for f in REG_VALUE_FIELDS if f in row):
+            diff["update"].append(row)
+        else:
+            diff["unchanged"] += 1
+    diff["delete"] = [{"usn": usn, "course_code": code} for (usn, code) in existing if (usn, code) not in incoming]
+    return diff
+
+# ==========================================
+# 2. APPLY
+# ==========================================
+def _is_missing_rpc(err):
+    msg = str(err)
+    return "PGRST202" in msg or "Could not find the function" in msg
+
+def apply_registration_diff(supabase, cycle_id, diff, chunk_size=500):
+    """
+    Applies a diff in one transaction through the `apply_registration_diff` RPC.
+    Falls back to plain table calls when the function is not installed. Returns (counts, used_rpc).
+    """
+    try:
+        res = supabase.rpc(APPLY_RPC, {
+            "p_cycle_id": cycle_id,
+            "p_inserts": diff["insert"],
+            "p_updates": diff["update"],
+            "p_deletes": diff["delete"],
+        }).execute()
+        return res.data, True
+    except Exception as e:
+        if not _is_missing_rpc(e): raise
+    return apply_registration_diff_local(supabase, cycle_id, diff, chunk_size), False
+
+def apply_registration_diff_local(supabase, cycle_id, diff, chunk_size=500):
+    """
+    Stand-in for the RPC. Not atomic, so it runs inserts, then updates, then deletes: a failure part-way
+    leaves extra rows at worst, never a student without registrations, and re-running the same upload
+    only applies what is still missing.
+    """
+    inserts = [{**r, "cycle_id": cycle_id} for r in diff["insert"]]
+    for i in range(0, len(inserts), chunk_size):
+        supabase.table("course_registrations").insert(inserts[i:i+chunk_size]).execute()
+
+    # One UPDATE per (course, new values) group, one DELETE per course
+    update_groups = collections.defaultdict(list)
+    for r in diff["update"]:
+        values = tuple((f, r[f]) for f in REG_VALUE_FIELDS if f in r)
+        update_groups[(r['course_code'], values)].append(r['usn'])
+    for (code, values), usns in update_groups.items():
+        for i in range(0, len(usns), 100):
+            supabase.table("course_registrations").update(dict(values)).eq("cycle_id", cycle_id).eq("course_code", code).in_("usn", usns[i:i+100]).execute()
+
+    delete_groups = collections.defaultdict(list)
+    for r in diff["delete"]:
+        delete_groups[r['course_code']].append(r['usn'])
+    for code, usns in delete_groups.items():
+        for i in range(0, len(usns), 100):
+            supabase.table("course_registrations").delete().eq("cycle_id", cycle_id).eq("course_code", code).in_("usn", usns[i:i+100]).execute()
+
+    return {"inserted": len(inserts), "updated": len(diff["update"]), "deleted": len(diff["delete"])}
@@ -0,0 +1,73 @@
+import importlib.util
+import tempfile
+import pandas as pd
+import xlsxwriter
+from registration_form_pdf import course_sort_key
+
+# --- CONFIGURATION ---
+SHARED_STREAMS = ["COMMON", "FIRST_YEAR"]
+TEMPLATE_COLUMNS = ["usn", "course_code", "academic_year", "semester_type", "semester"]
+TEMPLATE_CHUNK_ROWS = 50000
+EXCEL_MAX_ROWS = 1048575
+TEMPLATE_FORMATS = {"CSV": ("csv", "text/csv"), "Excel (.xlsx)": ("xlsx", "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet")}
+if importlib.util.find_spec("pyarrow"):
+    TEMPLATE_FORMATS["Parquet"] = ("parquet", "application/octet-stream")
+
+def _norm(series):
+    return series.astype("string").str.strip().str.upper().fillna("")
+
+# ==========================================
+# 1. BRANCH -> COURSE PLAN
+# ==========================================
+def branch_course_plan(df_crs, code_col, stream_col, branches):
+    """
+    One sorted course list per branch (own courses + COMMON + FIRST_YEAR, deduplicated),
+    exploded to (branch, course_code, _order). Sorting happens once per branch, not per student.
+    """
+    crs = pd.DataFrame({"branch": _norm(df_crs[stream_col]), "course_code": df_crs[code_col].astype(str).str.strip()})
+    by_branch = crs.groupby("branch")["course_code"].agg(set)
+    shared = set().union(*(by_branch.get(s, set()) for s in SHARED_STREAMS))
+
+    parts = []
+    for br in branches:
+        codes = sorted(by_branch.get(br, set()) | shared, key=course_sort_key)
+        parts.append(pd.DataFrame({"branch": br, "course_code": codes, "_order": range(len(codes))}))
+    return pd.concat(parts, ignore_index=True) if parts else pd.DataFrame(columns=["branch", "course_code", "_order"])
+
+def build_template_frame(students, df_crs, code_col, stream_col, academic_year, semester_type, semester):
+    """students (usn, branch_code) x branch course plan -> one template row per student-course, in student order"""
+    stu = pd.DataFrame(students, columns=["usn", "branch_code"])
+    stu["branch"] = _norm(stu["branch_code"])
+    stu["_stu"] = range(len(stu))
+
+    plan = branch_course_plan(df_crs, code_col, stream_col, stu["branch"].unique())
+    frame = stu[["usn", "branch", "_stu"]].merge(plan, on="branch").sort_values(["_stu", "_order"], kind="stable")
+    return frame.assign(academic_year=academic_year, semester_type=semester_type, semester=semester)[TEMPLATE_COLUMNS].reset_index(drop=True)
+
+# ==========================================
+# 2. CHUNKED WRITERS
+# ==========================================
+def write_template(frame, fmt="CSV", chunk_rows=TEMPLATE_CHUNK_ROWS):
+    """Writes the template in chunks to a temp file (spills to disk past 32 MB) and returns it rewound"""
+    out = tempfile.SpooledTemporaryFile(max_size=32 * 1024 * 1024)
+    ext = TEMPLATE_FORMATS[fmt][0]
+
+    if ext == "csv":
+        for i in range(0, len(frame), chunk_rows):
+            out.write(frame.iloc[i:i + chunk_rows].to_csv(index=False, header=(i == 0)).encode("utf-8"))
+    elif ext == "xlsx":
+        if len(frame) > EXCEL_MAX_ROWS:
+            raise ValueError(f"{len(frame)} rows exceed Excel's sheet limit; use CSV or Parquet.")
+        wb = xlsxwriter.Workbook(out, {"constant_memory": True, "in_memory": False})
+        ws = wb.add_worksheet("Registrations")
+        ws.write_row(0, 0, TEMPLATE_COLUMNS)
+        row_no = 1
+        for i in range(0, len(frame), chunk_rows):
+            for row in frame.iloc[i:i + chunk_rows].itertuples(index=False, name=None):
+                ws.write_row(row_no, 0, row); row_no += 1
+        wb.close()
+    else:
+        frame.to_parquet(out, index=False)
+
+    out.seek(0)
+    return out
@@ -0,0 +1,90 @@
+import datetime
+import pandas as pd
+
+# --- CONFIGURATION ---
+ALLOT_TABLE = "seat_allotments"  # sql/seat_allotments.sql
+REPLACE_RPC = "replace_session_allotments"
+WRITE_BATCH = 500
+READ_PAGE = 1000
+IN_CHUNK = 100
+ALLOT_FIELDS = "room_no, seat_no, usn, course_code, status"
+# seat_allotments column -> allocation frame column
+FRAME_COLUMNS = {"room_no": "RoomNo", "seat_no": "SeatNo", "usn": "USN", "course_code": "Subject Code", "status": "Status"}
+
+def _is_missing_rpc(err):
+    msg = str(err)
+    return "PGRST202" in msg or "Could not find the function" in msg
+
+# ==========================================
+# 1. WRITE
+# ==========================================
+def allotment_records(cycle_id, date, session, df_alloc):
+    """Allocation frame (RoomNo, SeatNo, USN, Subject Code, Status) -> seat_allotments rows"""
+    statuses = df_alloc['Status'].tolist() if 'Status' in df_alloc.columns else ["PRESENT"] * len(df_alloc)
+    return [
+        {"cycle_id": cycle_id, "exam_date": date, "session": session, "room_no": str(room), "seat_no": int(seat),
+         "usn": usn, "course_code": code, "status": status}
+        for room, seat, usn, code, status in zip(df_alloc['RoomNo'], df_alloc['SeatNo'], df_alloc['USN'], df_alloc['Subject Code'], statuses)
+    ]
+
+def save_session_allotments(supabase, cycle_id, date, session, df_alloc, batch_size=WRITE_BATCH):
+    """
+    Replaces one session's stored plan with `df_alloc` in one transaction through the `replace_session_allotments` RPC.
+    Falls back to plain table calls when the function is not installed. Returns the number of seats written.
+    """
+    records = allotment_records(cycle_id, date, session, df_alloc)
+    try:
+        supabase.rpc(REPLACE_RPC, {"p_cycle_id": cycle_id, "p_exam_date": date, "p_session": session, "p_rows": records}).execute()
+        return len(records)
+    except Exception as e:
+        if not _is_missing_rpc(e): raise
+    return _save_session_local(supabase, cycle_id, date, session, records, batch_size)
+
+def _save_session_local(supabase, cycle_id, date, session, records, batch_size=WRITE_BATCH):
+    """
+    Stand-in for the RPC. Not atomic, so the new plan is upserted first under one allotted_at stamp and only then
+    are the session's other rows deleted: a failure part-way leaves the old plan (partly overwritten), never an empty session.
+    """
+    stamp = datetime.datetime.now(datetime.timezone.utc).isoformat()
+    for i in range(0, len(records), batch_size):
+        supabase.table(ALLOT_TABLE).upsert([{**r, "allotted_at": stamp} for r in records[i:i + batch_size]]).execute()
+    supabase.table(ALLOT_TABLE).delete().eq("cycle_id", cycle_id).eq("exam_date", date).eq("session", session).neq("allotted_at", stamp).execute()
+    return len(records)
+
+def update_allotment_status(supabase, cycle_id, date, session, absent_usns, malpractice_usns):
+    """Resets the session to PRESENT, then flags absentees and malpractice: a few set-based updates, not one per USN"""
+    supabase.table(ALLOT_TABLE).update({"status": "PRESENT"}).eq("cycle_id", cycle_id).eq("exam_date", date).eq("session", session).neq("status", "PRESENT").execute()
+    for status, usns in (("ABSENT", absent_usns), ("MALPRACTICE", malpractice_usns)):
+        usns = sorted(set(usns))
+        for i in range(0, len(usns), IN_CHUNK):
+            supabase.table(ALLOT_TABLE).update({"status": status}).eq("cycle_id", cycle_id).eq("exam_date", date).eq("session", session).in_("usn", usns[i:i + IN_CHUNK]).execute()
+
+# ==========================================
+# 2. READ BACK
+# ==========================================
+def load_session_allotments(supabase, cycle_id, date, session, roster=None):
+    """
+    One session's stored plan in room/seat order as an allocation frame (RoomNo, SeatNo, USN, Subject Code, Status).
+    With `roster` (fetch_exam_data output) Student Name, Branch and Subject Name are joined back in.
+    Returns an empty frame when nothing has been saved for the session.
+    """
+    rows, start = [], 0
+    while True:
+        res = supabase.table(ALLOT_TABLE).select(ALLOT_FIELDS).eq("cycle_id", cycle_id).eq("exam_date", date).eq("session", session)\
+            .order("room_no").order("seat_no").range(start, start + READ_PAGE - 1).execute()
+        if not res.data: break
+        rows.extend(res.data)
+        if len(res.data) < READ_PAGE: break
+        start += READ_PAGE
+    if not rows: return pd.DataFrame()
+
+    df = pd.DataFrame(rows).rename(columns=FRAME_COLUMNS)
+    if roster is not None and not roster.empty:
+        info = roster[['USN', 'Subject Code', 'Student Name', 'Branch', 'Subject Name']].drop_duplicates(['USN', 'Subject Code'])
+        df = df.merge(info, on=['USN', 'Subject Code'], how='left')
+    return df[[c for c in ['RoomNo', 'SeatNo', 'USN', 'Student Name', 'Branch', 'Subject Code', 'Subject Name', 'Status'] if c in df.columns]]
+
+def load_student_allotments(supabase, cycle_id, usn):
+    """Every seat a candidate holds in the cycle (uses the (cycle_id, usn) index)"""
+    res = supabase.table(ALLOT_TABLE).select("exam_date, session, " + ALLOT_FIELDS).eq("cycle_id", cycle_id).eq("usn", usn).order("exam_date").execute()
+    return res.data or []
@@ -0,0 +1,103 @@
+import collections
+import pandas as pd
+
+# --- CONFIGURATION ---
+# First-year papers written on OMR sheets are seated under their common (2xx) code
+SUBJECT_ALIASES = {'1BKSK109': '1BKSK209', '1BKBK109': '1BKBK209', '1BENG106': '1BENG206'}
+OMR_SUBJECTS = ['1BKSK209', '1BKBK209', '1BENG206']
+ALLOT_COLUMNS = ['RoomNo', 'SeatNo', 'USN', 'Student Name', 'Branch', 'Subject Code', 'Subject Name']
+
+# ==========================================
+# 1. ROSTER & ROOM ORDER
+# ==========================================
+def order_roster(df_students):
+    """
+    Roster in seating order: by allocation code, then largest branch first, then branch, then USN.
+    Works on a copy; the caller's frame is left untouched.
+    """
+    df = df_students.copy()
+    df['AllocCode'] = df['Subject Code'].replace(SUBJECT_ALIASES)
+    df['BranchSize'] = df.groupby(['AllocCode', 'Branch'], dropna=False)['USN'].transform('size')
+    return df.sort_values(['AllocCode', 'BranchSize', 'Branch', 'USN'], ascending=[True, False, True, True], kind='stable').reset_index(drop=True)
+
+def room_sequence(df_rooms):
+    """Rooms in room_no order as (room_no, capacity), then (None, 0) forever once they run out"""
+    rooms = df_rooms.sort_values('room_no', kind='stable')
+    yield from zip(rooms['room_no'].tolist(), (int(c) for c in rooms['capacity']))
+    while True:
+        yield None, 0
+
+# ==========================================
+# 2. SEAT ASSIGNMENT
+# ==========================================
+def allocate_seats(df_students, df_rooms):
+    """
+    Same layout as the original run_allocation, in linear time:
+    OMR subjects go first, each starting in a fresh room and filled seat by seat. The remaining subjects
+    are then seated two at a time per room (largest queues first), alternating A / B seat by seat.
+    Queues hold row positions (deques, popped from the left) and the output is gathered by array take.
+    """
+    if df_students.empty:
+        return pd.DataFrame()
+    df = order_roster(df_students)
+    groups = df.groupby('AllocCode', sort=False).indices
+    rooms = room_sequence(df_rooms)
+    pos_out, room_out, seat_out = [], [], []
+
+    room, capacity = next(rooms)
+
+    omr_codes = sorted(c for c in groups if c in OMR_SUBJECTS)
+    seat = 1
+    for code in omr_codes:
+        seat = 1
+        if room_out and room_out[-1] == room:
+            room, capacity = next(rooms)
+        for p in groups[code]:
+            if not room: break
+            if seat > capacity:
+                room, capacity = next(rooms)
+                seat = 1
+                if not room: break
+            pos_out.append(p); room_out.append(room); seat_out.append(seat)
+            seat += 1
+    if omr_codes and seat > 1:
+        room, capacity = next(rooms)
+
+    # Queue order follows the roster (allocation code order), then a stable sort by size
+    queues = {c: collections.deque(groups[c]) for c in pd.unique(df['AllocCode']) if c not in OMR_SUBJECTS}
+    active = sorted(queues, key=lambda k: len(queues[k]), reverse=True)
+
+    def refresh():
+        nonlocal active
+        active = [s for s in active if queues[s]]
+
+    while active and room:
+        subj_a = active[0]
+        subj_b = active[1] if len(active) > 1 else None
+        for seat in range(1, capacity + 1):
+            target = subj_a if seat % 2 != 0 else (subj_b or subj_a)
+            if target and not queues[target]:
+                target = subj_b if target == subj_a else subj_a
+            if target is None or not queues[target]:
+                refresh()
+                if not active: break
+                subj_a = active[0]
+                subj_b = active[1] if len(active) > 1 else None
+                target = subj_a
+
+            pos_out.append(queues[target].popleft()); room_out.append(room); seat_out.append(seat)
+
+            if not queues[target]:
+                refresh()
+                if active:
+                    subj_a = active[0]
+                    subj_b = active[1] if len(active) > 1 else None
+        room, capacity = next(rooms)
+
+    if not pos_out:
+        return pd.DataFrame()
+    picked = df.iloc[pos_out]
+    out = {'RoomNo': room_out, 'SeatNo': seat_out}
+    for col in ALLOT_COLUMNS[2:]:
+        out[col] = picked[col].to_numpy()
+    return pd.DataFrame(out, columns=ALLOT_COLUMNS)
@@ -0,0 +1,311 @@
+import re
+import time
+import heapq
+import random
+import pandas as pd
+from seating_engine import order_roster, OMR_SUBJECTS, ALLOT_COLUMNS
+
+# --- CONFIGURATION ---
+BENCH_WORDS = {"SINGLE": 1, "DOUBLE": 2, "TWIN": 2, "TRIPLE": 3, "THREE": 3, "FOUR": 4}
+DEFAULT_BENCH_SEATS = 1
+GREEDY_LOOKAHEAD = 8
+SEARCH_SECONDS = 0.5
+SWAP_TRIES = 40
+SWAP_WINDOW = 120         # swap partners are drawn from nearby seats, so blocks (and OMR rooms) stay together
+
+def bench_seats(bench_type):
+    """'Double', '2 Seater', 'TRIPLE' ... -> seats per bench (unknown or blank -> one seat per bench)"""
+    text = str(bench_type or "").strip().upper()
+    digits = re.search(r'\d+', text)
+    if digits: return max(1, int(digits.group()))
+    return next((n for word, n in BENCH_WORDS.items() if word in text), DEFAULT_BENCH_SEATS)
+
+# ==========================================
+# 1. CONSTRAINTS (pluggable)
+# ==========================================
+class Constraint:
+    """
+    Hooks a constraint may implement:
+    seats(room, seats) -> usable seats (layout rules), edge(a, b) -> penalty for neighbours a and b,
+    room(members) -> penalty for one room's candidates. Candidates are Roster row positions.
+    """
+    name = "constraint"
+    weight = 1.0
+
+    def bind(self, roster): self.roster = roster
+    def seats(self, room, seats): return seats
+    def edge(self, a, b): return 0.0
+    def room(self, members): return 0.0
+
+class SubjectAdjacency(Constraint):
+    """Neighbours (same bench, or same place on the bench in front) must not write the same paper"""
+    name = "Same subject adjacent"
+    def __init__(self, weight=10.0): self.weight = weight
+    def edge(self, a, b): return self.weight if self.roster.subj[a] == self.roster.subj[b] else 0.0
+
+class BranchAdjacency(Constraint):
+    """Softer: neighbours from the same branch"""
+    name = "Same branch adjacent"
+    def __init__(self, weight=1.0): self.weight = weight
+    def edge(self, a, b): return self.weight if self.roster.branch[a] == self.roster.branch[b] else 0.0
+
+class BenchCapacity(Constraint):
+    """At most `per_bench` candidates per bench, outer places first (e.g. 2 on a triple bench leaves the middle free)"""
+    name = "Bench capacity"
+    def __init__(self, per_bench=None): self.per_bench = per_bench
+    def seats(self, room, seats):
+        if not self.per_bench or self.per_bench >= room['bench']: return seats
+        keep = {0, room['bench'] - 1} if self.per_bench == 2 else set(range(self.per_bench))
+        return [s for s in seats if s['pos'] in keep]
+
+class RoomFill(Constraint):
+    """Uses at most `target` of each room's seats (spacing), still filling rooms in order"""
+    name = "Room fill target"
+    def __init__(self, target=1.0): self.target = target
+    def seats(self, room, seats):
+        return seats if self.target >= 1 else seats[:max(1, int(len(seats) * self.target))]
+
+class OMRGrouping(Constraint):
+    """
+    OMR-sheet papers share rooms with each other, not with descriptive papers (one collection per room).
+    The penalty grows with the smaller side of a mixed room, so moving candidates out one at a time is progress.
+    """
+    name = "OMR mixed with regular"
+    def __init__(self, weight=3.0, omr_subjects=OMR_SUBJECTS):
+        self.weight = weight
+        self.omr_subjects = set(omr_subjects)
+    def bind(self, roster):
+        super().bind(roster)
+        self.is_omr = [c in self.omr_subjects for c in roster.df['AllocCode']]
+    def room(self, members):
+        n_omr = sum(self.is_omr[m] for m in members)
+        return self.weight * min(n_omr, len(members) - n_omr)
+
+def default_constraints(per_bench=None, fill_target=1.0):
+    return [SubjectAdjacency(), BranchAdjacency(), OMRGrouping(), BenchCapacity(per_bench), RoomFill(fill_target)]
+
+# ==========================================
+# 2. MODEL
+# ==========================================
+class Roster:
+    """Candidates as parallel lists of small ints (fast comparisons in the inner loops)"""
+    def __init__(self, df):
+        self.df = df
+        codes = {c: i for i, c in enumerate(pd.unique(df['AllocCode']))}
+        branches = {b: i for i, b in enumerate(pd.unique(df['Branch'].fillna('')))}
+        self.subj = [codes[c] for c in df['AllocCode']]
+        self.branch = [branches[b] for b in df['Branch'].fillna('')]
+        self.omr = [c in OMR_SUBJECTS for c in df['AllocCode']]
+
+def build_slots(df_rooms, constraints, needed):
+    """
+    Every usable seat of the selected rooms, room by room in room_no order (as in the classic engine); the solver
+    fills them from the front, so spare seats are what lets it start a fresh room instead of mixing OMR and regular papers.
+    Returns (slots, neighbours): slot = {room, room_idx, seat_no}; neighbours[i] = earlier adjacent slots
+    (left on the same bench, same place on the bench in front).
+    """
+    rooms = df_rooms.sort_values('room_no', kind='stable').to_dict('records')
+    slots, neighbours = [], []
+    for r_idx, r in enumerate(rooms):
+        room = {"room_no": r['room_no'], "capacity": int(r['capacity']), "bench": bench_seats(r.get('bench_type'))}
+        seats = [{"seat_no": n + 1, "bench_idx": n // room['bench'], "pos": n % room['bench']} for n in range(room['capacity'])]
+        for c in constraints: seats = c.seats(room, seats)
+
+        by_place = {}
+        for s in seats:
+            idx = len(slots)
+            nbrs = [by_place[p] for p in ((s['bench_idx'], s['pos'] - 1), (s['bench_idx'] - 1, s['pos'])) if p in by_place]
+            by_place[(s['bench_idx'], s['pos'])] = idx
+            slots.append({"room": room['room_no'], "room_idx": r_idx, "seat_no": s['seat_no']})
+            neighbours.append(nbrs)
+    if len(slots) < needed:
+        raise ValueError(f"Selected rooms provide {len(slots)} usable seats under the current constraints; {needed} needed.")
+    return slots, neighbours
+
+# ==========================================
+# 3. SOLVER (greedy + local search)
+# ==========================================
+class SeatingSolver:
+    def __init__(self, constraints=None, search_seconds=SEARCH_SECONDS, seed=0):
+        self.constraints = constraints if constraints is not None else default_constraints()
+        self.edge_cs = [c for c in self.constraints if type(c).edge is not Constraint.edge]
+        self.room_cs = [c for c in self.constraints if type(c).room is not Constraint.room]
+        self.search_seconds = search_seconds
+        self.rng = random.Random(seed)
+
+    def _edge(self, a, b):
+        if a < 0 or b < 0: return 0.0
+        return sum(c.edge(a, b) for c in self.edge_cs)
+
+    def _room(self, members):
+        return sum(c.room(members) for c in self.room_cs) if members else 0.0
+
+    def _greedy(self, roster, slots, neighbours):
+        """
+        Seat by seat: take the biggest remaining (subject, branch) group (OMR first) that clashes with no earlier neighbour.
+        When the OMR papers run out part-way through a room and spare seats allow it, regular papers start in the next room.
+        """
+        n_slots = len(slots)
+        room_end, end = [0] * n_slots, n_slots
+        for i in range(n_slots - 1, -1, -1):
+            if i < n_slots - 1 and slots[i]['room_idx'] != slots[i + 1]['room_idx']: end = i + 1
+            room_end[i] = end
+        spare = n_slots - len(roster.subj)
+        room_omr = {}  # room_idx -> set of kinds (is OMR) seated so far
+        groups = {}
+        for i in range(len(roster.subj)):
+            groups.setdefault((roster.subj[i], roster.branch[i]), []).append(i)
+        for g in groups.values(): g.reverse()  # pop() from the end keeps roster (USN) order
+        heap = [(not roster.omr[m[-1]], -len(m), key) for key, m in groups.items()]
+        heapq.heapify(heap)
+
+        assign = [-1] * n_slots
+        slot = 0
+        while slot < n_slots and heap:
+            kinds = room_omr.setdefault(slots[slot]['room_idx'], set())
+            top_is_omr = not heap[0][0]
+            if kinds and top_is_omr not in kinds and room_end[slot] - slot <= spare:
+                spare -= room_end[slot] - slot
+                slot = room_end[slot]
+                continue
+            near = [assign[n] for n in neighbours[slot] if assign[n] >= 0]
+            popped, choice = [], None
+            while heap and len(popped) < GREEDY_LOOKAHEAD and (not popped or heap[0][0] == popped[0][0]):  # OMR and regular never interleave
+                popped.append(heapq.heappop(heap))
+                key = popped[-1][2]
+                if all(roster.subj[m] != key[0] and roster.branch[m] != key[1] for m in near):
+                    choice = len(popped) - 1; break
+            if choice is None:
+                # nothing clash-free in reach: settle for no subject clash, else the biggest group
+                choice = next((i for i, p in enumerate(popped) if all(roster.subj[m] != p[2][0] for m in near)), 0)
+            for i, p in enumerate(popped):
+                if i == choice:
+                    members = groups[p[2]]
+                    assign[slot] = members.pop()
+                    kinds.add(roster.omr[assign[slot]])
+                    if members: heapq.heappush(heap, (p[0], -len(members), p[2]))
+                else:
+                    heapq.heappush(heap, p)
+            slot += 1
+        return assign
+
+    def _local_search(self, assign, slots, neighbours):
+        """
+        Swaps (or moves into empty seats) while the total penalty drops, within the time budget:
+        first seats with a neighbour clash, then candidates in rooms with a room-level penalty.
+        Partners are nearby seats within the used block, so no extra room is opened.
+        """
+        adj = [list(n) for n in neighbours]
+        for i, nbrs in enumerate(neighbours):
+            for j in nbrs: adj[j].append(i)
+        room_of = [s['room_idx'] for s in slots]
+        room_slots = {}
+        for i, r in enumerate(room_of): room_slots.setdefault(r, []).append(i)
+
+        def slot_cost(i):
+            return sum(self._edge(assign[i], assign[j]) for j in adj[i])
+
+        def room_cost(r):
+            return self._room([assign[i] for i in room_slots[r] if assign[i] >= 0]) if self.room_cs else 0.0
+
+        def try_swaps(s, partners=None):
+            """Tries SWAP_TRIES partners for seat s (nearby seats by default); keeps the first swap that lowers the penalty"""
+            for _ in range(SWAP_TRIES):
+                t = self.rng.choice(partners) if partners else min(n - 1, max(0, s + self.rng.randint(-SWAP_WINDOW, SWAP_WINDOW)))
+                if t == s or assign[t] == assign[s]: continue
+                rooms = {room_of[s], room_of[t]} if room_of[s] != room_of[t] else set()
+                before = slot_cost(s) + slot_cost(t) - (self._edge(assign[s], assign[t]) if t in adj[s] else 0) + sum(room_cost(r) for r in rooms)
+                assign[s], assign[t] = assign[t], assign[s]
+                after = slot_cost(s) + slot_cost(t) - (self._edge(assign[s], assign[t]) if t in adj[s] else 0) + sum(room_cost(r) for r in rooms)
+                if after < before: return t
+                assign[s], assign[t] = assign[t], assign[s]
+            return None
+
+        deadline = time.perf_counter() + self.search_seconds
+        n = max(i for i, a in enumerate(assign) if a >= 0) + 1
+        hot = [i for i in range(n) if slot_cost(i) > 0]
+        while hot and time.perf_counter() < deadline:
+            s = hot.pop(self.rng.randrange(len(hot)))
+            if slot_cost(s) == 0: continue
+            t = try_swaps(s)
+            if t is not None:
+                hot.extend(j for j in adj[t] if slot_cost(j) > 0)
+
+        # room repair: partners are the other penalised rooms' seats and the empty seats left inside the used block
+        hot_rooms = [r for r in dict.fromkeys(room_of[:n]) if room_cost(r) > 0]
+        empty = [i for i in range(n) if assign[i] < 0]
+        for r in hot_rooms:
+            partners = [i for q in hot_rooms if q != r for i in room_slots[q] if i < n] + empty
+            members = [i for i in room_slots[r] if i < n and assign[i] >= 0]
+            self.rng.shuffle(members)
+            for s in members:
+                if room_cost(r) == 0 or time.perf_counter() >= deadline: break
+                try_swaps(s, partners)
+        return assign
+
+    def report(self, assign, slots, neighbours):
+        """Remaining penalty per constraint name"""
+        out = {c.name: 0 for c in self.edge_cs + self.room_cs}
+        for i, nbrs in enumerate(neighbours):
+            for j in nbrs:
+                if assign[i] >= 0 and assign[j] >= 0:
+                    for c in self.edge_cs:
+                        if c.edge(assign[i], assign[j]): out[c.name] += 1
+        rooms = {}
+        for i, s in enumerate(slots):
+            if assign[i] >= 0: rooms.setdefault(s['room_idx'], []).append(assign[i])
+        for members in rooms.values():
+            for c in self.room_cs:
+                if c.room(members): out[c.name] += 1
+        return out
+
+    def solve(self, df_students, df_rooms):
+        """Returns (allocation frame in the classic column layout, {constraint: violations left})"""
+        if df_students.empty:
+            return pd.DataFrame(), {}
+        df = order_roster(df_students)
+        roster = Roster(df)
+        for c in self.constraints: c.bind(roster)
+
+        slots, neighbours = build_slots(df_rooms, self.constraints, len(df))
+        assign = self._greedy(roster, slots, neighbours)
+        if self.search_seconds > 0:
+            assign = self._local_search(assign, slots, neighbours)
+
+        used = [i for i, a in enumerate(assign) if a >= 0]
+        picked = df.iloc[[assign[i] for i in used]]
+        out = {'RoomNo': [slots[i]['room'] for i in used], 'SeatNo': [slots[i]['seat_no'] for i in used]}
+        for col in ALLOT_COLUMNS[2:]:
+            out[col] = picked[col].to_numpy()
+        return pd.DataFrame(out, columns=ALLOT_COLUMNS), self.report(assign, slots, neighbours)
+
+def solve_seating(df_students, df_rooms, per_bench=None, fill_target=1.0, search_seconds=SEARCH_SECONDS):
+    return SeatingSolver(default_constraints(per_bench, fill_target), search_seconds).solve(df_students, df_rooms)
+
+# ==========================================
+# 4. BENCHMARK (python seating_solver.py)
+# ==========================================
+def synthetic_roster(n, n_subjects=12, n_branches=8, omr_share=0.1, seed=1):
+    rng = random.Random(seed)
+    subjects = [f"SUB{i:02d}" for i in range(n_subjects)]
+    branches = [f"BR{i}" for i in range(n_branches)]
+    rows = []
+    for i in range(n):
+        code = rng.choice(OMR_SUBJECTS) if rng.random() < omr_share else rng.choice(subjects)
+        rows.append({"USN": f"1AM{i:05d}", "Student Name": f"Student {i}", "Branch": rng.choice(branches),
+                     "Subject Code": code, "Subject Name": code})
+    return pd.DataFrame(rows)
+
+def synthetic_rooms(seats_needed, capacity=40, bench_type="Double"):
+    count = seats_needed // capacity + 2
+    return pd.DataFrame({"room_no": [f"R{i:03d}" for i in range(count)], "capacity": capacity, "bench_type": bench_type})
+
+if __name__ == "__main__":
+    for n in (1000, 5000, 10000):
+        roster = synthetic_roster(n)
+        rooms = synthetic_rooms(n)
+        for budget in (0.0, SEARCH_SECONDS):
+            started = time.perf_counter()
+            alloc, left = solve_seating(roster, rooms, search_seconds=budget)
+            took = time.perf_counter() - started
+            print(f"{n:>6} candidates | search {budget:.1f}s | {took:.2f}s total | rooms {alloc['RoomNo'].nunique()} | left {left}")
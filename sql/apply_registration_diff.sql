@@ -0,0 +1,33 @@
+-- Transactional apply for the bulk registration upload (coe_registrations.py -> registration_sync.py).
+-- Rows are typed through the table's own row type, so column types stay in one place.
+create index if not exists course_registrations_cycle_usn_course_idx
+    on course_registrations (cycle_id, usn, course_code);
+
+create or replace function apply_registration_diff(p_cycle_id bigint, p_inserts jsonb, p_updates jsonb, p_deletes jsonb)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_ins int := 0;
+    v_upd int := 0;
+    v_del int := 0;
+begin
+    insert into course_registrations (cycle_id, usn, course_code, academic_year, semester_type, semester)
+    select p_cycle_id, r.usn, r.course_code, r.academic_year, r.semester_type, r.semester
+    from jsonb_populate_recordset(null::course_registrations, coalesce(p_inserts, '[]'::jsonb)) r;
+    get diagnostics v_ins = row_count;
+
+    update course_registrations cr
+    set academic_year = r.academic_year, semester_type = r.semester_type, semester = r.semester
+    from jsonb_populate_recordset(null::course_registrations, coalesce(p_updates, '[]'::jsonb)) r
+    where cr.cycle_id = p_cycle_id and cr.usn = r.usn and cr.course_code = r.course_code;
+    get diagnostics v_upd = row_count;
+
+    delete from course_registrations cr
+    using jsonb_populate_recordset(null::course_registrations, coalesce(p_deletes, '[]'::jsonb)) r
+    where cr.cycle_id = p_cycle_id and cr.usn = r.usn and cr.course_code = r.course_code;
+    get diagnostics v_del = row_count;
+
+    return jsonb_build_object('inserted', v_ins, 'updated', v_upd, 'deleted', v_del);
+end;
+$$;
@@ -0,0 +1,29 @@
+-- Change watermarks for differential backups (backup_engine.py).
+-- Tables with an updated_at column are exported as "rows changed since the last backup";
+-- marks_audit_log is append-only and uses its existing created_at instead.
+create or replace function set_updated_at()
+returns trigger
+language plpgsql
+as $$
+begin
+    new.updated_at := now();
+    return new;
+end;
+$$;
+
+do $$
+declare
+    t text;
+begin
+    foreach t in array array['master_branches', 'master_courses', 'master_students', 'master_fees', 'exam_cycles',
+                             'exam_timetable', 'course_registrations', 'student_results']
+    loop
+        execute format('alter table %I add column if not exists updated_at timestamptz not null default now()', t);
+        execute format('create index if not exists %I on %I (updated_at)', t || '_updated_at_idx', t);
+        execute format('drop trigger if exists %I on %I', t || '_set_updated_at', t);
+        execute format('create trigger %I before update on %I for each row execute function set_updated_at()', t || '_set_updated_at', t);
+    end loop;
+end;
+$$;
+
+create index if not exists marks_audit_log_created_at_idx on marks_audit_log (created_at);
@@ -0,0 +1,81 @@
+-- Evaluation-bundle dummy codes (coe_exam_day.py -> dummy_codes.py, decoded in coe_results.py).
+-- Codes are a keyed Feistel permutation of a serial number; the key and the serial counter live here,
+-- and every issued code is mapped back to its candidate so the decoder needs no spreadsheet.
+create table if not exists dummy_code_keys (
+    scope       text primary key,
+    secret      text not null,
+    next_serial bigint not null default 0
+);
+
+create table if not exists dummy_code_map (
+    dummy_id    text primary key,
+    cycle_id    bigint not null,
+    exam_date   text not null,
+    session     text not null,
+    usn         text not null,
+    course_code text not null,
+    bundle_id   text,
+    room_no     text,
+    status      text not null default 'PRESENT',
+    coded_at    timestamptz not null default now(),
+    unique (cycle_id, exam_date, session, usn, course_code)
+);
+
+create index if not exists dummy_code_map_bundle_idx on dummy_code_map (cycle_id, bundle_id);
+
+-- The app signs staff in on its shared client (auth.py), so these calls run as `authenticated` with the user's JWT.
+-- CoE staff are the master_stakeholders roles that see the Administration pages (app.py); the service role always passes.
+create or replace function is_coe_staff()
+returns boolean
+language sql
+stable
+security definer
+set search_path = public
+as $$
+    select auth.role() = 'service_role'
+        or exists (select 1 from master_stakeholders s
+                   where lower(s.email) = lower(auth.jwt() ->> 'email') and s.role in ('Admin', 'COE', 'Super User'));
+$$;
+
+revoke execute on function is_coe_staff() from public, anon;
+grant execute on function is_coe_staff() to authenticated;
+
+-- The coding key and the code -> USN map must never reach evaluators. The key table has no policies (only the
+-- RPC below touches it); CoE staff may read and write the code map, everyone else gets nothing.
+alter table dummy_code_keys enable row level security;
+alter table dummy_code_map enable row level security;
+
+drop policy if exists dummy_code_map_coe_staff on dummy_code_map;
+create policy dummy_code_map_coe_staff on dummy_code_map
+    for all to authenticated
+    using (is_coe_staff())
+    with check (is_coe_staff());
+
+-- Hands out p_count consecutive serials under a row lock (safe with several sessions coding at once)
+create or replace function reserve_dummy_serials(p_scope text, p_count int)
+returns table (start_serial bigint, secret text)
+language plpgsql
+security definer
+set search_path = public
+as $$
+begin
+    if not is_coe_staff() then
+        raise exception 'Only CoE staff can issue dummy codes' using errcode = '42501';
+    end if;
+
+    -- 64 hex digits from two core gen_random_uuid() calls (no pgcrypto, so the pinned search_path is enough)
+    insert into dummy_code_keys (scope, secret) values (p_scope, replace(gen_random_uuid()::text || gen_random_uuid()::text, '-', ''))
+    on conflict (scope) do nothing;
+
+    return query
+    update dummy_code_keys k
+    set next_serial = k.next_serial + p_count
+    where k.scope = p_scope
+    returning k.next_serial - p_count, k.secret;
+end;
+$$;
+
+-- Functions are executable by PUBLIC by default; this one returns the coding key, so anon is shut out and
+-- signed-in callers still pass the is_coe_staff() check above
+revoke execute on function reserve_dummy_serials(text, int) from public, anon;
+grant execute on function reserve_dummy_serials(text, int) to authenticated;
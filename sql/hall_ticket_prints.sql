@@ -0,0 +1,8 @@
+-- Per-student fingerprint of the last printed hall-ticket set (used by "Reprint Changes" in coe_control.py)
+create table if not exists hall_ticket_prints (
+    cycle_id    bigint not null,
+    usn         text not null,
+    fingerprint text not null,
+    printed_at  timestamptz not null default now(),
+    primary key (cycle_id, usn)
+);
@@ -0,0 +1,121 @@
+-- Set-based Temp -> Official USN migration (main.py "USN Migration" -> usn_migration.py).
+-- One call moves a whole batch in a single transaction; every moved student is journalled so the
+-- batch can be undone with rollback_usn_migration(batch_id).
+create table if not exists usn_migration_journal (
+    batch_id       text not null,
+    old_usn        text not null,
+    new_usn        text not null,
+    student_row    jsonb not null,
+    migrated_at    timestamptz not null default now(),
+    rolled_back_at timestamptz,
+    primary key (batch_id, old_usn)
+);
+
+create index if not exists course_registrations_usn_idx on course_registrations (usn);
+create index if not exists student_results_usn_idx on student_results (usn);
+
+-- marks_audit_log is optional (older installs run without it, as in usn_migration.OPTIONAL_TABLES):
+-- every statement on it is guarded and dynamic, so both functions still compile and run without the table
+do $$
+begin
+    if to_regclass('marks_audit_log') is not null then
+        execute 'create index if not exists marks_audit_log_usn_idx on marks_audit_log (usn)';
+    end if;
+end;
+$$;
+
+create or replace function migrate_usns(p_batch_id text, p_pairs jsonb, p_dry_run boolean default false)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_bad jsonb;
+    v_counts jsonb;
+    v_audit bigint := 0;
+begin
+    create temp table _usn_map on commit drop as
+    select distinct upper(trim(old_usn)) as old_usn, upper(trim(new_usn)) as new_usn
+    from jsonb_to_recordset(coalesce(p_pairs, '[]'::jsonb)) as m(old_usn text, new_usn text);
+
+    -- Pairs that cannot move: unknown temp USN, official USN already taken
+    select coalesce(jsonb_agg(jsonb_build_object('old_usn', m.old_usn, 'new_usn', m.new_usn, 'issue',
+               case when s_old.usn is null then 'NOT_FOUND' else 'TARGET_EXISTS' end)), '[]'::jsonb)
+    into v_bad
+    from _usn_map m
+    left join master_students s_old on s_old.usn = m.old_usn
+    left join master_students s_new on s_new.usn = m.new_usn
+    where s_old.usn is null or s_new.usn is not null;
+
+    delete from _usn_map m
+    where not exists (select 1 from master_students s where s.usn = m.old_usn)
+       or exists (select 1 from master_students s where s.usn = m.new_usn);
+
+    select jsonb_build_object(
+        'master_students', (select count(*) from _usn_map),
+        'course_registrations', (select count(*) from course_registrations t join _usn_map m on t.usn = m.old_usn),
+        'student_results', (select count(*) from student_results t join _usn_map m on t.usn = m.old_usn)
+    ) into v_counts;
+    if to_regclass('marks_audit_log') is not null then
+        execute 'select count(*) from marks_audit_log t join _usn_map m on t.usn = m.old_usn' into v_audit;
+    end if;
+    v_counts := v_counts || jsonb_build_object('marks_audit_log', v_audit);
+
+    if p_dry_run then
+        return jsonb_build_object('counts', v_counts, 'skipped', v_bad, 'dry_run', true);
+    end if;
+
+    insert into usn_migration_journal (batch_id, old_usn, new_usn, student_row)
+    select p_batch_id, m.old_usn, m.new_usn, to_jsonb(s)
+    from master_students s join _usn_map m on s.usn = m.old_usn;
+
+    -- New student rows first so child rows always have a parent to point at
+    insert into master_students
+    select (jsonb_populate_record(null::master_students,
+            to_jsonb(s) || jsonb_build_object('usn', m.new_usn, 'admission_number', m.old_usn))).*
+    from master_students s join _usn_map m on s.usn = m.old_usn;
+
+    update course_registrations t set usn = m.new_usn from _usn_map m where t.usn = m.old_usn;
+    update student_results t set usn = m.new_usn from _usn_map m where t.usn = m.old_usn;
+    if to_regclass('marks_audit_log') is not null then
+        execute 'update marks_audit_log t set usn = m.new_usn from _usn_map m where t.usn = m.old_usn';
+    end if;
+
+    delete from master_students s using _usn_map m where s.usn = m.old_usn;
+
+    return jsonb_build_object('counts', v_counts, 'skipped', v_bad, 'dry_run', false);
+end;
+$$;
+
+create or replace function rollback_usn_migration(p_batch_id text)
+returns jsonb
+language plpgsql
+as $$
+declare
+    v_count int;
+begin
+    create temp table _usn_undo on commit drop as
+    select old_usn, new_usn, student_row
+    from usn_migration_journal
+    where batch_id = p_batch_id and rolled_back_at is null;
+
+    -- Restore the journalled rows as they were before the move
+    insert into master_students
+    select (jsonb_populate_record(null::master_students, j.student_row)).*
+    from _usn_undo j
+    on conflict (usn) do nothing;
+
+    update course_registrations t set usn = j.old_usn from _usn_undo j where t.usn = j.new_usn;
+    update student_results t set usn = j.old_usn from _usn_undo j where t.usn = j.new_usn;
+    if to_regclass('marks_audit_log') is not null then
+        execute 'update marks_audit_log t set usn = j.old_usn from _usn_undo j where t.usn = j.new_usn';
+    end if;
+
+    delete from master_students s using _usn_undo j where s.usn = j.new_usn;
+
+    update usn_migration_journal set rolled_back_at = now()
+    where batch_id = p_batch_id and rolled_back_at is null;
+    get diagnostics v_count = row_count;
+
+    return jsonb_build_object('restored', v_count);
+end;
+$$;
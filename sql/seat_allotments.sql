@@ -0,0 +1,37 @@
+-- Persisted seating plan, one row per candidate per exam session (coe_exam_day.py -> seat_allotments.py)
+create table if not exists seat_allotments (
+    cycle_id    bigint not null,
+    exam_date   text not null,
+    session     text not null,
+    room_no     text not null,
+    seat_no     int not null,
+    usn         text not null,
+    course_code text not null,
+    status      text not null default 'PRESENT',
+    allotted_at timestamptz not null default now(),
+    primary key (cycle_id, exam_date, session, usn, course_code)
+);
+
+-- Session read-back in seat order (documents, absentee updates) and per-candidate lookups
+create index if not exists seat_allotments_session_idx on seat_allotments (cycle_id, exam_date, session, room_no, seat_no);
+create index if not exists seat_allotments_cycle_usn_idx on seat_allotments (cycle_id, usn);
+
+-- Swaps a session's plan in one transaction (seat_allotments.save_session_allotments), so readers never see it half written
+create or replace function replace_session_allotments(p_cycle_id bigint, p_exam_date text, p_session text, p_rows jsonb)
+returns int
+language plpgsql
+as $$
+declare
+    v_ins int := 0;
+begin
+    delete from seat_allotments
+    where cycle_id = p_cycle_id and exam_date = p_exam_date and session = p_session;
+
+    insert into seat_allotments (cycle_id, exam_date, session, room_no, seat_no, usn, course_code, status)
+    select p_cycle_id, p_exam_date, p_session, r.room_no, r.seat_no, r.usn, r.course_code, coalesce(r.status, 'PRESENT')
+    from jsonb_populate_recordset(null::seat_allotments, coalesce(p_rows, '[]'::jsonb)) r;
+    get diagnostics v_ins = row_count;
+
+    return v_ins;
+end;
+$$;
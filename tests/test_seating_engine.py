@@ -0,0 +1,171 @@
+import random
+import pandas as pd
+import pytest
+from seating_engine import allocate_seats, ALLOT_COLUMNS
+
+# ==========================================
+# REFERENCE: run_allocation as it was in coe_exam_day.py before seating_engine (frozen, do not edit)
+# ==========================================
+def reference_allocation(df_students, df_rooms):
+    subj_map = {
+        '1BKSK109': '1BKSK209', '1BKBK109': '1BKBK209',
+        '1BENG106': '1BENG206'
+    }
+    df_students['AllocCode'] = df_students['Subject Code'].replace(subj_map)
+
+    branch_counts = df_students.groupby(['AllocCode', 'Branch']).size().to_dict()
+    df_students['BranchSize'] = df_students.apply(lambda x: branch_counts[(x['AllocCode'], x['Branch'])], axis=1)
+    
+    df_students = df_students.sort_values(['AllocCode', 'BranchSize', 'Branch', 'USN'], ascending=[True, False, True, True])
+
+    OMR_SUBJECTS = ['1BKSK209', '1BKBK209', '1BENG206']
+    allotment_rows = []
+    
+    df_rooms = df_rooms.sort_values('room_no')
+    rooms_list = df_rooms.to_dict('records')
+    room_idx = 0
+
+    def get_next_room():
+        nonlocal room_idx
+        if room_idx < len(rooms_list):
+            r = rooms_list[room_idx]
+            room_idx += 1
+            return r['room_no'], int(r['capacity'])
+        return None, 0
+
+    current_room_no, current_capacity = get_next_room()
+
+    df_omr = df_students[df_students['AllocCode'].isin(OMR_SUBJECTS)]
+    if not df_omr.empty:
+        for code in sorted(df_omr['AllocCode'].unique()):
+            code_df = df_omr[df_omr['AllocCode'] == code]
+            current_seat = 1
+            
+            if (allotment_rows and allotment_rows[-1]['RoomNo'] == current_room_no) or current_seat > 1:
+                current_room_no, current_capacity = get_next_room()
+                current_seat = 1
+
+            students = code_df.to_dict('records')
+            while students:
+                if not current_room_no: break
+                if current_seat > current_capacity:
+                    current_room_no, current_capacity = get_next_room()
+                    current_seat = 1
+                    if not current_room_no: break
+
+                s = students.pop(0)
+                allotment_rows.append({
+                    'RoomNo': current_room_no, 'SeatNo': current_seat,
+                    'USN': s['USN'], 'Student Name': s['Student Name'],
+                    'Branch': s['Branch'], 'Subject Code': s['Subject Code'],
+                    'Subject Name': s['Subject Name']
+                })
+                current_seat += 1
+
+        if current_seat > 1:
+            current_room_no, current_capacity = get_next_room()
+
+    df_reg = df_students[~df_students['AllocCode'].isin(OMR_SUBJECTS)]
+    if not df_reg.empty:
+        subj_queues = {}
+        for code in df_reg['AllocCode'].unique():
+            subj_queues[code] = df_reg[df_reg['AllocCode'] == code].to_dict('records')
+
+        active_subjs = sorted(subj_queues.keys(), key=lambda k: len(subj_queues[k]), reverse=True)
+
+        while active_subjs and current_room_no:
+            subj_A = active_subjs[0]
+            subj_B = active_subjs[1] if len(active_subjs) > 1 else None
+
+            for seat in range(1, current_capacity + 1):
+                target_subj = subj_A if seat % 2 != 0 else (subj_B or subj_A)
+
+                if target_subj and not subj_queues[target_subj]:
+                    target_subj = subj_B if target_subj == subj_A else subj_A
+
+                if target_subj is None or not subj_queues[target_subj]:
+                    active_subjs = [s for s in active_subjs if subj_queues[s]]
+                    if not active_subjs: break
+                    subj_A = active_subjs[0]
+                    subj_B = active_subjs[1] if len(active_subjs) > 1 else None
+                    target_subj = subj_A 
+
+                student = subj_queues[target_subj].pop(0)
+                allotment_rows.append({
+                    'RoomNo': current_room_no, 'SeatNo': seat,
+                    'USN': student['USN'], 'Student Name': student['Student Name'],
+                    'Branch': student['Branch'], 'Subject Code': student['Subject Code'],
+                    'Subject Name': student['Subject Name']
+                })
+
+                if not subj_queues[target_subj]:
+                    active_subjs = [s for s in active_subjs if subj_queues[s]]
+                    if active_subjs:
+                        subj_A = active_subjs[0]
+                        subj_B = active_subjs[1] if len(active_subjs) > 1 else None
+
+            current_room_no, current_capacity = get_next_room()
+
+    return pd.DataFrame(allotment_rows)
+
+# ==========================================
+# PARITY
+# ==========================================
+OMR_CODES = ['1BKSK109', '1BKSK209', '1BKBK109', '1BKBK209', '1BENG106', '1BENG206']
+REGULAR_CODES = ['21CS51', '21CS52', '21ME53', '21EC54', '21CV55', 'MBA101']
+BRANCHES = ['CS', 'ME', 'EC', 'CV', 'IS']
+
+def random_roster(rng, n):
+    codes = rng.sample(OMR_CODES, rng.randint(0, 3)) + rng.sample(REGULAR_CODES, rng.randint(0, 5))
+    codes = codes or [rng.choice(REGULAR_CODES)]
+    rows = []
+    for i in range(n):
+        code = rng.choice(codes)
+        rows.append({"USN": f"1AM{i:05d}", "Student Name": f"Student {i}", "Branch": rng.choice(BRANCHES),
+                     "Subject Code": code, "Subject Name": f"{code} title"})
+    rng.shuffle(rows)
+    return pd.DataFrame(rows)
+
+def random_rooms(rng, seats_needed, shortage=False):
+    caps, total = [], 0
+    target = seats_needed // 2 if shortage else seats_needed + rng.randint(0, 40)
+    while total < target or not caps:
+        cap = rng.choice([0, 1, 3, 7, 15, 20, 24, 31, 40])
+        caps.append(cap); total += cap
+    order = list(range(len(caps)))
+    rng.shuffle(order)
+    return pd.DataFrame({"room_no": [f"R{i:03d}" for i in order], "capacity": caps})
+
+def assert_same(df_students, df_rooms):
+    expected = reference_allocation(df_students.copy(), df_rooms.copy())
+    actual = allocate_seats(df_students, df_rooms)
+    if expected.empty:
+        assert actual.empty
+        return
+    pd.testing.assert_frame_equal(actual.reset_index(drop=True), expected[ALLOT_COLUMNS].reset_index(drop=True), check_dtype=False)
+
+@pytest.mark.parametrize("seed", range(200))
+def test_matches_reference_on_random_sessions(seed):
+    rng = random.Random(seed)
+    roster = random_roster(rng, rng.randint(1, 250))
+    assert_same(roster, random_rooms(rng, len(roster)))
+
+@pytest.mark.parametrize("seed", range(50))
+def test_matches_reference_when_rooms_run_out(seed):
+    rng = random.Random(1000 + seed)
+    roster = random_roster(rng, rng.randint(20, 200))
+    assert_same(roster, random_rooms(rng, len(roster), shortage=True))
+
+def test_omr_only_and_zero_capacity_rooms():
+    rng = random.Random(7)
+    roster = pd.DataFrame([{"USN": f"1AM{i:05d}", "Student Name": "S", "Branch": rng.choice(BRANCHES),
+                            "Subject Code": rng.choice(OMR_CODES), "Subject Name": "T"} for i in range(61)])
+    rooms = pd.DataFrame({"room_no": ["A", "B", "C", "D", "E", "F"], "capacity": [0, 13, 0, 9, 25, 31]})
+    assert_same(roster, rooms)
+
+def test_input_frame_is_not_modified():
+    rng = random.Random(3)
+    roster = random_roster(rng, 40)
+    before = roster.copy()
+    allocate_seats(roster, random_rooms(rng, 40))
+    pd.testing.assert_frame_equal(roster, before)
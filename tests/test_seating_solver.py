@@ -0,0 +1,58 @@
+import os
+import time
+import pandas as pd
+import pytest
+from seating_solver import (solve_seating, synthetic_roster, synthetic_rooms, bench_seats, OMRGrouping, Roster,
+                            SEARCH_SECONDS)
+from seating_engine import order_roster
+
+# ==========================================
+# HARD CONSTRAINTS (never traded against penalties)
+# ==========================================
+def assert_hard_constraints(alloc, roster, rooms, per_bench=None):
+    assert sorted(alloc['USN']) == sorted(roster['USN'])  # everyone seated, exactly once
+    assert not alloc.duplicated(['RoomNo', 'SeatNo']).any()
+
+    by_room = rooms.set_index('room_no')
+    for room_no, seated in alloc.groupby('RoomNo'):
+        capacity, bench = int(by_room.at[room_no, 'capacity']), bench_seats(by_room.at[room_no, 'bench_type'])
+        assert seated['SeatNo'].between(1, capacity).all()
+        if per_bench and per_bench < bench:
+            per_seat_bench = ((seated['SeatNo'] - 1) // bench).value_counts()
+            assert (per_seat_bench <= per_bench).all()
+
+def test_5000_candidates_keep_hard_constraints():
+    roster, rooms = synthetic_roster(5000, seed=7), synthetic_rooms(5000)
+    alloc, left = solve_seating(roster, rooms, search_seconds=SEARCH_SECONDS)
+    assert_hard_constraints(alloc, roster, rooms)
+    assert set(left) >= {"Same subject adjacent", "OMR mixed with regular"}
+
+# Wall-clock bound: depends on the machine, so it only runs on request (SEATING_BENCHMARK=1 python -m pytest)
+@pytest.mark.skipif(not os.environ.get("SEATING_BENCHMARK"), reason="benchmark; set SEATING_BENCHMARK=1 to run")
+def test_5000_candidates_within_a_second():
+    roster, rooms = synthetic_roster(5000, seed=7), synthetic_rooms(5000)
+    started = time.perf_counter()
+    solve_seating(roster, rooms, search_seconds=SEARCH_SECONDS)
+    took = time.perf_counter() - started
+    assert took < 1.0, f"5000 candidates took {took:.2f}s"
+
+def test_triple_benches_with_two_per_bench():
+    roster = synthetic_roster(600, seed=3)
+    rooms = synthetic_rooms(900, capacity=45, bench_type="Triple")
+    alloc, _ = solve_seating(roster, rooms, per_bench=2, search_seconds=0.1)
+    assert_hard_constraints(alloc, roster, rooms, per_bench=2)
+    assert not (((alloc['SeatNo'] - 1) % 3) == 1).any()  # middle place stays free
+
+def test_too_few_seats_is_an_error():
+    roster = synthetic_roster(200, seed=5)
+    rooms = pd.DataFrame({"room_no": ["R1", "R2"], "capacity": [60, 60], "bench_type": "Double"})
+    with pytest.raises(ValueError):
+        solve_seating(roster, rooms, search_seconds=0.0)
+
+def test_omr_grouping_uses_its_own_subject_list():
+    df = order_roster(synthetic_roster(50, seed=2))
+    grouping = OMRGrouping(weight=1.0, omr_subjects={"SUB00"})
+    grouping.bind(Roster(df))
+    members = list(range(len(df)))
+    n_sub00 = int((df['AllocCode'] == "SUB00").sum())
+    assert grouping.room(members) == min(n_sub00, len(df) - n_sub00)
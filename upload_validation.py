@@ -0,0 +1,204 @@
+from dataclasses import dataclass, field
+import numpy as np
+import pandas as pd
+
+# --- CONFIGURATION ---
+UPLOAD_CHUNK_ROWS = 50000
+ISSUE_COLUMNS = ["row", "usn", "course_code", "issue", "severity", "detail"]
+REG_UPLOAD_COLUMNS = ['usn', 'course_code', 'academic_year', 'semester_type', 'semester']
+SEE_STATUS_TOKENS = {'AB': 'ABSENT', 'ABSENT': 'ABSENT', 'MP': 'MALPRACTICE', 'MAL': 'MALPRACTICE', 'WH': 'WITHHELD'}
+
+@dataclass
+class ValidationReport:
+    """Outcome of validating one upload: rows safe to write plus every problem found, by sheet row"""
+    valid: pd.DataFrame
+    issues: pd.DataFrame = field(default_factory=lambda: pd.DataFrame(columns=ISSUE_COLUMNS))
+    total_rows: int = 0
+
+    @property
+    def errors(self):
+        return self.issues[self.issues['severity'] == 'ERROR']
+
+    @property
+    def warnings(self):
+        return self.issues[self.issues['severity'] == 'WARNING']
+
+    @property
+    def ok(self):
+        return self.errors.empty
+
+    def count(self, issue):
+        return int((self.issues['issue'] == issue).sum())
+
+    def summary(self):
+        return self.issues.groupby(['severity', 'issue']).size().to_dict() if not self.issues.empty else {}
+
+    def records(self, **constants):
+        """JSON-ready dicts (NaN -> None) with any constant columns such as cycle_id added"""
+        df = self.valid.assign(**constants) if constants else self.valid
+        return df.astype(object).where(df.notna(), None).to_dict('records')
+
+# ==========================================
+# 1. VECTOR HELPERS
+# ==========================================
+def find_column(df, candidates):
+    cols = [c.upper().strip() for c in df.columns]
+    for candidate in candidates:
+        if candidate.upper() in cols:
+            return df.columns[cols.index(candidate.upper())]
+    return None
+
+def norm_key(series):
+    """strip + upper over a whole column, blanks / NaN -> ''"""
+    return series.astype("string").str.strip().str.upper().fillna("")
+
+def coerce_numeric(series):
+    """Column-wise float coercion; '-', blanks and junk become NaN"""
+    return pd.to_numeric(series.astype("string").str.strip().replace({"-": None, "": None}), errors='coerce')
+
+def read_upload_chunks(file, chunksize=UPLOAD_CHUNK_ROWS):
+    """Reads a CSV upload as strings in chunks, tagging each row with its spreadsheet row number"""
+    if hasattr(file, "seek"): file.seek(0)
+    offset = 0
+    for chunk in pd.read_csv(file, dtype=str, chunksize=chunksize):
+        chunk['_row'] = np.arange(offset + 2, offset + 2 + len(chunk))
+        offset += len(chunk)
+        yield chunk
+
+def _issues(df, mask, issue, severity, detail=""):
+    hit = df.loc[mask]
+    return pd.DataFrame({
+        "row": hit['_row'].values,
+        "usn": hit['usn'].values if 'usn' in hit else "",
+        "course_code": hit['course_code'].values if 'course_code' in hit else "",
+        "issue": issue, "severity": severity, "detail": detail,
+    }, columns=ISSUE_COLUMNS)
+
+def _finish(valid_parts, issue_parts, total_rows, valid_columns, key_cols=('usn', 'course_code')):
+    valid = pd.concat(valid_parts, ignore_index=True) if valid_parts else pd.DataFrame(columns=list(valid_columns) + ['_row'])
+    # Duplicates can straddle chunks, so they are resolved once at the end: the last occurrence wins
+    dup_mask = valid.duplicated(list(key_cols), keep='last')
+    if dup_mask.any():
+        issue_parts.append(_issues(valid, dup_mask, "DUPLICATE_ROW", "WARNING", "superseded by a later row"))
+        valid = valid.loc[~dup_mask]
+    issues = pd.concat(issue_parts, ignore_index=True) if issue_parts else pd.DataFrame(columns=ISSUE_COLUMNS)
+    return ValidationReport(valid=valid[list(valid_columns)].reset_index(drop=True), issues=issues.sort_values('row', kind='stable').reset_index(drop=True), total_rows=total_rows)
+
+def _missing_columns(missing):
+    return ValidationReport(valid=pd.DataFrame(), issues=pd.DataFrame([{"row": 1, "usn": "", "course_code": "", "issue": "MISSING_COLUMNS", "severity": "ERROR", "detail": ", ".join(missing)}], columns=ISSUE_COLUMNS))
+
+def _registered_mask(df, registrations):
+    reg = pd.DataFrame(registrations, columns=['usn', 'course_code'])
+    reg_keys = pd.MultiIndex.from_arrays([norm_key(reg['usn']), norm_key(reg['course_code'])])
+    return pd.MultiIndex.from_arrays([df['usn'], df['course_code']]).isin(reg_keys)
+
+# ==========================================
+# 2. REGISTRATION UPLOADS
+# ==========================================
+def validate_registration_upload(file, courses, students, cycle_id=None, chunksize=UPLOAD_CHUNK_ROWS):
+    """
+    Checks a bulk registration sheet against master_courses / master_students rows.
+    ERROR (blocks the upload): missing usn/course, unknown course, unknown student, non-numeric semester, other cycle.
+    WARNING (row skipped): inactive student, duplicate (usn, course_code).
+    Course codes are mapped onto the exact casing stored in master_courses.
+    """
+    course_df = pd.DataFrame(courses, columns=['course_code'])
+    canonical = pd.Series(course_df['course_code'].astype(str).values, index=norm_key(course_df['course_code']).values)
+    canonical = canonical[~canonical.index.duplicated()]
+    stu_df = pd.DataFrame(students, columns=['usn', 'status'])
+    status_by_usn = pd.Series(norm_key(stu_df['status']).replace("", "ACTIVE").values, index=norm_key(stu_df['usn']).values)
+    status_by_usn = status_by_usn[~status_by_usn.index.duplicated()]
+
+    valid_parts, issue_parts, total, present = [], [], 0, None
+    for chunk in read_upload_chunks(file, chunksize):
+        if present is None:
+            missing = [c for c in ('usn', 'course_code') if c not in chunk.columns]
+            if missing: return _missing_columns(missing)
+            present = [c for c in REG_UPLOAD_COLUMNS if c in chunk.columns]
+        total += len(chunk)
+
+        df = chunk[present + [c for c in ('cycle_id', '_row') if c in chunk.columns]].copy()
+        df['usn'] = norm_key(df['usn'])
+        code_key = norm_key(df['course_code'])
+        df['course_code'] = code_key.map(canonical).fillna(code_key)
+        bad = pd.Series(False, index=df.index)
+
+        m = (df['usn'] == "") | (code_key == "")
+        issue_parts.append(_issues(df, m, "MISSING_KEY", "ERROR")); bad |= m
+
+        m = ~bad & ~code_key.isin(canonical.index)
+        issue_parts.append(_issues(df, m, "UNKNOWN_COURSE", "ERROR", "not in master_courses")); bad |= m
+
+        stu_status = df['usn'].map(status_by_usn)
+        m = ~bad & stu_status.isna()
+        issue_parts.append(_issues(df, m, "UNKNOWN_STUDENT", "ERROR", "not in master_students")); bad |= m
+
+        m = ~bad & (stu_status != "ACTIVE")
+        issue_parts.append(_issues(df, m, "INACTIVE_STUDENT", "WARNING", "skipped")); bad |= m
+
+        if 'semester' in df:
+            sem_num = coerce_numeric(df['semester'])
+            whole = sem_num.where(sem_num % 1 == 0)
+            m = ~bad & df['semester'].notna() & whole.isna()
+            issue_parts.append(_issues(df, m, "BAD_SEMESTER", "ERROR", "semester is not a whole number")); bad |= m
+            df['semester'] = whole.astype("Int64")
+
+        if cycle_id is not None and 'cycle_id' in df:
+            m = ~bad & df['cycle_id'].notna() & (df['cycle_id'].astype("string").str.strip() != str(cycle_id))
+            issue_parts.append(_issues(df, m, "WRONG_CYCLE", "ERROR", f"sheet row is for another cycle (active: {cycle_id})")); bad |= m
+
+        valid_parts.append(df.loc[~bad].drop(columns=['cycle_id'], errors='ignore'))
+
+    return _finish(valid_parts, issue_parts, total, present or REG_UPLOAD_COLUMNS[:2])
+
+# ==========================================
+# 3. MARKS UPLOADS (CIE / SEE)
+# ==========================================
+def validate_cie_upload(file, registrations, chunksize=UPLOAD_CHUNK_ROWS):
+    """CIE sheet -> usn, course_code, cie_marks for pairs registered in the cycle. Non-numeric marks are kept as None (flagged)."""
+    valid_parts, issue_parts, total, cols = [], [], 0, None
+    for chunk in read_upload_chunks(file, chunksize):
+        if cols is None:
+            cols = (find_column(chunk, ['usn', 'student id']), find_column(chunk, ['course_code', 'course code', 'subject code']), find_column(chunk, ['cie_marks', 'cie', 'ia marks', 'internals']))
+            if not all(cols): return _missing_columns(["usn", "course_code", "cie_marks"])
+        total += len(chunk)
+        usn_col, cc_col, m_col = cols
+
+        df = pd.DataFrame({"usn": norm_key(chunk[usn_col]), "course_code": norm_key(chunk[cc_col]), "_row": chunk['_row']})
+        df['cie_marks'] = coerce_numeric(chunk[m_col])
+
+        registered = _registered_mask(df, registrations)
+        issue_parts.append(_issues(df, ~registered, "NOT_REGISTERED", "WARNING", "blocked"))
+        m = registered & chunk[m_col].notna().values & df['cie_marks'].isna()
+        issue_parts.append(_issues(df, m, "BAD_MARKS", "WARNING", "saved as blank"))
+        valid_parts.append(df.loc[registered])
+
+    return _finish(valid_parts, issue_parts, total, ['usn', 'course_code', 'cie_marks'])
+
+def validate_see_upload(file, registrations, chunksize=UPLOAD_CHUNK_ROWS):
+    """
+    SEE sheet -> usn, course_code, see_raw, exam_status for registered pairs.
+    AB / MP / WH style tokens in the marks column override the status column, as in the manual flow.
+    """
+    valid_parts, issue_parts, total, cols = [], [], 0, None
+    for chunk in read_upload_chunks(file, chunksize):
+        if cols is None:
+            cols = (find_column(chunk, ['usn', 'student id']), find_column(chunk, ['course_code', 'course code', 'subject code', 'subject']),
+                    find_column(chunk, ['see_marks', 'see', 'marks', 'see_raw']), find_column(chunk, ['status', 'exam_status', 'attendance']))
+            if not all(cols[:3]): return _missing_columns(["usn", "course_code", "see_marks"])
+        total += len(chunk)
+        usn_col, cc_col, m_col, stat_col = cols
+
+        df = pd.DataFrame({"usn": norm_key(chunk[usn_col]), "course_code": norm_key(chunk[cc_col]), "_row": chunk['_row']})
+        m_val = norm_key(chunk[m_col])
+        token_status = m_val.map(SEE_STATUS_TOKENS)
+        df['exam_status'] = token_status.fillna(norm_key(chunk[stat_col]) if stat_col else "PRESENT")
+        df['see_raw'] = coerce_numeric(chunk[m_col]).where(token_status.isna())
+
+        registered = _registered_mask(df, registrations)
+        issue_parts.append(_issues(df, ~registered, "NOT_REGISTERED", "WARNING", "blocked"))
+        m = registered & token_status.isna() & (m_val != "") & df['see_raw'].isna()
+        issue_parts.append(_issues(df, m, "BAD_MARKS", "WARNING", "saved as blank"))
+        valid_parts.append(df.loc[registered])
+
+    return _finish(valid_parts, issue_parts, total, ['usn', 'course_code', 'see_raw', 'exam_status'])
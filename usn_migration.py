@@ -0,0 +1,186 @@
+import uuid
+import datetime
+import collections
+import pandas as pd
+
+# --- CONFIGURATION ---
+MIGRATE_RPC = "migrate_usns"              # sql/migrate_usns.sql
+ROLLBACK_RPC = "rollback_usn_migration"
+JOURNAL_TABLE = "usn_migration_journal"
+CHILD_TABLES = ("course_registrations", "student_results", "marks_audit_log")
+OPTIONAL_TABLES = ("marks_audit_log",)    # older installs run without the audit log
+IN_CHUNK = 100
+WRITE_BATCH = 500
+
+def _is_missing_rpc(err):
+    msg = str(err)
+    return "PGRST202" in msg or "Could not find the function" in msg
+
+def _is_missing_table(err):
+    msg = str(err)
+    return "PGRST205" in msg or "42P01" in msg or "Could not find the table" in msg
+
+def _chunks(items, size):
+    for i in range(0, len(items), size):
+        yield items[i:i + size]
+
+def new_batch_id():
+    return f"MIG-{datetime.datetime.now():%Y%m%d-%H%M%S}-{uuid.uuid4().hex[:6].upper()}"
+
+# ==========================================
+# 1. MAPPING FILE
+# ==========================================
+def read_migration_map(file):
+    """
+    temp_usn,official_usn CSV -> (pairs [{old_usn, new_usn}], issues [{old_usn, new_usn, issue}]).
+    Blank rows, self-mappings and USNs that appear twice on either side are rejected up front.
+    """
+    df = pd.read_csv(file, dtype=str)
+    df.columns = [str(c).strip().lower() for c in df.columns]
+    if 'temp_usn' not in df.columns or 'official_usn' not in df.columns:
+        raise ValueError("CSV must contain exact headers: 'temp_usn' and 'official_usn'.")
+
+    m = pd.DataFrame({
+        "old_usn": df['temp_usn'].astype("string").str.strip().str.upper().fillna(""),
+        "new_usn": df['official_usn'].astype("string").str.strip().str.upper().fillna(""),
+    })
+    issue = pd.Series("", index=m.index)
+    issue = issue.mask((m['old_usn'] == "") | (m['new_usn'] == ""), "BLANK_USN")
+    issue = issue.mask((issue == "") & (m['old_usn'] == m['new_usn']), "SAME_USN")
+    issue = issue.mask((issue == "") & m['old_usn'].duplicated(keep=False), "DUPLICATE_TEMP_USN")
+    issue = issue.mask((issue == "") & m['new_usn'].duplicated(keep=False), "DUPLICATE_OFFICIAL_USN")
+
+    ok = issue == ""
+    issues = m.loc[~ok].assign(issue=issue[~ok]).to_dict('records')
+    return m.loc[ok].to_dict('records'), issues
+
+# ==========================================
+# 2. DRY RUN
+# ==========================================
+def _existing_students(supabase, usns, columns="usn"):
+    rows = []
+    for part in _chunks(sorted(set(usns)), IN_CHUNK):
+        rows.extend(supabase.table("master_students").select(columns).in_("usn", part).execute().data or [])
+    return rows
+
+def _child_counts(supabase, usns):
+    counts = {}
+    for table in CHILD_TABLES:
+        n = 0
+        try:
+            for part in _chunks(usns, IN_CHUNK):
+                n += supabase.table(table).select("usn", count="exact", head=True).in_("usn", part).execute().count or 0
+        except Exception as e:
+            if not _is_missing_table(e): raise
+        counts[table] = n
+    return counts
+
+def _plan_local(supabase, pairs):
+    existing = {r['usn'] for r in _existing_students(supabase, [p['old_usn'] for p in pairs] + [p['new_usn'] for p in pairs])}
+    ready, skipped = [], []
+    for p in pairs:
+        if p['old_usn'] not in existing: skipped.append({**p, "issue": "NOT_FOUND"})
+        elif p['new_usn'] in existing: skipped.append({**p, "issue": "TARGET_EXISTS"})
+        else: ready.append(p)
+    counts = {"master_students": len(ready), **_child_counts(supabase, [p['old_usn'] for p in ready])}
+    return ready, {"counts": counts, "skipped": skipped, "dry_run": True}
+
+def plan_usn_migration(supabase, pairs):
+    """Dry run: what would move (row counts per table) and which pairs would be skipped. Returns (plan, used_rpc)."""
+    try:
+        res = supabase.rpc(MIGRATE_RPC, {"p_batch_id": "DRY-RUN", "p_pairs": pairs, "p_dry_run": True}).execute()
+        return res.data, True
+    except Exception as e:
+        if not _is_missing_rpc(e): raise
+    return _plan_local(supabase, pairs)[1], False
+
+# ==========================================
+# 3. APPLY / ROLLBACK
+# ==========================================
+def apply_usn_migration(supabase, pairs, batch_id=None):
+    """
+    Moves every ready pair in one transaction through the `migrate_usns` RPC, journalled under `batch_id`.
+    Falls back to batched table calls when the function is not installed. Returns (batch_id, result, used_rpc).
+    """
+    batch_id = batch_id or new_batch_id()
+    try:
+        res = supabase.rpc(MIGRATE_RPC, {"p_batch_id": batch_id, "p_pairs": pairs, "p_dry_run": False}).execute()
+        return batch_id, res.data, True
+    except Exception as e:
+        if not _is_missing_rpc(e): raise
+    return batch_id, apply_usn_migration_local(supabase, pairs, batch_id), False
+
+def apply_usn_migration_local(supabase, pairs, batch_id):
+    """
+    Stand-in for the RPC. Student rows are copied and deleted in batches; child tables still need one
+    UPDATE per pair and table, since PostgREST cannot map many old values to many new ones in one call.
+    Every moved student is journalled first (the batch is refused when the journal cannot be written),
+    and any later failure undoes the batch before re-raising.
+    """
+    ready, plan = _plan_local(supabase, pairs)
+    new_by_old = {p['old_usn']: p['new_usn'] for p in ready}
+    old_rows = _existing_students(supabase, list(new_by_old), "*")
+    journal = [{"batch_id": batch_id, "old_usn": r['usn'], "new_usn": new_by_old[r['usn']], "student_row": r} for r in old_rows]
+
+    # No journal, no undo: stop before any student or child row is touched
+    try:
+        for part in _chunks(journal, WRITE_BATCH):
+            supabase.table(JOURNAL_TABLE).insert(part).execute()
+    except Exception as e:
+        try: supabase.table(JOURNAL_TABLE).delete().eq("batch_id", batch_id).execute()
+        except: pass
+        raise RuntimeError(f"Rollback journal could not be written ({JOURNAL_TABLE}, sql/migrate_usns.sql); nothing was migrated. {e}") from e
+
+    try:
+        new_rows = [{**r, "usn": new_by_old[r['usn']], "admission_number": r['usn']} for r in old_rows]
+        for part in _chunks(new_rows, WRITE_BATCH):
+            supabase.table("master_students").upsert(part).execute()
+        for table in CHILD_TABLES:
+            try:
+                for j in journal:
+                    supabase.table(table).update({"usn": j['new_usn']}).eq("usn", j['old_usn']).execute()
+            except Exception as e:
+                if table not in OPTIONAL_TABLES or not _is_missing_table(e): raise
+        for part in _chunks([j['old_usn'] for j in journal], IN_CHUNK):
+            supabase.table("master_students").delete().in_("usn", part).execute()
+    except Exception:
+        _undo_local(supabase, journal)
+        raise
+
+    return {"counts": plan["counts"], "skipped": plan["skipped"], "dry_run": False}
+
+def _undo_local(supabase, journal):
+    """Puts journalled students back under their temp USNs (safe to run on a half-applied batch)"""
+    for part in _chunks([j['student_row'] for j in journal], WRITE_BATCH):
+        supabase.table("master_students").upsert(part).execute()
+    for table in CHILD_TABLES:
+        for j in journal:
+            try: supabase.table(table).update({"usn": j['old_usn']}).eq("usn", j['new_usn']).execute()
+            except: pass
+    for part in _chunks([j['new_usn'] for j in journal], IN_CHUNK):
+        supabase.table("master_students").delete().in_("usn", part).execute()
+    try:
+        for part in _chunks([j['old_usn'] for j in journal], IN_CHUNK):
+            supabase.table(JOURNAL_TABLE).update({"rolled_back_at": datetime.datetime.now().isoformat()}).eq("batch_id", journal[0]['batch_id']).in_("old_usn", part).execute()
+    except: pass
+
+def rollback_usn_migration(supabase, batch_id):
+    """Undoes a journalled batch. Returns (restored_count, used_rpc)."""
+    try:
+        res = supabase.rpc(ROLLBACK_RPC, {"p_batch_id": batch_id}).execute()
+        return (res.data or {}).get("restored", 0), True
+    except Exception as e:
+        if not _is_missing_rpc(e): raise
+    journal = supabase.table(JOURNAL_TABLE).select("*").eq("batch_id", batch_id).is_("rolled_back_at", "null").execute().data or []
+    if journal: _undo_local(supabase, journal)
+    return len(journal), False
+
+def list_migration_batches(supabase):
+    """[(batch_id, students, migrated_at)] for batches that can still be rolled back, newest first"""
+    try:
+        rows = supabase.table(JOURNAL_TABLE).select("batch_id, migrated_at").is_("rolled_back_at", "null").execute().data or []
+    except: return []
+    sizes = collections.Counter(r['batch_id'] for r in rows)
+    first_seen = {}
+    for r in rows: first_seen.setdefault(r['batch_id'], r['migrated_at'])
+    return sorted(((b, n, first_seen[b]) for b, n in sizes.items()), key=lambda x: str(x[2]), reverse=True)
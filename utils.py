@@ -23,13 +23,31 @@ def clean_data_for_db(df, expected_cols, numeric_cols=None):
                 df[col] = df[col].astype(str).replace('-', np.nan).replace(' ', np.nan)
                 df[col] = pd.to_numeric(df[col], errors='coerce').fillna(0).astype(int)
     
-    df = df.replace([np.inf, -np.inf], np.nan).astype(object).where(pd.notnull(df), None)
-    
-    records = df.to_dict('records')
-    for r in records:
-        for k, v in r.items():
-            if pd.isna(v): r[k] = None
-    return records
+    df = df.replace([np.inf, -np.inf], np.nan)
+    # Column-wise null -> None (covers NaN / NaT / pd.NA) instead of a per-cell isna walk
+    names = list(df.columns)
+    columns = [df[c].astype(object).where(df[c].notna(), None).tolist() for c in names]
+    return [dict(zip(names, row)) for row in zip(*columns)]
+
+def bulk_patch_students(supabase, patches, chunk_size=100):
+    """
+    Applies {usn: {field: value}} changes to master_students.
+    USNs sharing the same change are grouped, so a promotion or status sweep becomes
+    one UPDATE ... WHERE usn IN (...) per chunk instead of one request (or full-row upsert) per student.
+    Returns the number of students patched.
+    """
+    groups = {}
+    for usn, fields in patches.items():
+        if fields:
+            groups.setdefault(tuple(sorted(fields.items())), []).append(usn)
+
+    patched = 0
+    for values, usns in groups.items():
+        for i in range(0, len(usns), chunk_size):
+            part = usns[i:i + chunk_size]
+            supabase.table("master_students").update(dict(values)).in_("usn", part).execute()
+            patched += len(part)
+    return patched
 
 # --- MULTI-CYCLE SWITCHBOARD LOGIC ---
 